@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Microbenchmark of `camel_eval` and of the compiled interpreter path.
+
+The `camel_eval` path parses the code on every run, so every node of the tree
+is bound to its evaluator again before the module is evaluated. The compiled
+path goes through `compile_code`, which caches the parsed code with its nodes
+bound to their evaluators, as `parse_and_interpret_code` does.
+
+Run with:
+
+  python -m benchmarks.interpreter_benchmark
+"""
+
+import argparse
+import ast
+import statistics
+import timeit
+
+from camel.camel_library import security_policy
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+
+PROGRAMS = {
+    "arithmetic": """
+total = 0
+for i in range(200):
+    total += i * 2 - 1
+total
+""",
+    "strings": """
+words = [f"word {i}" for i in range(50)]
+text = ", ".join(words)
+parts = text.split(", ")
+[p.upper() for p in parts if "1" in p]
+""",
+    "records": """
+records = [{"id": i, "name": f"user {i}", "score": i % 7} for i in range(50)]
+by_name = {r["name"]: r for r in records}
+best = [by_name[f"user {i}"]["score"] for i in range(50) if i % 3 == 0]
+sum(best)
+""",
+    "classes": """
+class Email(BaseModel):
+    to: str
+    subject: str
+
+emails = [Email(to=f"u{i}@example.com", subject=f"s{i}") for i in range(30)]
+[e.to for e in emails if e.subject.endswith("1")]
+""",
+}
+
+
+def _make_eval_args() -> interpreter.EvalArgs:
+  return interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+
+
+def _run_camel_eval(code: str) -> interpreter.EvalResult:
+  return interpreter.camel_eval(
+      ast.parse(code),
+      library.make_builtins_namespace({}),
+      [],
+      (),
+      _make_eval_args(),
+  )
+
+
+def _run_compiled(code: str) -> interpreter.EvalResult:
+  return interpreter.compile_code(code)(
+      library.make_builtins_namespace({}), [], (), _make_eval_args()
+  )
+
+
+def _time(fn, code: str, repeat: int, number: int) -> float:
+  """Returns the median time of a run, in milliseconds."""
+  timings = timeit.repeat(lambda: fn(code), repeat=repeat, number=number)
+  return statistics.median(timings) / number * 1000
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--number", type=int, default=10)
+  args = parser.parse_args()
+
+  print(f"{'program':<12} {'camel_eval':>12} {'compiled':>10} {'speedup':>8}")
+  for name, code in PROGRAMS.items():
+    camel_eval_res = _run_camel_eval(code).result
+    compiled_res = _run_compiled(code).result
+    assert repr(camel_eval_res) == repr(compiled_res), name
+    camel_eval = _time(_run_camel_eval, code, args.repeat, args.number)
+    compiled = _time(_run_compiled, code, args.repeat, args.number)
+    print(
+        f"{name:<12} {camel_eval:>10.2f}ms {compiled:>8.2f}ms"
+        f" {camel_eval / compiled:>7.2f}x"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,308 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark suite and profiling harness of the CaMeL interpreter.
+
+Runs the programs in `benchmarks.programs` through `parse_and_interpret_code`
+in both dependencies propagation modes, and reports for each of them:
+
+- the median wall time of a run;
+- the peak memory allocated during a run;
+- the memory (and number of memory blocks) allocated by a run and still alive
+  when it returns, i.e., the size of the values it created.
+
+It also reports the size of an instance of each of the main value classes,
+including its `__dict__` if it has one.
+
+Memory is measured with `tracemalloc` in separate runs, so that tracing does
+not affect the timings.
+
+Run with:
+
+  python -m benchmarks.interpreter_suite
+
+Results can be saved with `--save` and compared with a previous run with
+`--compare`, which exits with status 1 if any program got slower than the
+allowed `--threshold`. `--profile` prints the `cProfile` statistics of a
+program instead.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import gc
+import io
+import json
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from camel.camel_agent import camel_agent
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+
+from . import programs
+
+DependenciesPropagationMode = interpreter.DependenciesPropagationMode
+
+
+class _Runner:
+  """Runs programs of the corpus on fresh namespaces."""
+
+  def __init__(self, use_async: bool):
+    # Like the agent, async runs share an event loop.
+    self._event_loop = asyncio.new_event_loop() if use_async else None
+    self._quarantined_llm_service = camel_agent.QuarantinedLlmService(
+        model=programs.FakeLlm()
+    )
+
+  def run(self, name: str, mode: DependenciesPropagationMode) -> Any:
+    # Identical queries in different runs must not be served by the cache.
+    self._quarantined_llm_service.result_cache.clear()
+    args = (
+        f"```python\n{programs.PROGRAMS[name]}\n```",
+        programs.make_namespace(self._quarantined_llm_service),
+        [],
+        (),
+        interpreter.EvalArgs(security_policy.NoSecurityPolicyEngine(), mode),
+    )
+    # `query_ai_assistant` prints its queries and outputs.
+    with contextlib.redirect_stdout(io.StringIO()):
+      if self._event_loop is not None:
+        eval_result = self._event_loop.run_until_complete(
+            interpreter.parse_and_interpret_code_async(*args)
+        )
+      else:
+        eval_result = interpreter.parse_and_interpret_code(*args)
+    if isinstance(eval_result.result, result.Error):
+      raise RuntimeError(
+          f"{name} ({mode}) failed: {eval_result.result.error.exception!r}"
+      )
+    return eval_result
+
+
+def _measure_time(
+    runner: _Runner, name: str, mode: DependenciesPropagationMode, repeat: int
+) -> float:
+  """Returns the median time of a run, in milliseconds."""
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    runner.run(name, mode)
+    timings.append(time.perf_counter() - start)
+  return statistics.median(timings) * 1000
+
+
+def _measure_memory(
+    runner: _Runner, name: str, mode: DependenciesPropagationMode
+) -> dict[str, float]:
+  """Returns the peak and retained memory of a run, in KiB, and its blocks."""
+  gc.collect()
+  tracemalloc.start()
+  try:
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    eval_result = runner.run(name, mode)
+    _, peak = tracemalloc.get_traced_memory()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+  finally:
+    tracemalloc.stop()
+  del eval_result
+  stats = after.compare_to(before, "filename")
+  return {
+      "peak_kib": peak / 1024,
+      "retained_kib": sum(s.size_diff for s in stats) / 1024,
+      "retained_blocks": sum(s.count_diff for s in stats),
+  }
+
+
+def _object_size(obj: Any) -> int:
+  size = sys.getsizeof(obj)
+  if hasattr(obj, "__dict__"):
+    size += sys.getsizeof(obj.__dict__)
+  return size
+
+
+def _measure_object_sizes() -> dict[str, int]:
+  """Returns the size of a value of each of the main classes, in bytes."""
+  caps = capabilities.Capabilities.camel()
+  string = camel_value.CaMeLStr.from_raw("text", caps, ())
+  values = [
+      camel_value.CaMeLNone(caps, ()),
+      camel_value.CaMeLTrue(caps, ()),
+      camel_value.CaMeLInt(1, caps, ()),
+      camel_value.CaMeLFloat(1.0, caps, ()),
+      string,
+      next(string.iterate_python()),
+      camel_value.CaMeLTuple((), caps, ()),
+      camel_value.CaMeLList([], caps, ()),
+      camel_value.CaMeLSet(set(), caps, ()),
+      camel_value.CaMeLDict({}, caps, ()),
+  ]
+  return {type(v).__name__: _object_size(v) for v in values}
+
+
+def _run_suite(
+    runner: _Runner, names: list[str], repeat: int
+) -> dict[str, dict[str, float]]:
+  results = {}
+  for name in names:
+    for mode in DependenciesPropagationMode:
+      runner.run(name, mode)  # Warm up caches (e.g., compiled code).
+      results[f"{name}/{mode}"] = {
+          "time_ms": _measure_time(runner, name, mode, repeat),
+          **_measure_memory(runner, name, mode),
+      }
+  return results
+
+
+def _print_results(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]] | None,
+) -> None:
+  header = (
+      f"{'benchmark':<26} {'time':>10} {'peak':>11} {'retained':>11}"
+      f" {'blocks':>8}"
+  )
+  if baseline is not None:
+    header += f" {'baseline':>10} {'ratio':>6}"
+  print(header)
+  for key, r in results.items():
+    line = (
+        f"{key:<26} {r['time_ms']:>8.2f}ms {r['peak_kib']:>8.0f}KiB"
+        f" {r['retained_kib']:>8.0f}KiB {r['retained_blocks']:>8}"
+    )
+    if baseline is not None and key in baseline:
+      baseline_time = baseline[key]["time_ms"]
+      line += (
+          f" {baseline_time:>8.2f}ms {r['time_ms'] / baseline_time:>6.2f}"
+      )
+    print(line)
+
+
+def _print_object_sizes(
+    sizes: dict[str, int], baseline: dict[str, int] | None
+) -> None:
+  header = f"{'class':<26} {'size':>10}"
+  if baseline is not None:
+    header += f" {'baseline':>10}"
+  print(header)
+  for name, size in sizes.items():
+    line = f"{name:<26} {size:>9}B"
+    if baseline is not None and name in baseline:
+      line += f" {baseline[name]:>9}B"
+    print(line)
+
+
+def _find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+  return [
+      key
+      for key, r in results.items()
+      if key in baseline
+      and r["time_ms"] > baseline[key]["time_ms"] * (1 + threshold)
+  ]
+
+
+def _profile(
+    runner: _Runner, name: str, mode: DependenciesPropagationMode, limit: int
+) -> None:
+  runner.run(name, mode)
+  profiler = cProfile.Profile()
+  profiler.enable()
+  runner.run(name, mode)
+  profiler.disable()
+  pstats.Stats(profiler).sort_stats("cumulative").print_stats(limit)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+      "programs",
+      nargs="*",
+      choices=[[], *programs.PROGRAMS],
+      help="The programs to run (all by default).",
+  )
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument(
+      "--async",
+      dest="use_async",
+      action="store_true",
+      help="Use `parse_and_interpret_code_async`.",
+  )
+  parser.add_argument("--save", help="Saves the results to this JSON file.")
+  parser.add_argument(
+      "--compare", help="Compares the results with this JSON file."
+  )
+  parser.add_argument(
+      "--threshold",
+      type=float,
+      default=0.1,
+      help="The allowed relative slowdown when comparing.",
+  )
+  parser.add_argument(
+      "--profile",
+      metavar="PROGRAM",
+      choices=programs.PROGRAMS,
+      help="Profiles a program instead of benchmarking.",
+  )
+  parser.add_argument(
+      "--mode",
+      type=DependenciesPropagationMode,
+      default=DependenciesPropagationMode.NORMAL,
+      help="The dependencies propagation mode used when profiling.",
+  )
+  args = parser.parse_args()
+
+  runner = _Runner(args.use_async)
+  if args.profile:
+    _profile(runner, args.profile, args.mode, limit=30)
+    return
+
+  names = args.programs or list(programs.PROGRAMS)
+  results = _run_suite(runner, names, args.repeat)
+  object_sizes = _measure_object_sizes()
+  baseline = baseline_object_sizes = None
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    baseline_object_sizes = baseline.pop("object_sizes", None)
+  _print_results(results, baseline)
+  print()
+  _print_object_sizes(object_sizes, baseline_object_sizes)
+  if args.save:
+    with open(args.save, "w") as f:
+      json.dump({**results, "object_sizes": object_sizes}, f, indent=2)
+  if baseline is not None:
+    if regressions := _find_regressions(results, baseline, args.threshold):
+      print(
+          f"Slower than the baseline by more than {args.threshold:.0%}:"
+          f" {', '.join(regressions)}"
+      )
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
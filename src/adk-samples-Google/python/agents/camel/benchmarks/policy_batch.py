@@ -0,0 +1,284 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batch evaluation of security policies over suites of scripted programs.
+
+A `Suite` is a list of P-LLM programs and a function making the tools and the
+security policy engine they run with. The programs run through
+`parse_and_interpret_code` on a pool of processes, each program on a fresh
+namespace of built-ins and tools. The runner collects for each of them:
+
+- its outcome: `ok`, `error` (the program raised an exception), `denied` (a
+  security policy denied a tool call) or `crash` (the interpreter raised an
+  unexpected exception);
+- the security policy decisions on its tool calls, and their arguments;
+- the tool calls it made (denied programs stop with an exception, so these are
+  the allowed ones);
+- its wall time.
+
+Results are written as JSON lines, one per program, in the order of the suite.
+Programs can specify the outcome they are expected to have, and the runner
+exits with status 1 if any program has a different one.
+
+Run with:
+
+  python -m benchmarks.policy_batch --output results.jsonl
+
+The suite is given as `module:attribute`, and defaults to the one of
+`benchmarks.policy_programs`.
+"""
+
+import argparse
+import collections
+from collections.abc import Callable, Iterable, Mapping, Sequence
+import concurrent.futures
+import contextlib
+import dataclasses
+import importlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Any
+
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+
+Tool = tuple[Callable[..., Any], Any, Any]
+"""A tool: (py_callable, capabilities, dependencies), as in `CaMeLAgent`."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Environment:
+  """The tools and security policies the programs of a suite run with."""
+
+  tools: Sequence[Tool]
+  security_policy_engine: security_policy.SecurityPolicyEngine
+  eval_mode: interpreter.DependenciesPropagationMode = (
+      interpreter.DependenciesPropagationMode.NORMAL
+  )
+
+
+@dataclasses.dataclass(frozen=True)
+class Task:
+  """A scripted P-LLM program."""
+
+  name: str
+  code: str
+  expected_outcome: str | None = None
+  """The outcome the program must have, if any."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Suite:
+  """Programs and the environment they run with."""
+
+  make_environment: Callable[[], Environment]
+  """Makes the environment. It is called once in each process."""
+  tasks: Sequence[Task]
+
+
+class _RecordingPolicyEngine(security_policy.SecurityPolicyEngine):
+  """Records the decisions of an engine on calls to tools."""
+
+  def __init__(
+      self,
+      engine: security_policy.SecurityPolicyEngine,
+      tool_names: frozenset[str],
+  ):
+    self._engine = engine
+    self._tool_names = tool_names
+    self.policies = engine.policies
+    self.no_side_effect_tools = engine.no_side_effect_tools
+    self.decisions: list[dict[str, Any]] = []
+
+  def check_policy(
+      self,
+      tool_name: str,
+      kwargs: Mapping[str, camel_value.Value],
+      dependencies: Iterable[camel_value.Value],
+  ) -> security_policy.SecurityPolicyResult:
+    policy_result = self._engine.check_policy(tool_name, kwargs, dependencies)
+    # Policies are also checked for built-ins, which are never denied.
+    if tool_name in self._tool_names:
+      self.decisions.append({
+          "tool": tool_name,
+          "args": {k: v.raw for k, v in kwargs.items()},
+          "denied": (
+              policy_result.reason
+              if isinstance(policy_result, security_policy.Denied)
+              else None
+          ),
+      })
+    return policy_result
+
+
+_environment: Environment | None = None
+"""The environment of the suite run by this process."""
+
+
+def _load_suite(suite_name: str) -> Suite:
+  module_name, _, attribute = suite_name.partition(":")
+  return getattr(importlib.import_module(module_name), attribute or "SUITE")
+
+
+def _init_process(suite_name: str) -> None:
+  global _environment
+  _environment = _load_suite(suite_name).make_environment()
+
+
+def _run_task(task: Task) -> dict[str, Any]:
+  """Runs a program of the suite, and returns its results."""
+  assert _environment is not None
+  namespace = library.make_builtins_namespace({
+      f.__name__: camel_value.CaMeLFunction(f.__name__, f, caps, deps)
+      for f, caps, deps in _environment.tools
+  })
+  engine = _RecordingPolicyEngine(
+      _environment.security_policy_engine,
+      frozenset(f.__name__ for f, _, _ in _environment.tools),
+  )
+  eval_args = interpreter.EvalArgs(engine, _environment.eval_mode)
+  error = None
+  tool_calls = None
+  start = time.perf_counter()
+  try:
+    # Tools may print what they do.
+    with contextlib.redirect_stdout(io.StringIO()):
+      eval_result = interpreter.parse_and_interpret_code(
+          f"```python\n{task.code}\n```", namespace, [], (), eval_args
+      )
+  except security_policy.SecurityPolicyDeniedError as e:
+    outcome, error = "denied", str(e)
+  except Exception as e:  # pylint: disable=broad-except
+    outcome, error = "crash", repr(e)
+  else:
+    match eval_result.result:
+      case result.Error(camel_exception):
+        outcome, error = "error", repr(camel_exception.exception)
+      case _:
+        outcome = "ok"
+    tool_calls = [
+        [call.function, call.args]
+        for call in eval_result.tool_calls_chain
+        if not call.is_builtin
+    ]
+  time_ms = (time.perf_counter() - start) * 1000
+  if tool_calls is None:
+    tool_calls = [
+        [decision["tool"], decision["args"]]
+        for decision in engine.decisions
+        if decision["denied"] is None
+    ]
+  return {
+      "name": task.name,
+      "outcome": outcome,
+      "expected_outcome": task.expected_outcome,
+      "error": error,
+      "decisions": engine.decisions,
+      "tool_calls": tool_calls,
+      "time_ms": round(time_ms, 3),
+  }
+
+
+def run_suite(
+    suite_name: str, processes: int | None = None
+) -> list[dict[str, Any]]:
+  """Runs the programs of a suite on a pool of processes.
+
+  Args:
+      suite_name: The suite, as `module:attribute`. Processes import it, so
+        that the tools and policies don't need to be pickled.
+      processes: The number of processes. Defaults to the number of CPUs. With
+        1, the programs run in this process.
+
+  Returns:
+      The results of the programs, in the order of the suite.
+  """
+  tasks = _load_suite(suite_name).tasks
+  processes = processes or os.cpu_count() or 1
+  if processes == 1:
+    _init_process(suite_name)
+    return [_run_task(task) for task in tasks]
+  with concurrent.futures.ProcessPoolExecutor(
+      processes, initializer=_init_process, initargs=(suite_name,)
+  ) as executor:
+    return list(
+        executor.map(
+            _run_task,
+            tasks,
+            # Programs are short, so they are sent in batches.
+            chunksize=max(1, len(tasks) // (processes * 4)),
+        )
+    )
+
+
+def _print_summary(results: list[dict[str, Any]], wall_time: float) -> None:
+  outcomes = collections.Counter(r["outcome"] for r in results)
+  decisions = [d for r in results for d in r["decisions"]]
+  denials = sum(d["denied"] is not None for d in decisions)
+  cpu_time = sum(r["time_ms"] for r in results) / 1000
+  print(
+      f"{len(results)} programs in {wall_time:.2f}s ({cpu_time:.2f}s in"
+      f" programs): {', '.join(f'{n} {o}' for o, n in outcomes.items())}"
+  )
+  print(
+      f"{len(decisions)} policy decisions: {len(decisions) - denials} allowed,"
+      f" {denials} denied"
+  )
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+      "--suite",
+      default="benchmarks.policy_programs:SUITE",
+      help="The suite to run, as `module:attribute`.",
+  )
+  parser.add_argument(
+      "--processes",
+      type=int,
+      help="The number of processes (the number of CPUs by default).",
+  )
+  parser.add_argument("--output", help="Writes the results to this file.")
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  results = run_suite(args.suite, args.processes)
+  _print_summary(results, time.perf_counter() - start)
+  if args.output:
+    with open(args.output, "w") as f:
+      for r in results:
+        f.write(json.dumps(r, separators=(",", ":"), default=repr) + "\n")
+  unexpected = [
+      r
+      for r in results
+      if r["expected_outcome"] is not None
+      and r["outcome"] != r["expected_outcome"]
+  ]
+  for r in unexpected:
+    print(
+        f"{r['name']}: expected {r['expected_outcome']}, got {r['outcome']}"
+        f" ({r['error']})"
+    )
+  if unexpected:
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,160 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Corpus of representative P-LLM programs and the tools they call.
+
+The tools return synthetic data sized like real tool outputs (long documents,
+hundreds of records), and `query_ai_assistant` goes through a
+`QuarantinedLlmService` backed by a local fake model, so that the programs
+exercise the same code paths as the agent without any network access.
+"""
+
+import re
+from typing import Any, AsyncGenerator
+
+from google.adk.models import base_llm
+from google.adk.models import llm_request
+from google.adk.models import llm_response
+from google.genai import types
+
+from camel.camel_agent import camel_agent
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import readers
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import library
+
+PROGRAMS = {
+    "string_processing": """
+doc = get_document()
+lines = doc.splitlines()
+meetings = [line for line in lines if "meeting" in line.lower()]
+names = [line.split(":")[1].strip().split(" ")[0] for line in meetings]
+summary = ", ".join([names[i] for i in range(min(50, len(names)))])
+report = f"Found {len(meetings)} meetings with: {summary}"
+send_email("alice@example.com", "Meetings", report)
+""",
+    "comprehensions": """
+records = get_records()
+by_id = {r["id"]: r for r in records}
+scores = {r["name"]: r["score"] * 2 for r in records if r["score"] > 3}
+ranking = sorted([(score, name) for name, score in scores.items()])
+top = [ranking[-i] for i in range(1, 11)]
+tags = {tag for r in records for tag in r["tags"]}
+names = [by_id[i]["name"].upper() for i in range(0, len(records), 7)]
+(top, len(tags), names)
+""",
+    "nested_loops": """
+records = get_records()
+totals = {}
+count = 0
+for r in records:
+    for tag in r["tags"]:
+        if tag == "urgent":
+            count += 1
+        elif r["score"] > 5:
+            count += 2
+    totals[r["name"]] = count
+[totals[r["name"]] for r in records if r["id"] % 50 == 0]
+""",
+    "qllm_calls": """
+records = get_records()
+first_names = [
+    query_ai_assistant(f"Extract the first name from: {r['name']}", "str")
+    for r in records
+    if r["id"] < 20
+]
+ages = []
+for name in first_names:
+    age = query_ai_assistant(f"How old is {name}?", "int")
+    ages = [*ages, age]
+send_email("bob@example.com", "Ages", f"Total age: {sum(ages)}")
+""",
+}
+"""The programs of the corpus, by name."""
+
+_DOCUMENT = "\n".join(
+    f"Line {i}: {name} {'meeting' if i % 3 == 0 else 'note'} about project"
+    f" {i % 17} at {9 + i % 8}:00, room {i % 5}."
+    for i, name in enumerate(
+        ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank"] * 300
+    )
+)
+
+_RECORDS = [
+    {
+        "id": i,
+        "name": f"User{i} Example",
+        "score": i % 10,
+        "tags": ["urgent", "work"] if i % 4 == 0 else ["personal"],
+    }
+    for i in range(300)
+]
+
+
+def get_document() -> str:
+  """Returns a long document with meeting notes."""
+  return _DOCUMENT
+
+
+def get_records() -> list[dict[str, Any]]:
+  """Returns the records of the users."""
+  return _RECORDS
+
+
+def send_email(recipient: str, subject: str, body: str) -> str:
+  """Sends an email."""
+  return f"Sent '{subject}' ({len(body)} characters) to {recipient}"
+
+
+class FakeLlm(base_llm.BaseLlm):
+  """A local model that answers queries to the Q-LLM deterministically."""
+
+  model: str = "fake-qllm"
+
+  async def generate_content_async(
+      self, llm_request: llm_request.LlmRequest, stream: bool = False
+  ) -> AsyncGenerator[llm_response.LlmResponse, None]:
+    query = llm_request.contents[-1].parts[0].text or ""
+    if re.search(r"output_schema: int\s*$", query):
+      answer = str(len(query) % 50 + 20)
+    else:
+      answer = query.split(":")[1].split()[0] if ":" in query else "unknown"
+    yield llm_response.LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=answer)]),
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=len(query.split()),
+            candidates_token_count=1,
+            total_token_count=len(query.split()) + 1,
+        ),
+    )
+
+
+def make_namespace(
+    quarantined_llm_service: camel_agent.QuarantinedLlmService,
+) -> camel_value.Namespace:
+  """Returns a namespace with the built-ins and the tools of the corpus."""
+  tools = [
+      (get_document, capabilities.Capabilities.camel(), ()),
+      (get_records, capabilities.Capabilities.camel(), ()),
+      (send_email, capabilities.Capabilities.camel(), ()),
+      (
+          quarantined_llm_service.get_query_ai_assistant_function(),
+          capabilities.Capabilities.camel(),
+          (readers.Public(),),
+      ),
+  ]
+  return library.make_builtins_namespace({
+      f.__name__: camel_value.CaMeLFunction(f.__name__, f, caps, deps)
+      for f, caps, deps in tools
+  })
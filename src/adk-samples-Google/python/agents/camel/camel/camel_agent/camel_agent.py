@@ -15,11 +15,11 @@
 """CaMeL agent implementation."""
 
 import asyncio
-from collections.abc import Iterator
-import queue
+import collections
+import dataclasses
+import functools
 import re
-import threading
-from typing import Any, AsyncGenerator, Callable, Optional
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
 
 from google.adk import runners
 from google.adk.agents import base_agent
@@ -78,7 +78,15 @@ bool_validator = validators.bool_validator
 
 
 class QuarantinedLlmService(BaseModel):
-  """Manages synchronous interactions with the Quarantined LLM (Q-LLM)."""
+  """Manages interactions with the Quarantined LLM (Q-LLM).
+
+  Queries run on a pool of reusable sessions. The Q-LLM agent does not include
+  the contents of previous turns in its requests, so queries sharing a session
+  don't see each other. Outputs are cached by query and output schema, so
+  identical queries of a run (e.g., in a loop) don't need a model round trip.
+  `CaMelInterpreterService` clears the cache before each run, as the service is
+  shared by all the sessions of the agent.
+  """
 
   model: str | BaseLlm
   name: str
@@ -88,6 +96,21 @@ class QuarantinedLlmService(BaseModel):
   runner: runners.InMemoryRunner
   pattern: re.Pattern
 
+  session_pool_size: int
+  """The maximum number of idle sessions kept for reuse."""
+  max_queries_per_session: int
+  """The number of queries after which a session is deleted, so that the
+  events stored in the session service don't grow unboundedly."""
+  idle_session_ids: list[str]
+  session_queries: dict[str, int]
+
+  result_cache_size: int
+  """The maximum number of cached outputs. 0 disables the cache. The least
+  recently used outputs are evicted first."""
+  result_cache: collections.OrderedDict[
+      tuple[str, str], str | int | float | bool
+  ]
+
   model_config = {"arbitrary_types_allowed": True}
 
   def __init__(
@@ -95,11 +118,15 @@ class QuarantinedLlmService(BaseModel):
       model: str | BaseLlm,
       name: str = "QLLM_Service",
       user_id: str = "test_user_id",
+      session_pool_size: int = 8,
+      max_queries_per_session: int = 64,
+      result_cache_size: int = 256,
   ):
     agent = LlmAgent(
         model=model,
         name=name,
         instruction=prompts.QLLM_SYSTEM_PROMPT,
+        include_contents="none",
     )
 
     runner = runners.InMemoryRunner(
@@ -116,92 +143,103 @@ class QuarantinedLlmService(BaseModel):
         agent=agent,
         runner=runner,
         pattern=pattern,
+        session_pool_size=session_pool_size,
+        max_queries_per_session=max_queries_per_session,
+        idle_session_ids=[],
+        session_queries={},
+        result_cache_size=result_cache_size,
+        result_cache=collections.OrderedDict(),
     )
 
-  async def _run_async(
-      self, query: str, output_schema: str
-  ) -> AsyncGenerator[Event, None]:
-    """Runs a query on the Q-LLM session."""
-
+  async def _acquire_session_id(self) -> str:
+    """Returns the id of an idle session, creating one if there is none."""
+    if self.idle_session_ids:
+      return self.idle_session_ids.pop()
     qllm_session = await self.runner.session_service.create_session(
         app_name=self.name, user_id=self.user_id
     )
-
-    qllm_query = f"{query} \n\n output_schema: {output_schema}"
-    content = types.Content(role="user", parts=[types.Part(text=qllm_query)])
-
-    async for e in self.runner.run_async(
-        user_id=qllm_session.user_id,  # Session object contains user_id
-        session_id=qllm_session.id,
-        new_message=content,
+    self.session_queries[qllm_session.id] = 0
+    return qllm_session.id
+
+  async def _release_session_id(self, session_id: str) -> None:
+    """Returns the session to the pool, or deletes it if it can't be reused."""
+    self.session_queries[session_id] += 1
+    if (
+        len(self.idle_session_ids) < self.session_pool_size
+        and self.session_queries[session_id] < self.max_queries_per_session
     ):
-      yield e
-
+      self.idle_session_ids.append(session_id)
+      return
+    del self.session_queries[session_id]
     await self.runner.session_service.delete_session(
-        app_name=self.name, user_id=self.user_id, session_id=qllm_session.id
+        app_name=self.name, user_id=self.user_id, session_id=session_id
     )
 
-  def run(self, query: str, output_schema: str) -> Iterator[Event]:
-    """Runs the QLLM agent synchronously in a new thread.
+  async def close(self) -> None:
+    """Deletes the idle sessions and clears the result cache.
 
-    NOTE: This sync interface is solely because the CaMeL interpreter is
-    synchronous and does not suuport the `await` keyword. The
-    `query_ai_assistant` function is a wrapper around this synchronous run
-    method.
+    Called by `CaMeLAgent.close` when the agent is shut down.
+    """
+    while self.idle_session_ids:
+      session_id = self.idle_session_ids.pop()
+      del self.session_queries[session_id]
+      await self.runner.session_service.delete_session(
+          app_name=self.name, user_id=self.user_id, session_id=session_id
+      )
+    self.result_cache.clear()
 
-    NOTE: This method is similar to the `run` method in the `runners.Runner`
-    class.
+  def _get_cached_result(
+      self, query: str, output_schema: str
+  ) -> str | int | float | bool | None:
+    key = (query, output_schema)
+    if key not in self.result_cache:
+      return None
+    self.result_cache.move_to_end(key)
+    return self.result_cache[key]
+
+  def _cache_result(
+      self, query: str, output_schema: str, output: str | int | float | bool
+  ) -> None:
+    if self.result_cache_size <= 0:
+      return
+    self.result_cache[(query, output_schema)] = output
+    if len(self.result_cache) > self.result_cache_size:
+      self.result_cache.popitem(last=False)
 
-    TODO: Later versions of CaMeL should support asynchronous execution and
-    this method will be removed.
+  async def _run_async(
+      self, query: str, output_schema: str
+  ) -> AsyncGenerator[Event, None]:
+    """Runs a query on a Q-LLM session from the pool."""
 
-    Args:
-      query: The query to run.
-      output_schema: The output schema of the query.
+    session_id = await self._acquire_session_id()
 
-    Yields:
-      The events generated by the QLLM.
-    """
-    event_queue = queue.Queue()
-
-    async def _invoke_run_async():
-      try:
-        async for e in self._run_async(query, output_schema):
-          event_queue.put(e)
-      finally:
-        event_queue.put(None)
-
-    def _asyncio_thread_main():
-      try:
-        asyncio.run(_invoke_run_async())
-      finally:
-        event_queue.put(None)
-
-    thread = threading.Thread(target=_asyncio_thread_main)
-    thread.start()
-
-    # consumes and re-yield the events from background thread.
-    while True:
-      e = event_queue.get()
-      if e is None:
-        break
-      else:
-        yield e
+    qllm_query = f"{query} \n\n output_schema: {output_schema}"
+    content = types.Content(role="user", parts=[types.Part(text=qllm_query)])
 
-    thread.join()
+    try:
+      async for e in self.runner.run_async(
+          user_id=self.user_id,
+          session_id=session_id,
+          new_message=content,
+      ):
+        yield e
+    finally:
+      await self._release_session_id(session_id)
 
   def get_query_ai_assistant_function(
       self,
-  ) -> Callable[[str, str], str | int | float | bool]:
+  ) -> Callable[[str, str], Awaitable[str | int | float | bool]]:
     """Returns a function that queries a Large Language Model with `query` and returns the language model's output.
 
-    The `query_ai_assistant` function is a wrapper around the `run` method of
-    the `QuarantinedLlmService` class. `query_ai_assistant` needs the `self`
+    The `query_ai_assistant` function is a coroutine function wrapping the
+    `_run_async` method of the `QuarantinedLlmService` class. The interpreter
+    awaits it on the agent's event loop in async mode, and runs it to
+    completion in sync mode. `query_ai_assistant` needs the `self`
     object but it can't be passed as a parameter because it needs to be added to
     the namespace of the CaMeL interpreter as a standalone built-in function.
     """
 
-    def query_ai_assistant(
+    async def query_ai_assistant(
         query: str, output_schema: str
     ) -> str | int | float | bool:
       """Queries a Large Language Model with `query` and returns the language model's output.
@@ -251,9 +289,13 @@ class QuarantinedLlmService(BaseModel):
       if output_schema not in ["int", "str", "float", "bool"]:
         raise ValueError(f"Unsupported output schema: `{output_schema}`")
 
+      cached_output = self._get_cached_result(query, output_schema)
+      if cached_output is not None:
+        return cached_output
+
       response_parts = []
 
-      for e in self.run(
+      async for e in self._run_async(
           query=query,
           output_schema=output_schema,
       ):
@@ -269,16 +311,19 @@ class QuarantinedLlmService(BaseModel):
       )
 
       if output_schema == "int":
-        return int_validator(response_text)
+        output = int_validator(response_text)
       elif output_schema == "str":
-        return str(response_text)
+        output = str(response_text)
       elif output_schema == "float":
-        return float_validator(response_text)
+        output = float_validator(response_text)
       elif output_schema == "bool":
-        return bool_validator(response_text)
+        output = bool_validator(response_text)
       else:
         raise ValueError(f"Unsupported output schema: `{output_schema}`")
 
+      self._cache_result(query, output_schema, output)
+      return output
+
     return query_ai_assistant
 
 
@@ -317,6 +362,11 @@ class CaMelInterpreterService(BaseModel):
         (capabilities.readers.Public(),),
     ))
 
+    if eval_args.print_buffer is None:
+      eval_args = dataclasses.replace(
+          eval_args, print_buffer=interpreter.PrintBuffer()
+      )
+
     namespace = library.make_builtins_namespace(
         variables={
             (func_name := f.__name__): CaMeLFunction(
@@ -339,6 +389,16 @@ class CaMelInterpreterService(BaseModel):
         quarantined_llm_service=quarantined_llm_service,
     )
 
+  def clear_checkpoints(self) -> None:
+    """Forgets the checkpoints and memoized tool outputs of the last program."""
+    if self.eval_args.checkpoints is not None:
+      self.eval_args.checkpoints.clear()
+
+  async def close(self) -> None:
+    """Releases the Q-LLM sessions and the cached outputs."""
+    self.clear_checkpoints()
+    await self.quarantined_llm_service.close()
+
   def get_funcs_for_pllm_prompt(self) -> list[Callable[..., Any]]:
     return [f for f, _, _ in self.tools if hasattr(f, "__name__")]
 
@@ -351,6 +411,7 @@ class CaMelInterpreterService(BaseModel):
       tool_calls_chain: list[function_types.FunctionCall],
       current_dependencies: tuple[Any, ...],
       verbose: bool = False,
+      on_print: Callable[[str], None] | None = None,
   ) -> tuple[
       str,
       list[function_types.FunctionCall],
@@ -358,23 +419,99 @@ class CaMelInterpreterService(BaseModel):
       camel_value.Namespace,
       tuple[Any, ...],
   ]:
-    """Interprets the CaMeL code using the internal namespace."""
+    """Interprets the CaMeL code using the internal namespace.
+
+    `on_print` is called with the output of each `print` call, as the code
+    runs.
+    """
     if verbose:
       print(code)
 
+    print_start = self._start_run(on_print)
     # The namespace passed here is self.namespace, which is managed internally
-    interpreter_res, updated_namespace, new_tool_calls, new_dependencies = (
+    return self._process_interpreter_output(
         interpreter.parse_and_interpret_code(
             code,
             self.namespace,
             tool_calls_chain,
             current_dependencies,
             self.eval_args,
-        )
+        ),
+        print_start,
+    )
+
+  async def execute_code_async(
+      self,
+      code: str,
+      tool_calls_chain: list[function_types.FunctionCall],
+      current_dependencies: tuple[Any, ...],
+      verbose: bool = False,
+      on_print: Callable[[str], None] | None = None,
+  ) -> tuple[
+      str,
+      list[function_types.FunctionCall],
+      CaMeLException | None,
+      camel_value.Namespace,
+      tuple[Any, ...],
+  ]:
+    """Interprets the CaMeL code without blocking the running event loop.
+
+    Independent calls to tools without side effects (e.g.,
+    `query_ai_assistant` in a loop) run concurrently. `on_print` is called on
+    the running event loop with the output of each `print` call, as the code
+    runs.
+    """
+    if verbose:
+      print(code)
+
+    if on_print is not None:
+      # The code is interpreted in a worker thread.
+      on_print = functools.partial(
+          asyncio.get_running_loop().call_soon_threadsafe, on_print
+      )
+    print_start = self._start_run(on_print)
+    return self._process_interpreter_output(
+        await interpreter.parse_and_interpret_code_async(
+            code,
+            self.namespace,
+            tool_calls_chain,
+            current_dependencies,
+            self.eval_args,
+        ),
+        print_start,
+    )
+
+  def _start_run(self, on_print: Callable[[str], None] | None) -> int:
+    """Returns the offset of the output of the run in the print buffer."""
+    # Q-LLM outputs may contain the data of another session.
+    self.quarantined_llm_service.result_cache.clear()
+    print_buffer = self.eval_args.print_buffer
+    checkpoints = self.eval_args.checkpoints
+    if checkpoints is None or not checkpoints.checkpoints:
+      # No checkpoint refers to the output of the previous runs.
+      print_buffer.clear()
+    print_buffer.on_print = on_print
+    return print_buffer.tell()
+
+  def _process_interpreter_output(
+      self,
+      interpreter_output: interpreter.EvalResult,
+      print_start: int,
+  ) -> tuple[
+      str,
+      list[function_types.FunctionCall],
+      CaMeLException | None,
+      camel_value.Namespace,
+      tuple[Any, ...],
+  ]:
+    """Updates the internal namespace and formats the interpreter output."""
+    interpreter_res, updated_namespace, new_tool_calls, new_dependencies = (
+        interpreter_output
     )
     self.namespace = updated_namespace  # Update internal namespace state
 
-    printed_output = utils.extract_print_output(new_tool_calls)
+    self.eval_args.print_buffer.on_print = None
+    printed_output = self.eval_args.print_buffer.read(print_start)
     ad_tool_calls = new_tool_calls
 
     final_eval_output_str = ""
@@ -441,10 +578,26 @@ class CaMeLInterpreter(BaseAgent):
     function_calls = ctx.session.state.get("function_calls") or []
     dependencies = ctx.session.state.get("dependencies") or ()
 
-    printed_output, ad_tool_calls, error, _, dependencies = (
-        self.camel_interpreter_service.execute_code(
-            p_llm_code, function_calls, dependencies
+    # Stream what the code prints while it runs. `None` marks the end.
+    printed: asyncio.Queue[str | None] = asyncio.Queue()
+    execution = asyncio.ensure_future(
+        self.camel_interpreter_service.execute_code_async(
+            p_llm_code,
+            function_calls,
+            dependencies,
+            on_print=printed.put_nowait,
         )
+    )
+    execution.add_done_callback(lambda _: printed.put_nowait(None))
+    while (text := await printed.get()) is not None:
+      yield Event(
+          author=self.name,
+          content=types.Content(role=self.name, parts=[types.Part(text=text)]),
+          # Partial events are only shown, and not stored in the session.
+          partial=True,
+      )
+    printed_output, ad_tool_calls, error, _, dependencies = (
+        execution.result()
     )  # printed_output, ad_tool_calls, error, namespace, dependencies
 
     ctx.session.state.update(dict(function_calls=ad_tool_calls))
@@ -516,6 +669,9 @@ class CaMeLAgent(BaseAgent):
         eval_args=interpreter.EvalArgs(
             eval_mode=eval_mode,
             security_policy_engine=security_policy_engine,
+            # Programs regenerated after an error resume from the statements
+            # they share with the failed one.
+            checkpoints=interpreter.Checkpoints(),
         ),
     )
     camel_interpreter_agent = CaMeLInterpreter(
@@ -585,3 +741,14 @@ class CaMeLAgent(BaseAgent):
     except Exception as e:
       print(f"CaMeL agent failed: {e}", end="\n")
       raise e
+    finally:
+      # The next request must not resume from the programs of this one.
+      self.camel_interpreter_agent.camel_interpreter_service.clear_checkpoints()
+
+  async def close(self) -> None:
+    """Releases the resources kept between requests.
+
+    ADK agents have no shutdown hook, so applications running the agent call
+    this when shutting down, e.g. after closing their `Runner`.
+    """
+    await self.camel_interpreter_agent.camel_interpreter_service.close()
@@ -14,15 +14,8 @@
 
 """Utils for CaMeL agent implementation."""
 
-from collections.abc import Iterable
-
 from google.genai import types
 
-from ..camel_library import function_types
-
-
-FunctionCall = function_types.FunctionCall
-
 
 def sanitized_part(part: types.Part) -> str:
   """Returns a sanitized string representation of expected response parts."""
@@ -51,15 +44,3 @@ def sanitized_part(part: types.Part) -> str:
     )
   return ""
 
-
-def extract_print_output(
-    tool_calls: Iterable[FunctionCall],
-) -> str:
-  """Extracts and concatenates arguments from print calls."""
-
-  printed_output = ""
-  print_calls = [tc for tc in tool_calls if tc.function == "print"]
-  for print_call in print_calls:
-    for arg_value in print_call.args.values():
-      printed_output += str(arg_value)
-  return printed_output
@@ -15,6 +15,7 @@
 """Module containing definitions for the capabilities in CaMeL."""
 
 import dataclasses
+import functools
 from typing import Any, Self
 
 from . import readers
@@ -36,10 +37,15 @@ class Capabilities:
         ^ hash(tuple(self.other_metadata.items()))
     )
 
+  # The common capabilities are interned, as they are attached to most values.
+  # They are shared, so their `other_metadata` must not be mutated.
+
   @classmethod
+  @functools.cache
   def default(cls) -> Self:
     return cls(frozenset({sources.SourceEnum.USER}), readers.Public())
 
   @classmethod
+  @functools.cache
   def camel(cls) -> Self:
     return cls(frozenset({sources.SourceEnum.CAMEL}), readers.Public())
@@ -15,12 +15,22 @@
 """Module containining definitions for data readers."""
 
 import dataclasses
-from typing import TypeAlias, TypeVar
+from typing import ClassVar, TypeAlias, TypeVar
 
 
 @dataclasses.dataclass(frozen=True)
 class Public:
-  """Annotation for data that are publicly readable."""
+  """Annotation for data that are publicly readable.
+
+  `Public()` always returns the same instance.
+  """
+
+  _instance: ClassVar["Public | None"] = None
+
+  def __new__(cls) -> "Public":
+    if cls._instance is None:
+      cls._instance = super().__new__(cls)
+    return cls._instance
 
   def __hash__(self) -> int:
     """Hash for Public readers."""
@@ -14,7 +14,7 @@
 
 """Utility functions for capabilities."""
 
-from typing import Any, Protocol
+from typing import Any, NamedTuple, Protocol
 from . import capabilities
 from . import readers
 from . import sources
@@ -33,6 +33,72 @@ class HasDependenciesAndCapabilities(Protocol):
     ...
 
 
+class _Summary(NamedTuple):
+  """Readers and sources of a value and of its whole dependency graph."""
+
+  readers: readers.Readers[Any]
+  sources: frozenset[sources.Source]
+
+
+def _summarize(
+    value: HasDependenciesAndCapabilities, in_progress: set[int]
+) -> tuple[_Summary, camel_value.Versions, bool]:
+  """Computes the summary of a value, memoizing it on the value.
+
+  The summary is the intersection of the readers and the union of the sources
+  of all the values reachable from `value`. It is cached on the value with the
+  versions of the mutable values whose contents the graph was walked through
+  (see `camel_value.Versions`), and reused until one of them is mutated, so
+  shared subgraphs are only walked once.
+
+  Args:
+    value: The value to summarize.
+    in_progress: The ids of the values whose summary is being computed, used to
+      catch circular dependencies.
+
+  Returns:
+    The summary, the versions it depends on, and whether it is complete.
+    Summaries that were cut short by a circular dependency are not cached.
+  """
+  value_capabilities = value.capabilities
+  if value_capabilities is None:
+    return _Summary(frozenset(), frozenset()), (), True
+  cached = getattr(value, "_capabilities_summary", None)
+  if cached is not None and camel_value.are_current(cached[0]):
+    return cached[1], cached[0], True
+  value_readers = value_capabilities.readers_set
+  value_sources = value_capabilities.sources_set
+  if id(value) in in_progress:
+    # Catch circular dependencies. The dependencies of `value` are already
+    # being accounted for further up.
+    return _Summary(value_readers, value_sources), (), False
+  in_progress.add(id(value))
+  complete = True
+  dependencies = value.get_dependencies()[0]
+  versions = [camel_value.get_dependencies_versions(value)]
+  for dependency in dependencies:
+    if dependency == readers.Public():
+      # Tools list `Public()` as a dependency of their outputs, to not restrict
+      # their readers. It has no capabilities of its own.
+      continue
+    dependency_summary, dependency_versions, dependency_complete = _summarize(
+        dependency, in_progress
+    )
+    value_readers &= dependency_summary.readers
+    value_sources |= dependency_summary.sources
+    versions.append(dependency_versions)
+    complete = complete and dependency_complete
+  in_progress.remove(id(value))
+  summary = _Summary(value_readers, value_sources)
+  merged_versions = camel_value.merge_versions(*versions)
+  if complete:
+    try:
+      value._capabilities_summary = (merged_versions, summary)  # pylint: disable=protected-access
+    except AttributeError:
+      pass
+  return summary, merged_versions, complete
+
+
 def get_all_readers(
     value: HasDependenciesAndCapabilities,
     visited_objects: frozenset[int] = frozenset(),
@@ -49,19 +115,11 @@ def get_all_readers(
   value_capabilities = value.capabilities
   if value_capabilities is None:
     return frozenset(), frozenset()
-  value_readers = value_capabilities.readers_set
   if id(value) in visited_objects:
     # Catch circular dependencies.
-    return value_readers, visited_objects
-  for dependency in value.get_dependencies()[0]:
-    if dependency == readers.Public():
-      continue
-    new_value_readers, visited_objects = get_all_readers(
-        dependency, visited_objects | {id(value)}
-    )
-    if new_value_readers is not None:
-      value_readers &= new_value_readers
-  return value_readers, visited_objects | {id(value)}
+    return value_capabilities.readers_set, visited_objects
+  summary, _, _ = _summarize(value, set(visited_objects))
+  return summary.readers, visited_objects | {id(value)}
 
 
 def is_public(value: HasDependenciesAndCapabilities):
@@ -97,16 +155,11 @@ def get_all_sources(
   value_capabilities = value.capabilities
   if value_capabilities is None:
     return frozenset(), frozenset()
-  value_sources = value_capabilities.sources_set
   # Catch circular dependencies.
   if id(value) in visited_objects:
-    return value_sources, visited_objects
-  for dependency in value.get_dependencies()[0]:
-    new_value_sources, visited_objects = get_all_sources(
-        dependency, visited_objects | {id(value)}
-    )
-    value_sources |= new_value_sources
-  return value_sources, visited_objects
+    return value_capabilities.sources_set, visited_objects
+  summary, _, _ = _summarize(value, set(visited_objects))
+  return summary.sources, visited_objects
 
 
 _TRUSTED_SET = frozenset({
@@ -15,12 +15,18 @@
 """CaMeL values."""
 
 import ast
-from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping, MutableSequence, Sequence
+import asyncio
+import bisect
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Mapping, MutableMapping, MutableSequence, Sequence
+import concurrent.futures
 import copy
 import dataclasses
 import enum
+import functools
+import inspect
+import itertools
 import types
-from typing import Any, Generic, Protocol, Self, TypeVar, runtime_checkable
+from typing import Any, Generic, NamedTuple, Protocol, Self, TypeVar, runtime_checkable
 
 import pydantic
 
@@ -29,34 +35,361 @@ from ..capabilities import readers
 from ..capabilities import sources
 
 
+_MAX_NAMESPACE_DEPTH = 8
+
+
 @dataclasses.dataclass(frozen=True)
 class Namespace:
-  """A namespace for variables in CaMeL."""
+  """A namespace for variables in CaMeL.
 
-  variables: dict[str, "Value"] = dataclasses.field(default_factory=dict)
+  Namespaces are persistent: `add_variables` returns a namespace that only
+  stores the new variables and looks up the other ones in its parent, so that
+  entering a scope doesn't copy the (many) built-in variables. When the chain
+  of parents gets longer than `_MAX_NAMESPACE_DEPTH`, the scopes above the
+  root namespace are merged, to keep lookups fast.
+  """
 
-  def add_variables(self, variables: dict[str, "Value"]) -> Self:
-    """Creates a copy of this adding the variables passed as argument."""
-    return dataclasses.replace(self, variables=self.variables | variables)
+  variables: dict[str, "Value | None"] = dataclasses.field(
+      default_factory=dict
+  )
+  """The variables of this scope. `None` marks a variable of a parent scope
+  as deleted."""
+  parent: "Namespace | None" = None
+  depth: int = dataclasses.field(default=0, init=False, compare=False)
+
+  def __post_init__(self):
+    if self.parent is not None:
+      object.__setattr__(self, "depth", self.parent.depth + 1)
+
+  def add_variables(self, variables: dict[str, "Value | None"]) -> Self:
+    """Creates a child of this adding the variables passed as argument."""
+    if self.depth < _MAX_NAMESPACE_DEPTH:
+      return dataclasses.replace(self, variables=dict(variables), parent=self)
+    scopes = []
+    root = self
+    while root.parent is not None:
+      scopes.append(root.variables)
+      root = root.parent
+    merged_variables = {}
+    for scope in reversed(scopes):
+      merged_variables |= scope
+    merged_variables |= variables
+    return dataclasses.replace(self, variables=merged_variables, parent=root)
 
   def set_variable(self, name: str, value: "Value") -> None:
     self.variables[name] = value
 
+  def delete_variable(self, name: str) -> None:
+    if self.parent is not None and name in self.parent:
+      self.variables[name] = None
+    else:
+      del self.variables[name]
+
   def get(self, name: str) -> "Value | None":
-    return self.variables.get(name)
+    namespace = self
+    while namespace is not None:
+      if name in namespace.variables:
+        return namespace.variables[name]
+      namespace = namespace.parent
+    return None
+
+  def __contains__(self, name: str) -> bool:
+    return self.get(name) is not None
+
+  def all_variables(self) -> dict[str, "Value"]:
+    """Returns all the variables visible from this namespace."""
+    scopes = []
+    namespace = self
+    while namespace is not None:
+      scopes.append(namespace.variables)
+      namespace = namespace.parent
+    all_variables = {}
+    for scope in reversed(scopes):
+      all_variables |= scope
+    return {k: v for k, v in all_variables.items() if v is not None}
 
 
 _T = TypeVar("_T", bound=Any)
 
 
+_mutation_epoch = 0
+
+
+def mutation_epoch() -> int:
+  """Returns a counter that is incremented every time any value is mutated.
+
+  Information derived from the dependency graph of a value is cached with the
+  versions of the values it depends on instead (see `Versions`), so that it is
+  not invalidated by mutations of unrelated values.
+  """
+  return _mutation_epoch
+
+
+def record_mutation() -> None:
+  """Increments the mutation epoch."""
+  global _mutation_epoch
+  _mutation_epoch += 1
+
+
+class _Version:
+  """Counter of the mutations of the contents of a value."""
+
+  __slots__ = ("count",)
+
+  def __init__(self) -> None:
+    self.count = 0
+
+
+Versions = tuple[tuple[_Version, int], ...]
+"""The versions of the contents of mutable values, when some information
+derived from them was computed."""
+
+
+class _Mutable:
+  """Mixin of the values whose contents can be mutated in place.
+
+  The copies of a value share its contents, so they also share its version. It
+  is only created when the value is copied or its version is read, as values
+  are usually never mutated.
+  """
+
+  __slots__ = ()
+
+  def _get_version(self) -> _Version:
+    version = getattr(self, "_version", None)
+    if version is None:
+      version = self._version = _Version()
+    return version
+
+  def _record_mutation(self) -> None:
+    """Invalidates the information derived from the contents of the value."""
+    version = getattr(self, "_version", None)
+    if version is not None:
+      version.count += 1
+    record_mutation()
+
+  def __copy__(self) -> Self:
+    self._get_version()
+    return super().__copy__()  # type: ignore
+
+
+def get_versions(values: Iterable[Any]) -> Versions:
+  """Returns the current versions of the mutable values in `values`."""
+  return tuple(
+      (version, version.count)
+      for version in (
+          value._get_version()  # pylint: disable=protected-access
+          for value in values
+          if isinstance(value, _Mutable)
+      )
+  )
+
+
+def merge_versions(*versions: Versions) -> Versions:
+  """Returns the versions in any of `versions`, without duplicates."""
+  return tuple(dict(itertools.chain.from_iterable(versions)).items())
+
+
+def are_current(versions: Versions) -> bool:
+  """Returns whether none of the values was mutated since `versions`."""
+  return all(version.count == count for version, count in versions)
+
+
+def get_dependencies_versions(value: Any) -> Versions:
+  """Returns the versions `value.get_dependencies()` was last computed with.
+
+  Args:
+      value: The value, whose `get_dependencies()` was called without visited
+        objects.
+
+  Returns:
+      The versions of the mutable values whose contents the dependencies of
+      `value` were collected from. Values that don't cache their dependencies
+      don't depend on any contents.
+  """
+  cached = getattr(value, "_dependencies_closure", None)
+  return () if cached is None else cached[0]
+
+
+def _add_dependencies(
+    collected: dict[int, "Value"], dependencies: Iterable["Value"]
+) -> None:
+  """Adds the dependencies to the ones collected so far, keyed by id."""
+  for dependency in dependencies:
+    collected.setdefault(id(dependency), dependency)
+
+
+_CACHE_SLOTS = frozenset({
+    "_capabilities_summary",
+    "_dependencies_closure",
+    "_dependencies_holder",
+    "_elements_holder",
+    "_keys_dependencies_holder",
+})
+"""Slots of values holding cached information, which copies start without."""
+
+_UNSET = object()
+
+
+@functools.cache
+def _copied_slots(cls: type) -> tuple[str, ...]:
+  """Returns the slots that are copied with the values of `cls`.
+
+  Slots that the class overrides (e.g., with a property) are left out.
+
+  Args:
+      cls: The class of the values.
+
+  Returns:
+      The names of the slots.
+  """
+  return tuple(
+      name
+      for klass in reversed(cls.__mro__)
+      for name in klass.__dict__.get("__slots__", ())
+      if name not in _CACHE_SLOTS
+      and getattr(cls, name, None) is klass.__dict__[name]
+  )
+
+
+def _copy_slots(value: _T, names: Iterable[str]) -> _T:
+  """Returns a copy of `value` with the slots in `names` that are set."""
+  new_value = object.__new__(type(value))
+  for name in names:
+    attr = getattr(value, name, _UNSET)
+    if attr is not _UNSET:
+      setattr(new_value, name, attr)
+  return new_value
+
+
+class _LazyContents:
+  """The contents of a container value, converted from raw on first access.
+
+  The contents are shared by all the copies of the value (e.g., the ones made by
+  `new_with_dependencies`), so that they all see the same converted values, as
+  they would if the value had been converted eagerly.
+  """
+
+  __slots__ = ("_raw_value", "_namespace", "_convert", "_python_value")
+
+  def __init__(
+      self,
+      raw_value: Any,
+      namespace: "Namespace",
+      convert: Callable[[], Any],
+  ) -> None:
+    self._raw_value = raw_value
+    self._namespace = namespace
+    self._convert: Callable[[], Any] | None = convert
+    self._python_value: Any = None
+
+  @property
+  def converted(self) -> bool:
+    return self._convert is None
+
+  def get(self) -> Any:
+    if self._convert is not None:
+      self._python_value = self._convert()
+      self._convert = None
+      self._raw_value = self._namespace = None
+    return self._python_value
+
+  def raw(self) -> Any:
+    """Returns the `raw` of the converted contents, without converting them."""
+    return _raw_from_raw(self._raw_value, self._namespace)
+
+
+class _LazyContainer:
+  """Mixin for container values that can convert their contents lazily.
+
+  A lazy value is created without `python_value`, which is converted from the
+  raw contents the first time it is accessed. The values converted from the
+  contents have no dependencies, so the dependencies of a value whose contents
+  have not been converted yet are just its outer dependencies.
+
+  The classes that can be created lazily declare a `_lazy_contents` slot and
+  initialize it to `None`.
+  """
+
+  __slots__ = ()
+
+  _lazy_contents: _LazyContents | None = None
+
+  @classmethod
+  def from_raw_contents(
+      cls,
+      raw_value: Any,
+      capabilities: camel_capabilities.Capabilities,
+      namespace: "Namespace",
+      dependencies: tuple["Value", ...],
+      convert: Callable[[], Any],
+  ) -> Self:
+    """Creates a value whose `python_value` is computed by `convert` on demand.
+
+    Args:
+        raw_value: The raw contents of the value. They must not be mutated
+          after the value is created, so they are usually a copy.
+        capabilities: The capabilities of the value.
+        namespace: The namespace to convert the contents in.
+        dependencies: The dependencies of the value.
+        convert: Converts `raw_value` to the `python_value` of the value, with
+          `value_from_raw` and no dependencies.
+
+    Returns:
+        The value.
+    """
+    value = cls((), capabilities, dependencies)
+    del value.python_value
+    value._lazy_contents = _LazyContents(raw_value, namespace, convert)
+    return value
+
+  def __getattr__(self, name: str) -> Any:
+    lazy_contents = self._lazy_contents if name == "python_value" else None
+    if lazy_contents is None:
+      raise AttributeError(
+          f"{type(self).__name__!r} object has no attribute {name!r}"
+      )
+    self.python_value = python_value = lazy_contents.get()
+    return python_value
+
+  def _has_unconverted_contents(self) -> bool:
+    lazy_contents = self._lazy_contents
+    return lazy_contents is not None and not lazy_contents.converted
+
+  def __copy__(self) -> Self:
+    names = _copied_slots(type(self))
+    if self._has_unconverted_contents():
+      # Getting `python_value` would convert the contents.
+      names = tuple(name for name in names if name != "python_value")
+    return _copy_slots(self, names)
+
+  def new_with_python_value(self, value: Any) -> Self:
+    new_self = super().new_with_python_value(value)  # type: ignore
+    if new_self._lazy_contents is not None:
+      new_self._lazy_contents = None
+    return new_self
+
+
 @runtime_checkable
 class Value(Generic[_T], Protocol):
   """A value in CaMeL."""
 
+  __slots__ = (
+      "python_value",
+      "_capabilities",
+      "outer_dependencies",
+      "_capabilities_summary",
+      "_dependencies_closure",
+      "_dependencies_holder",
+  )
+
   python_value: _T
   _capabilities: camel_capabilities.Capabilities
   outer_dependencies: tuple["Value", ...]
   is_builtin: bool = False
+  _capabilities_summary: tuple[Versions, Any] | None
+  """Cached summary of the capabilities of the dependency graph, and the
+  versions it was computed with. See `capabilities.utils`."""
 
   def __repr__(self) -> str:
     return self._repr_helper(indent_level=0)
@@ -73,11 +406,79 @@ class Value(Generic[_T], Protocol):
   {next_indent}dependencies=...
   {indent})"""
 
+  _dependencies_closure: (
+      tuple[Versions, tuple["Value", ...], frozenset[int]] | None
+  )
+  """Cached result of `get_dependencies()` for values containing other values,
+  and the versions of the values it was collected from."""
+  _dependencies_holder: "CaMeLNone | None"
+
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
     return self.outer_dependencies, frozenset({id(self)})
 
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    """Adds the dependencies of this value to `collected`, keyed by id.
+
+    Values containing other values override this to also collect the
+    dependencies of the values they contain, unless already `visited`.
+
+    Args:
+        visited: The values whose contents have been collected, by id. The
+          values are kept so that their ids can't be reused while collecting.
+        collected: The dependencies collected so far, by id.
+    """
+    _add_dependencies(collected, self.outer_dependencies)
+    visited.setdefault(id(self), self)
+
+  def _get_dependencies_closure(
+      self, visited_objects: frozenset[int]
+  ) -> tuple[tuple["Value", ...], frozenset[int]]:
+    """Implements `get_dependencies` with `_collect_dependencies`.
+
+    The dependencies are deduplicated, and the result of a call without
+    visited objects is cached until the contents of one of the values they
+    were collected from are mutated.
+
+    Args:
+        visited_objects: The ids of the values whose contents must not be
+          collected.
+
+    Returns:
+        The dependencies and the ids of the visited values.
+    """
+    cached = getattr(self, "_dependencies_closure", None)
+    if not visited_objects and cached is not None and are_current(cached[0]):
+      return cached[1], cached[2]
+    visited: dict[int, Value | None] = dict.fromkeys(visited_objects)
+    collected: dict[int, Value] = {}
+    self._collect_dependencies(visited, collected)
+    dependencies = tuple(collected.values())
+    visited_ids = frozenset(visited)
+    if not visited_objects:
+      self._dependencies_closure = (
+          get_versions(visited.values()),
+          dependencies,
+          visited_ids,
+      )
+    return dependencies, visited_ids
+
+  def _dependencies_value(self) -> "CaMeLNone":
+    """Returns a value depending on `get_dependencies()`, cached like it.
+
+    Depending on it rather than on each of the dependencies avoids copying them
+    into every value derived from the contents of a large value.
+    """
+    dependencies, _ = self.get_dependencies()
+    cached = getattr(self, "_dependencies_holder", None)
+    if cached is None or cached.outer_dependencies is not dependencies:
+      cached = CaMeLNone(camel_capabilities.Capabilities.camel(), dependencies)
+      self._dependencies_holder = cached
+    return cached
+
   @property
   def capabilities(self) -> camel_capabilities.Capabilities:
     return self._capabilities
@@ -92,6 +493,10 @@ class Value(Generic[_T], Protocol):
         and self.outer_dependencies == other.outer_dependencies
     )
 
+  def __copy__(self) -> Self:
+    # Copies start without the information cached on the original.
+    return _copy_slots(self, _copied_slots(type(self)))
+
   def new_with_python_value(self, value: _T) -> Self:
     new_self = copy.copy(self)
     new_self.python_value = value
@@ -189,6 +594,8 @@ _RT = TypeVar("_RT", bound=Value)
 @runtime_checkable
 class SupportsAdd(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def add(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -196,6 +603,8 @@ class SupportsAdd(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsSub(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def sub(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -203,6 +612,8 @@ class SupportsSub(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsMult(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def mult(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -210,6 +621,8 @@ class SupportsMult(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsTrueDiv(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def truediv(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -217,6 +630,8 @@ class SupportsTrueDiv(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsFloorDiv(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def floor_div(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -224,6 +639,8 @@ class SupportsFloorDiv(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsMod(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def mod(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -231,6 +648,8 @@ class SupportsMod(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsPow(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def pow(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -238,6 +657,8 @@ class SupportsPow(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsLShift(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def l_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -245,6 +666,8 @@ class SupportsLShift(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRShift(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -252,6 +675,8 @@ class SupportsRShift(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsBitOr(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def bit_or(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -259,6 +684,8 @@ class SupportsBitOr(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsBitXor(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def bit_xor(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -266,6 +693,8 @@ class SupportsBitXor(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsBitAnd(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def bit_and(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -273,6 +702,8 @@ class SupportsBitAnd(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRAdd(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_add(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -280,6 +711,8 @@ class SupportsRAdd(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRSub(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_sub(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -287,6 +720,8 @@ class SupportsRSub(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRMult(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_mult(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -294,6 +729,8 @@ class SupportsRMult(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRTrueDiv(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_truediv(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -301,6 +738,8 @@ class SupportsRTrueDiv(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRFloorDiv(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_floor_div(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -308,6 +747,8 @@ class SupportsRFloorDiv(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRMod(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_mod(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -315,6 +756,8 @@ class SupportsRMod(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRPow(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_pow(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -322,6 +765,8 @@ class SupportsRPow(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRLShift(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_l_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -329,6 +774,8 @@ class SupportsRLShift(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRRShift(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_r_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -336,6 +783,8 @@ class SupportsRRShift(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRBitOr(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_bit_or(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -343,6 +792,8 @@ class SupportsRBitOr(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRBitXor(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_bit_xor(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -350,6 +801,8 @@ class SupportsRBitXor(Generic[_RT], Protocol):
 @runtime_checkable
 class SupportsRBitAnd(Generic[_RT], Protocol):
 
+  __slots__ = ()
+
   def r_bit_and(self, other: Value) -> _RT | types.NotImplementedType:
     ...
 
@@ -375,6 +828,8 @@ _CT = TypeVar("_CT", bound=PythonComparable)
 
 class TotallyOrdered(Value[_CT]):
 
+  __slots__ = ()
+
   def cmp(self, y: Self) -> "CaMeLInt":
     if self.raw > y.raw:
       return CaMeLInt(1, camel_capabilities.Capabilities.camel(), (self, y))
@@ -386,6 +841,8 @@ class TotallyOrdered(Value[_CT]):
 @runtime_checkable
 class HasAttrs(Generic[_T], Value[_T], Protocol):
 
+  __slots__ = ()
+
   def attr(self, name: str) -> Value | None:
     ...
 
@@ -396,6 +853,8 @@ class HasAttrs(Generic[_T], Value[_T], Protocol):
 @runtime_checkable
 class HasSetField(Generic[_T], HasAttrs[_T], Protocol):
 
+  __slots__ = ()
+
   def set_field(self, name: str, value: Value) -> "CaMeLNone":
     ...
 
@@ -404,15 +863,36 @@ class FunctionCallWithSideEffectError(Exception):
   ...
 
 
+async def _await(awaitable: Awaitable[_T]) -> _T:
+  return await awaitable
+
+
+def _run_to_completion(awaitable: Awaitable[_T]) -> _T:
+  """Runs `awaitable` to completion in a new event loop.
+
+  A thread can only run one event loop at a time, so if one is already running
+  (e.g., the sync interpreter is called from a coroutine), the new loop runs in
+  a worker thread.
+  """
+  try:
+    asyncio.get_running_loop()
+  except RuntimeError:
+    return asyncio.run(_await(awaitable))
+  with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    return executor.submit(asyncio.run, _await(awaitable)).result()
+
+
 @runtime_checkable
 class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
   """Represents a callable value in CaMeL."""
 
+  __slots__ = ("_name", "_recv", "_bound_python_value")
+
   python_value: Callable[..., _T]
   _capabilities: camel_capabilities.Capabilities
   _name: str
   _recv: Value | None
-  _bound_python_value: Callable[..., _T] | None = None
+  _bound_python_value: Callable[..., _T] | None
   is_class_method: bool = False
 
   def name(self) -> "CaMeLStr":
@@ -453,6 +933,91 @@ class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
         (self, args, kwargs),
     )
 
+  def _check_no_side_effects(
+      self,
+      args: "CaMeLTuple",
+      kwargs: "CaMeLDict[CaMeLStr, Value]",
+      raw_args: tuple[Any, ...],
+      raw_kwargs: dict[str, Any],
+  ) -> None:
+    if args.raw != raw_args or kwargs.raw != raw_kwargs:
+      raise FunctionCallWithSideEffectError(
+          "Call to a function or method with side-effects detected. "
+          "Use functions and methods that have no side-effects. "
+          "For example, instead of `list.append`, use list comprehensions "
+          "or the [*l, new_element] syntax."
+      )
+
+  def invoke(
+      self, args: "CaMeLTuple", kwargs: "CaMeLDict[CaMeLStr, Value]"
+  ) -> _T:
+    """Calls the Python callable with the raw arguments.
+
+    If the callable returns an awaitable (e.g., it is a coroutine function), it
+    is run to completion in a new event loop, in a worker thread if an event
+    loop is already running.
+
+    Args:
+        args: The positional arguments to pass to the callable.
+        kwargs: The keyword arguments to pass to the callable.
+
+    Returns:
+        The raw output of the callable.
+
+    Raises:
+        FunctionCallWithSideEffectError: If the call has side effects.
+    """
+    raw_args = args.raw
+    raw_kwargs = kwargs.raw
+    output = self.python_value(*raw_args, **raw_kwargs)
+    if inspect.isawaitable(output):
+      output = _run_to_completion(output)
+    self._check_no_side_effects(args, kwargs, raw_args, raw_kwargs)
+    return output
+
+  async def invoke_async(
+      self, args: "CaMeLTuple", kwargs: "CaMeLDict[CaMeLStr, Value]"
+  ) -> _T:
+    """Like `invoke`, but awaits the output of the callable.
+
+    Synchronous callables are run in a worker thread, so that concurrent calls
+    don't block each other nor the event loop.
+
+    Args:
+        args: The positional arguments to pass to the callable.
+        kwargs: The keyword arguments to pass to the callable.
+
+    Returns:
+        The raw output of the callable.
+
+    Raises:
+        FunctionCallWithSideEffectError: If the call has side effects.
+    """
+    raw_args = args.raw
+    raw_kwargs = kwargs.raw
+    if inspect.iscoroutinefunction(self.python_value):
+      output = await self.python_value(*raw_args, **raw_kwargs)
+    else:
+      output = await asyncio.to_thread(
+          self.python_value, *raw_args, **raw_kwargs
+      )
+      if inspect.isawaitable(output):
+        output = await output
+    self._check_no_side_effects(args, kwargs, raw_args, raw_kwargs)
+    return output
+
+  def wrap_call_output(
+      self,
+      output: _T,
+      args: "CaMeLTuple",
+      kwargs: "CaMeLDict[CaMeLStr, Value]",
+      namespace: Namespace,
+  ) -> tuple[Value[_T], dict[str, Any]]:
+    """Wraps the raw output of `invoke` as the result of `call`."""
+    wrapped_output = self.wrap_output(output, args, kwargs, namespace)
+    args_by_keyword = self._make_args_by_keyword(args, kwargs)
+    return wrapped_output, args_by_keyword
+
   def call(
       self,
       args: "CaMeLTuple",
@@ -474,19 +1039,8 @@ class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
     Raises:
         FunctionCallWithSideEffectError: If the call has side effects.
     """
-    raw_args = args.raw
-    raw_kwargs = kwargs.raw
-    output = self.python_value(*raw_args, **raw_kwargs)
-    if args.raw != raw_args or kwargs.raw != raw_kwargs:
-      raise FunctionCallWithSideEffectError(
-          "Call to a function or method with side-effects detected. "
-          "Use functions and methods that have no side-effects. "
-          "For example, instead of `list.append`, use list comprehensions "
-          "or the [*l, new_element] syntax."
-      )
-    wrapped_output = self.wrap_output(output, args, kwargs, namespace)
-    args_by_keyword = self._make_args_by_keyword(args, kwargs)
-    return wrapped_output, args_by_keyword
+    output = self.invoke(args, kwargs)
+    return self.wrap_call_output(output, args, kwargs, namespace)
 
   def bind_recv(self, recv: Value):
     self._recv = recv
@@ -513,21 +1067,27 @@ class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
 _IT = TypeVar("_IT", bound=Iterable)
 
 
-class CaMeLIterable(Generic[_IT, _V], Value[_IT]):
+class CaMeLIterable(Generic[_IT, _V], _LazyContainer, Value[_IT]):
   """Represents an iterable value in CaMeL."""
 
+  __slots__ = ()
+
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    dependencies = self.outer_dependencies
-    if id(self) in visited_objects:
-      return dependencies, visited_objects
+    return self._get_dependencies_closure(visited_objects)
+
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    if id(self) in visited:
+      return
+    visited[id(self)] = self
+    if self._has_unconverted_contents():
+      return
     for el in self.python_value:
-      (new_dependencies, visited_objects) = el.get_dependencies(
-          visited_objects | {id(self)}
-      )
-      dependencies += new_dependencies
-    return dependencies, visited_objects | {id(self)}
+      el._collect_dependencies(visited, collected)  # pylint: disable=protected-access
 
   def iterate(self) -> "CaMeLIterator[_V]":
     return CaMeLIterator(
@@ -561,7 +1121,7 @@ class CaMeLIterable(Generic[_IT, _V], Value[_IT]):
     # of them (i.e., that none of them is `other`).
     return CaMeLFalse(
         camel_capabilities.Capabilities.camel(),
-        (*self.get_dependencies()[0], other),
+        (self._dependencies_value(), other),
     )
 
 
@@ -571,6 +1131,8 @@ _ST = TypeVar("_ST", bound=Sequence[Value])
 class CaMeLSequence(Generic[_ST, _V], CaMeLIterable[_ST, _V]):
   """Represents a sequence value in CaMeL."""
 
+  __slots__ = ("_elements_holder",)
+
   python_value: _ST
 
   def index(self, index: "CaMeLInt") -> _V:
@@ -588,28 +1150,55 @@ class CaMeLSequence(Generic[_ST, _V], CaMeLIterable[_ST, _V]):
         (self, start, end, step)
     )
 
+  _elements_holder: tuple[Versions, _ST, "CaMeLNone"] | None
+
+  def _elements_value(self) -> "CaMeLNone":
+    """Returns a value depending on the elements, cached until they change."""
+    cached = getattr(self, "_elements_holder", None)
+    if (
+        cached is None
+        or not are_current(cached[0])
+        or cached[1] is not self.python_value
+    ):
+      holder = CaMeLNone(
+          camel_capabilities.Capabilities.camel(), tuple(self.python_value)
+      )
+      cached = self._elements_holder = (
+          get_versions((self,)),
+          self.python_value,
+          holder,
+      )
+    return cached[2]
+
   def len(self) -> "CaMeLInt":
     return CaMeLInt(
         len(self.python_value),
         camel_capabilities.Capabilities.camel(),
-        (self, *self.python_value),
+        (self, self._elements_value()),
     )
 
 
 _MCT = TypeVar("_MCT", bound=MutableSequence[Value])
 
 
-class CaMeLMutableSequence(Generic[_MCT, _V], CaMeLSequence[_MCT, _V]):
+class CaMeLMutableSequence(
+    _Mutable, Generic[_MCT, _V], CaMeLSequence[_MCT, _V]
+):
   """Represents a mutable sequence value in CaMeL."""
 
+  __slots__ = ()
+
   def set_index(self, index: "CaMeLInt", value: _V) -> "CaMeLNone":
     self.python_value[index.raw] = value
+    self._record_mutation()
     return CaMeLNone(camel_capabilities.Capabilities.camel(), (self, index))
 
 
 class CaMeLIterator(Generic[_V], Value[Iterator[_V]]):
   """Represents an iterator value in CaMeL."""
 
+  __slots__ = ()
+
   def freeze(self) -> "CaMeLNone":
     return CaMeLNone(
         camel_capabilities.Capabilities.camel(), (self,)
@@ -634,25 +1223,59 @@ _KV = TypeVar("_KV", bound=Value)
 _VV = TypeVar("_VV", bound=Value)
 
 
-class CaMeLMapping(Generic[_MT, _KV, _VV], Value[_MT]):
+class CaMeLMapping(Generic[_MT, _KV, _VV], _LazyContainer, Value[_MT]):
   """Represents a mapping value in CaMeL."""
 
+  __slots__ = ("_raw_keys_index", "_keys_dependencies_holder")
+
+  _raw_keys_index: tuple[_MT, dict[Any, list[_KV]]] | None
+  """The mapping the index was built for, and its keys grouped by raw value."""
+
+  def _keys_by_raw(self) -> dict[Any, list[_KV]]:
+    """Returns the keys of the mapping grouped by their raw value.
+
+    The index is built lazily and rebuilt whenever `python_value` is replaced
+    (e.g., by `new_with_python_value`). Keys with the same raw value are kept in
+    insertion order, so the first one is the one a linear scan would find.
+
+    Returns:
+      A dictionary from raw keys to the CaMeL keys with that raw value.
+    """
+    raw_keys_index = self._raw_keys_index
+    if raw_keys_index is None or raw_keys_index[0] is not self.python_value:
+      keys: dict[Any, list[_KV]] = {}
+      for k in self.python_value:
+        keys.setdefault(k.raw, []).append(k)
+      raw_keys_index = self._raw_keys_index = (self.python_value, keys)
+    return raw_keys_index[1]
+
+  def _find_key(self, key: Value) -> _KV | None:
+    try:
+      keys = self._keys_by_raw().get(key.raw)
+    except TypeError:  # Unhashable keys can't be in the mapping.
+      return None
+    return keys[0] if keys else None
+
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    dependencies = self.outer_dependencies
-    if id(self) in visited_objects:
-      return dependencies, visited_objects
-    visited_objects |= {id(self)}
+    return self._get_dependencies_closure(visited_objects)
+
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    if id(self) in visited:
+      return
+    visited[id(self)] = self
+    if self._has_unconverted_contents():
+      return
     for k, v in self.python_value.items():
-      k_dependencies, k_visited_objects = k.get_dependencies(visited_objects)
-      v_dependencies, v_visited_objects = v.get_dependencies(k_visited_objects)
-      dependencies += k_dependencies + v_dependencies
-      visited_objects = v_visited_objects
-    return dependencies, visited_objects
+      k._collect_dependencies(visited, collected)  # pylint: disable=protected-access
+      v._collect_dependencies(visited, collected)  # pylint: disable=protected-access
 
   def get(self, key: _KV) -> _VV:
-    dict_key = next((el for el in self.iterate_python() if el.eq(key)), None)
+    dict_key = self._find_key(key)
     if dict_key is None:
       raise KeyError(key)
     return self.python_value[dict_key].new_with_dependencies((self, key))
@@ -701,31 +1324,57 @@ class CaMeLMapping(Generic[_MT, _KV, _VV], Value[_MT]):
         A CaMeLBool indicating whether the mapping contains the value.
     """
     dependencies = [self, other]
-    inner_element = next(
-        (el for el in self.iterate_python() if el.eq(other)), None
-    )
+    inner_element = self._find_key(other)
     if inner_element is not None:
       return CaMeLTrue(
           camel_capabilities.Capabilities.camel(),
           (*dependencies, inner_element),
       )
-    keys_dependencies = []
-    for k in self.iterate_python():
-      keys_dependencies.extend(k.get_dependencies()[0])
     return CaMeLFalse(
         camel_capabilities.Capabilities.camel(),
-        (*dependencies, *keys_dependencies),
+        (*dependencies, self._keys_dependencies_value()),
     )
 
+  _keys_dependencies_holder: tuple[Versions, _MT, "CaMeLNone"] | None
+
+  def _keys_dependencies_value(self) -> "CaMeLNone":
+    """Returns a value depending on the dependencies of the keys.
+
+    The value is cached until the mapping changes.
+
+    Returns:
+        The value.
+    """
+    cached = getattr(self, "_keys_dependencies_holder", None)
+    if (
+        cached is None
+        or not are_current(cached[0])
+        or cached[1] is not self.python_value
+    ):
+      collected: dict[int, Value] = {}
+      for k in self.iterate_python():
+        _add_dependencies(collected, k.get_dependencies()[0])
+      holder = CaMeLNone(
+          camel_capabilities.Capabilities.camel(), tuple(collected.values())
+      )
+      cached = self._keys_dependencies_holder = (
+          get_versions((self,)),
+          self.python_value,
+          holder,
+      )
+    return cached[2]
+
 
 _MMT = TypeVar("_MMT", bound=MutableMapping)
 
 
 class CaMeLMutableMapping(
-    Generic[_MMT, _KV, _VV], CaMeLMapping[_MMT, _KV, _VV]
+    _Mutable, Generic[_MMT, _KV, _VV], CaMeLMapping[_MMT, _KV, _VV]
 ):
   """Represents a mutable mapping value in CaMeL."""
 
+  __slots__ = ()
+
   python_value: _MMT
 
   def set_key(self, key: _KV, value: _VV) -> "CaMeLNone":
@@ -738,24 +1387,29 @@ class CaMeLMutableMapping(
     Returns:
         A CaMeLNone indicating the operation completed.
     """
-    dict_key = next(
-        (el for el in self.iterate_python() if el.eq(key).raw), None
-    )
+    dict_key = self._find_key(key)
     if dict_key is None:
-      dict_key = key
-    if key is not dict_key:
+      self.python_value[key] = value
+      self._keys_by_raw().setdefault(key.raw, []).append(key)
+    elif key is not dict_key:
       new_dict_key = dict_key.new_with_dependencies((key,))
       # Remove key value pair with key with old dependencies
       del self.python_value[dict_key]
+      self.python_value[new_dict_key] = value
+      same_raw_keys = self._keys_by_raw()[key.raw]
+      same_raw_keys.pop(0)
+      same_raw_keys.append(new_dict_key)
     else:
-      new_dict_key = dict_key
-    self.python_value[new_dict_key] = value
+      self.python_value[dict_key] = value
+    self._record_mutation()
     return CaMeLNone(camel_capabilities.Capabilities.camel(), (self,))
 
 
 class CaMeLNone(Value[None]):
   """Represents the None value in CaMeL."""
 
+  __slots__ = ()
+
   python_value = None
 
   def __init__(
@@ -773,6 +1427,8 @@ class CaMeLNone(Value[None]):
 class _Bool(TotallyOrdered[bool]):
   """Base class for CaMeL boolean values."""
 
+  __slots__ = ()
+
   python_value: bool
 
   def __bool__(self):
@@ -791,10 +1447,14 @@ class _Bool(TotallyOrdered[bool]):
 
 
 class CaMeLTrue(_Bool):  # noqa: N801
+  __slots__ = ()
+
   python_value = True
 
 
 class CaMeLFalse(_Bool):  # noqa: N801
+  __slots__ = ()
+
   python_value = False
 
 
@@ -803,6 +1463,7 @@ CaMeLBool = CaMeLTrue | CaMeLFalse
 
 @runtime_checkable
 class HasUnary(Protocol):
+  __slots__ = ()
 
   def unary(self, op: ast.unaryop) -> Self | types.NotImplementedType:
     ...
@@ -828,6 +1489,8 @@ class CaMeLFloat(
 ):
   """Represents a floating point number in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: float,
@@ -1000,6 +1663,8 @@ class CaMeLInt(
 ):
   """Represents an integer value in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: int,
@@ -1137,6 +1802,8 @@ class CaMeLInt(
 class _Char(TotallyOrdered[str]):
   """Represents a single character in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: str,
@@ -1163,6 +1830,42 @@ class _Char(TotallyOrdered[str]):
     )  # already immutable
 
 
+def _run_end(run: "_StrRun") -> int:
+  return run.end
+
+
+class _StrRun(NamedTuple):
+  """A run of consecutive characters sharing capabilities and dependencies."""
+
+  end: int
+  """The (exclusive) offset of the end of the run in the string."""
+  capabilities: camel_capabilities.Capabilities
+  """The capabilities of the characters in the run."""
+  dependencies: tuple[Value, ...]
+  """The dependencies of the characters in the run."""
+
+
+def _same_run_metadata(a: _StrRun, b: _StrRun) -> bool:
+  return (
+      a.dependencies is b.dependencies
+      or (not a.dependencies and not b.dependencies)
+  ) and a.capabilities == b.capabilities
+
+
+def _append_run(
+    runs: list[_StrRun],
+    end: int,
+    capabilities: camel_capabilities.Capabilities,
+    dependencies: tuple[Value, ...],
+) -> None:
+  """Appends a run to `runs`, merging it with the last one when possible."""
+  run = _StrRun(end, capabilities, dependencies)
+  if runs and _same_run_metadata(runs[-1], run):
+    runs[-1] = runs[-1]._replace(end=end)
+  else:
+    runs.append(run)
+
+
 class CaMeLStr(
     TotallyOrdered[tuple[_Char, ...]],
     HasAttrs,
@@ -1171,7 +1874,15 @@ class CaMeLStr(
     SupportsMult["CaMeLStr"],
     SupportsRMult["CaMeLStr"],
 ):
-  """Represents a string in CaMeL."""
+  """Represents a string in CaMeL.
+
+  The string is stored as a native Python `str` together with a run-length
+  encoded map of the capabilities and dependencies of its characters. The
+  per-character `_Char` values are only materialized when the string is indexed
+  or iterated over.
+  """
+
+  __slots__ = ("_string", "_runs", "_chars")
 
   def __init__(
       self,
@@ -1179,10 +1890,153 @@ class CaMeLStr(
       capabilities: camel_capabilities.Capabilities,
       dependencies: tuple[Value, ...],
   ) -> None:
-    self.python_value = tuple(string)
+    self.python_value = string
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
 
+  @classmethod
+  def _from_runs(
+      cls,
+      string: str,
+      runs: tuple[_StrRun, ...],
+      capabilities: camel_capabilities.Capabilities,
+      dependencies: tuple[Value, ...],
+  ) -> Self:
+    new_str = cls.__new__(cls)
+    new_str._string = string
+    new_str._runs = runs
+    new_str._chars = None
+    new_str._capabilities = capabilities
+    new_str.outer_dependencies = dependencies
+    return new_str
+
+  @classmethod
+  def concat(
+      cls,
+      strings: Iterable["CaMeLStr"],
+      capabilities: camel_capabilities.Capabilities,
+      dependencies: tuple[Value, ...],
+  ) -> Self:
+    """Concatenates `strings` preserving the characters' capabilities."""
+    parts = []
+    runs: list[_StrRun] = []
+    offset = 0
+    for s in strings:
+      parts.append(s._string)  # pylint: disable=protected-access
+      for run in s._runs:  # pylint: disable=protected-access
+        _append_run(runs, offset + run.end, run.capabilities, run.dependencies)
+      offset += len(s._string)  # pylint: disable=protected-access
+    return cls._from_runs("".join(parts), tuple(runs), capabilities, dependencies)
+
+  @property
+  def python_value(self) -> tuple[_Char, ...]:
+    if self._chars is None:
+      self._chars = tuple(self.iterate_python())
+    return self._chars
+
+  @python_value.setter
+  def python_value(self, string: Sequence[_Char]) -> None:
+    chars = tuple(string)
+    runs: list[_StrRun] = []
+    for i, c in enumerate(chars):
+      _append_run(runs, i + 1, c.capabilities, c.outer_dependencies)
+    self._string = "".join(c.python_value for c in chars)
+    self._runs = tuple(runs)
+    self._chars = chars
+
+  def _run_at(self, offset: int) -> int:
+    """Returns the position in `_runs` of the run containing `offset`."""
+    return bisect.bisect_right(self._runs, offset, key=_run_end)
+
+  def _run_chars(self) -> Iterator[_Char]:
+    """Yields one representative character per run."""
+    start = 0
+    for run in self._runs:
+      yield _Char(self._string[start], run.capabilities, run.dependencies)
+      start = run.end
+
+  def get_dependencies(
+      self, visited_objects: frozenset[int] = frozenset()
+  ) -> tuple[tuple["Value", ...], frozenset[int]]:
+    return self._get_dependencies_closure(visited_objects)
+
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    if id(self) in visited:
+      return
+    visited[id(self)] = self
+    for run in self._runs:
+      _add_dependencies(collected, run.dependencies)
+
+  def iterate_python(self) -> Iterator[_Char]:
+    if self._chars is not None:
+      yield from self._chars
+      return
+    start = 0
+    for run in self._runs:
+      for c in self._string[start : run.end]:
+        yield _Char(c, run.capabilities, run.dependencies)
+      start = run.end
+
+  def __eq__(self, other) -> bool:
+    if not isinstance(other, type(self)):
+      return False
+    return (
+        self._string == other._string
+        and self._runs == other._runs
+        and self._capabilities == other._capabilities
+        and self.outer_dependencies == other.outer_dependencies
+    )
+
+  def __hash__(self) -> int:
+    return super().__hash__()
+
+  def eq(self, value: "Value") -> "CaMeLBool":
+    if isinstance(value, CaMeLStr) and self._string == value._string:
+      return CaMeLTrue(camel_capabilities.Capabilities.camel(), (self, value))
+    return CaMeLFalse(camel_capabilities.Capabilities.camel(), (self, value))
+
+  def index(self, index: "CaMeLInt") -> _Char:
+    i = index.raw
+    c = self._string[i]
+    run = self._runs[self._run_at(i if i >= 0 else i + len(self._string))]
+    return _Char(c, run.capabilities, run.dependencies + (self, index))
+
+  def slice(
+      self,
+      start: "CaMeLInt | CaMeLNone",
+      end: "CaMeLInt | CaMeLNone",
+      step: "CaMeLInt | CaMeLNone",
+  ) -> Self:
+    s = slice(start.raw, end.raw, step.raw)
+    lo, hi, stride = s.indices(len(self._string))
+    if stride != 1:
+      return super().slice(start, end, step)
+    runs: list[_StrRun] = []
+    if lo < hi:
+      for k in range(self._run_at(lo), len(self._runs)):
+        run = self._runs[k]
+        _append_run(runs, min(run.end, hi) - lo, run.capabilities, run.dependencies)
+        if run.end >= hi:
+          break
+    return self._from_runs(
+        self._string[lo:hi],
+        tuple(runs),
+        self._capabilities,
+        (*self.outer_dependencies, self, start, end, step),
+    )
+
+  def len(self) -> "CaMeLInt":
+    # Characters in the same run have the same capabilities and dependencies,
+    # so one representative per run is enough.
+    return CaMeLInt(
+        len(self._string),
+        camel_capabilities.Capabilities.camel(),
+        (self, *self._run_chars()),
+    )
+
   def contains(self, other: Value) -> "CaMeLBool":
     if not isinstance(other, CaMeLStr | _Char):
       raise TypeError(
@@ -1197,7 +2051,7 @@ class CaMeLStr(
     # of them (i.e., that none of them is `other`).
     return CaMeLFalse(
         camel_capabilities.Capabilities.camel(),
-        (*self.get_dependencies()[0], other),
+        (self._dependencies_value(), other),
     )
 
   @classmethod
@@ -1207,11 +2061,8 @@ class CaMeLStr(
       capabilities: camel_capabilities.Capabilities,
       dependencies: tuple[Value, ...],
   ) -> Self:
-    return cls(
-        tuple(_Char(c, capabilities, dependencies) for c in string),
-        capabilities,
-        dependencies,
-    )
+    runs = (_StrRun(len(string), capabilities, dependencies),) if string else ()
+    return cls._from_runs(string, runs, capabilities, dependencies)
 
   def attr(self, name) -> Value | None:
     attr = SUPPORTED_BUILT_IN_METHODS[self.raw_type].get(name)
@@ -1232,18 +2083,23 @@ class CaMeLStr(
 
   @property
   def raw(self) -> str:
-    s = ""
-    for c in self.python_value:
-      s += c.python_value
-    return s
+    return self._string
 
   def iterate(self) -> CaMeLIterator["CaMeLStr"]:
-    strings_iterator = iter(
-        CaMeLStr([c], camel_capabilities.Capabilities.camel(), (self,))
-        for c in self.python_value
-    )
+    def strings_iterator() -> Iterator[CaMeLStr]:
+      start = 0
+      for run in self._runs:
+        for c in self._string[start : run.end]:
+          yield CaMeLStr._from_runs(
+              c,
+              (run._replace(end=1),),
+              camel_capabilities.Capabilities.camel(),
+              (self,),
+          )
+        start = run.end
+
     return CaMeLIterator(
-        strings_iterator, camel_capabilities.Capabilities.camel(), (self,)
+        strings_iterator(), camel_capabilities.Capabilities.camel(), (self,)
     )
 
   @property
@@ -1253,8 +2109,8 @@ class CaMeLStr(
   def add(self, other: Value) -> "CaMeLStr | types.NotImplementedType":
     if not isinstance(other, CaMeLStr):
       return NotImplemented
-    return CaMeLStr(
-        self.python_value + other.python_value,
+    return CaMeLStr.concat(
+        (self, other),
         camel_capabilities.Capabilities.camel(),
         (self, other),
     )
@@ -1262,8 +2118,8 @@ class CaMeLStr(
   def mult(self, other: Value) -> "CaMeLStr | types.NotImplementedType":
     if not isinstance(other, CaMeLInt):
       return NotImplemented
-    return CaMeLStr(
-        self.python_value * other.python_value,
+    return CaMeLStr.concat(
+        (self,) * max(other.python_value, 0),
         camel_capabilities.Capabilities.camel(),
         (self, other),
     )
@@ -1281,6 +2137,8 @@ class CaMeLTuple(
 ):
   """Represents a tuple in CaMeL."""
 
+  __slots__ = ("_lazy_contents",)
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1290,9 +2148,12 @@ class CaMeLTuple(
     self._capabilities = capabilities
     self.python_value = tuple(it)
     self.outer_dependencies = dependencies
+    self._lazy_contents = None
 
   @property
   def raw(self) -> tuple[Any, ...]:
+    if self._has_unconverted_contents():
+      return self._lazy_contents.raw()
     return tuple(v.raw for v in self.python_value)
 
   def freeze(self) -> "CaMeLNone":
@@ -1330,6 +2191,8 @@ class CaMeLList(
 ):
   """Represents a list in CaMeL."""
 
+  __slots__ = ("_lazy_contents", "_frozen", "_version")
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1340,9 +2203,12 @@ class CaMeLList(
     self._frozen = False
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
+    self._lazy_contents = None
 
   @property
   def raw(self) -> list[Any]:
+    if self._has_unconverted_contents():
+      return self._lazy_contents.raw()
     return list(v.raw for v in self.python_value)
 
   def attr(self, name) -> Value | None:
@@ -1393,6 +2259,8 @@ class CaMeLSet(
 ):
   """Represents a set in CaMeL."""
 
+  __slots__ = ("_lazy_contents", "_frozen")
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1400,11 +2268,15 @@ class CaMeLSet(
       dependencies: tuple[Value, ...],
   ) -> None:
     self.python_value = set(it)
+    self._frozen = False
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
+    self._lazy_contents = None
 
   @property
   def raw(self) -> set[Any]:
+    if self._has_unconverted_contents():
+      return self._lazy_contents.raw()
     return set(v.raw for v in self.python_value)
 
   def freeze(self) -> "CaMeLNone":
@@ -1459,6 +2331,8 @@ class CaMeLDict(
 ):
   """Represents a dictionary in CaMeL."""
 
+  __slots__ = ("_lazy_contents", "_frozen", "_version")
+
   def __init__(
       self,
       it: Mapping[_KV, _VV],
@@ -1469,9 +2343,13 @@ class CaMeLDict(
     self._frozen = False
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
+    self._lazy_contents = None
+    self._raw_keys_index = None
 
   @property
   def raw(self) -> dict[Any, Any]:
+    if self._has_unconverted_contents():
+      return self._lazy_contents.raw()
     return {k.raw: v.raw for k, v in self.python_value.items()}
 
   def attr(self, name) -> Value | None:
@@ -1524,6 +2402,13 @@ def _get_class_attr_names(instance: Any | type[Any]) -> set[str]:
 class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
   """Represents a class in CaMeL."""
 
+  __slots__ = (
+      "_base_classes",
+      "methods",
+      "_is_totally_ordered",
+      "is_builtin",
+  )
+
   def __init__(
       self,
       name: str,
@@ -1540,6 +2425,7 @@ class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
     self._name = name
     self._base_classes = base_classes
     self._recv: Value | None = None
+    self._bound_python_value = None
     inherited_methods = {}
     for base_class in base_classes:
       inherited_methods.update(base_class.methods)
@@ -1554,15 +2440,17 @@ class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    dependencies = self.outer_dependencies
-    if id(self) in visited_objects:
-      return dependencies, visited_objects
+    return self._get_dependencies_closure(visited_objects)
+
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    if id(self) in visited:
+      return
+    visited[id(self)] = self
     for method in self.methods.values():
-      new_dependencies, visited_objects = method.get_dependencies(
-          visited_objects | {id(self)}
-      )
-      dependencies += new_dependencies
-    return dependencies, visited_objects
+      method._collect_dependencies(visited, collected)  # pylint: disable=protected-access
 
   def init(
       self,
@@ -1636,9 +2524,11 @@ class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
     )
 
 
-class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
+class CaMeLClassInstance(_Mutable, Generic[_T], HasSetField[_T]):
   """Represents an instance of a class in CaMeL."""
 
+  __slots__ = ("_camel_class", "_namespace", "_frozen", "cmp", "_version")
+
   def __init__(
       self,
       value: _T,
@@ -1663,17 +2553,19 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    dependencies = self.outer_dependencies
-    if id(self) in visited_objects:
-      return dependencies, visited_objects
+    return self._get_dependencies_closure(visited_objects)
+
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    if id(self) in visited:
+      return
+    visited[id(self)] = self
     for attr_name in self.attr_names():
       attr = self.attr(attr_name)
       if attr is not None and attr_name not in self._camel_class.methods:
-        new_dependencies, visited_objects = attr.get_dependencies(
-            visited_objects | {id(self)}
-        )
-        dependencies += new_dependencies
-    return dependencies, visited_objects
+        attr._collect_dependencies(visited, collected)  # pylint: disable=protected-access
 
   def _cmp(self, y: Self) -> "CaMeLInt":
     if self.raw > y.raw:  # type: ignore  # this is hardcoded
@@ -1713,6 +2605,7 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
     if self._frozen:
       raise ValueError("instance is frozen")
     setattr(self.python_value, name, value)
+    self._record_mutation()
     return CaMeLNone(camel_capabilities.Capabilities.default(), ())
 
   def attr(self, name: str) -> Value | None:
@@ -1740,6 +2633,8 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
   and we need to wrap it as a CaMeL value.
   """
 
+  __slots__ = ()
+
   _camel_class: CaMeLClass[_T]
   _namespace: Namespace
   _frozen: bool
@@ -1767,6 +2662,12 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
     return self.outer_dependencies, visited_objects | {id(self)}
 
+  def _collect_dependencies(
+      self, visited: dict[int, "Value | None"], collected: dict[int, "Value"]
+  ) -> None:
+    _add_dependencies(collected, self.outer_dependencies)
+    visited.setdefault(id(self), self)
+
   def attr(self, name: str) -> Value | None:
     if name not in self.attr_names():
       return None
@@ -1781,6 +2682,7 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
     if self._frozen:
       raise ValueError("instance is frozen")
     setattr(self.python_value, name, value.raw)
+    self._record_mutation()
     return CaMeLNone(camel_capabilities.Capabilities.default(), ())
 
   def freeze(self) -> CaMeLNone:
@@ -1792,6 +2694,8 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
 class CaMeLFunction(Generic[_T], CaMeLCallable[_T]):
   """Represents a function in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       name: str,
@@ -1804,6 +2708,7 @@ class CaMeLFunction(Generic[_T], CaMeLCallable[_T]):
     self.outer_dependencies = dependencies
     self._name = name
     self._recv: Value | None = None
+    self._bound_python_value = None
 
   def make_args_by_keyword_preserve_values(
       self, args: "CaMeLTuple", kwargs: "CaMeLDict[CaMeLStr, Value]"
@@ -1840,49 +2745,65 @@ def value_from_raw(
       return CaMeLFloat(raw_value, capabilities, dependencies)
     case None:
       return CaMeLNone(capabilities, dependencies)
+    # The contents of containers are converted when they are first accessed, so
+    # that large tool results only pay for the parts the program reads. Mutable
+    # containers are copied (shallowly) so that later changes by whoever created
+    # them, e.g. the state of a tool, are not seen by the value; the containers
+    # they contain are copied when the contents are converted.
     case list():
-      return CaMeLList(
-          [
+      contents = raw_value.copy()
+      return CaMeLList.from_raw_contents(
+          contents,
+          capabilities,
+          namespace,
+          dependencies,
+          lambda: [
               value_from_raw(
                   val, camel_capabilities.Capabilities.camel(), namespace, ()
               )
-              for val in raw_value
+              for val in contents
           ],
-          capabilities,
-          dependencies,
       )
     case dict():
-      return CaMeLDict(
-          {
+      contents = raw_value.copy()
+      return CaMeLDict.from_raw_contents(
+          contents,
+          capabilities,
+          namespace,
+          dependencies,
+          lambda: {
               value_from_raw(
                   k, camel_capabilities.Capabilities.camel(), namespace, ()
               ): value_from_raw(v, capabilities, namespace, ())
-              for k, v in raw_value.items()
+              for k, v in contents.items()
           },
-          capabilities,
-          dependencies,
       )
     case set():
-      return CaMeLSet(
-          {
+      contents = raw_value.copy()
+      return CaMeLSet.from_raw_contents(
+          contents,
+          capabilities,
+          namespace,
+          dependencies,
+          lambda: {
               value_from_raw(
                   val, camel_capabilities.Capabilities.camel(), namespace, ()
               )
-              for val in raw_value
+              for val in contents
           },
-          capabilities,
-          dependencies,
       )
     case tuple():
-      return CaMeLTuple(
-          tuple(
+      return CaMeLTuple.from_raw_contents(
+          raw_value,
+          capabilities,
+          namespace,
+          dependencies,
+          lambda: tuple(
               value_from_raw(
                   val, camel_capabilities.Capabilities.camel(), namespace, ()
               )
               for val in raw_value
           ),
-          capabilities,
-          dependencies,
       )
     case type():
       return CaMeLClass(
@@ -1922,9 +2843,47 @@ def value_from_raw(
       raise UndefinedClassError(f"Undefined class {type(raw_value).__name__}")
 
 
+def _raw_from_raw(raw_value: Any, namespace: Namespace) -> Any:
+  """Returns the `raw` of the value `value_from_raw` converts `raw_value` to.
+
+  Built-in containers are copied without converting their contents, so that
+  the raw result of a tool does not need to be converted to be recorded.
+
+  Args:
+      raw_value: The raw value.
+      namespace: The namespace to convert other values in.
+
+  Returns:
+      The raw value.
+
+  Raises:
+      UndefinedClassError: If a value of an unknown class is found.
+  """
+  match raw_value:
+    case bool() | int() | str() | float() | None:
+      return raw_value
+    case list():
+      return [_raw_from_raw(val, namespace) for val in raw_value]
+    case dict():
+      return {
+          _raw_from_raw(k, namespace): _raw_from_raw(v, namespace)
+          for k, v in raw_value.items()
+      }
+    case set():
+      return {_raw_from_raw(val, namespace) for val in raw_value}
+    case tuple():
+      return tuple(_raw_from_raw(val, namespace) for val in raw_value)
+    case _:
+      return value_from_raw(
+          raw_value, camel_capabilities.Capabilities.camel(), namespace, ()
+      ).raw
+
+
 class CaMeLBuiltin(Generic[_T], CaMeLCallable[_T]):
   """Represents a built-in function or method in CaMeL."""
 
+  __slots__ = ("is_class_method",)
+
   is_builtin: bool = True
 
   def __init__(
@@ -1939,6 +2898,7 @@ class CaMeLBuiltin(Generic[_T], CaMeLCallable[_T]):
     self._capabilities = capabilities
     self._name = name
     self._recv: Value | None = None
+    self._bound_python_value = None
     self.is_class_method = is_class_method
     self.outer_dependencies = dependencies
 
@@ -21,9 +21,16 @@ calls would create circular imports.
 """
 
 import ast
-from collections.abc import Callable, Iterable, Mapping, Sequence
+import asyncio
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+import concurrent.futures
+import copy
 import dataclasses
+import datetime
 import enum
+import functools
+import itertools
+import operator
 import re
 from typing import Any, Generic, NamedTuple, TypeAlias, TypeVar
 
@@ -36,6 +43,7 @@ from .. import security_policy
 from ..capabilities import capabilities as camel_capabilities
 from ..capabilities import readers
 from ..capabilities import sources
+from ..capabilities import utils as capabilities_utils
 from . import camel_value
 from . import library
 
@@ -104,6 +112,77 @@ _T = TypeVar("_T", bound=camel_value.Value[Any])
 _E = TypeVar("_E", bound=Exception)
 
 
+@dataclasses.dataclass(frozen=True, eq=False)
+class DependencyStack:
+  """Persistent stack of the values the control flow depends on.
+
+  Pushing is O(1) and doesn't modify the stack, so nested constructs can share
+  the stack of the construct containing them. Iterating a stack yields its
+  values from the bottom to the top, without duplicates. The deduplicated tuple
+  of the values is built when pushing from the one of the parent, and pushing a
+  value that is already in the stack shares it, so values assigned in a loop
+  don't copy the stack at every iteration.
+  """
+
+  value: camel_value.Value[Any] | None = None
+  parent: "DependencyStack | None" = None
+  values: tuple[camel_value.Value[Any], ...] = ()
+  """The values of the stack, from the bottom to the top."""
+  _ids: frozenset[int] = dataclasses.field(default=frozenset(), repr=False)
+
+  @classmethod
+  def of(cls, values: Iterable[camel_value.Value[Any]]) -> "DependencyStack":
+    if isinstance(values, DependencyStack):
+      return values
+    return _EMPTY_DEPENDENCY_STACK.push_all(values)
+
+  def push(self, value: camel_value.Value[Any]) -> "DependencyStack":
+    if id(value) in self._ids:
+      return DependencyStack(value, self, self.values, self._ids)
+    return DependencyStack(
+        value, self, (*self.values, value), self._ids | {id(value)}
+    )
+
+  def push_all(
+      self, values: Iterable[camel_value.Value[Any]]
+  ) -> "DependencyStack":
+    stack = self
+    for value in values:
+      stack = stack.push(value)
+    return stack
+
+  def remove(self, entry: "DependencyStack") -> "DependencyStack":
+    """Removes the value pushed by `entry`, keeping the ones pushed after it.
+
+    Args:
+        entry: The stack returned by the `push` call to undo.
+
+    Returns:
+        The stack without the value of `entry`.
+
+    Raises:
+        ValueError: If `entry` is not part of this stack.
+    """
+    pushed_after = []
+    stack = self
+    while stack is not entry:
+      if stack.parent is None:
+        raise ValueError("The entry is not part of the stack.")
+      pushed_after.append(stack.value)
+      stack = stack.parent
+    assert entry.parent is not None
+    return entry.parent.push_all(reversed(pushed_after))
+
+  def __iter__(self):
+    return iter(self.values)
+
+  def __len__(self) -> int:
+    return len(self.values)
+
+
+_EMPTY_DEPENDENCY_STACK = DependencyStack()
+
+
 class EvalResult(NamedTuple):
   """Result of an evaluation."""
 
@@ -111,6 +190,7 @@ class EvalResult(NamedTuple):
   namespace: camel_value.Namespace
   tool_calls_chain: Sequence[function_types.FunctionCall[Any]]
   dependencies: Iterable[camel_value.Value[Any]]
+  """The dependencies of the control flow, usually a `DependencyStack`."""
 
 
 class DependenciesPropagationMode(str, enum.Enum):
@@ -137,6 +217,512 @@ class EvalArgs:
   """The list of security policies to apply."""
   eval_mode: DependenciesPropagationMode
   """The evaluation mode, either `STRICT` or `NORMAL`."""
+  event_loop: asyncio.AbstractEventLoop | None = None
+  """The event loop tools are awaited on, if running in async mode (see
+  `parse_and_interpret_code_async`)."""
+  call_prefetcher: "_CallPrefetcher | None" = None
+  """The prefetcher of the loop being evaluated, if any."""
+  checkpoints: "Checkpoints | None" = None
+  """The checkpoints of the previous (failed) program and the memoized outputs
+  of tools without side effects, if programs are resumed (see
+  `Checkpoints`)."""
+  print_buffer: "PrintBuffer | None" = None
+  """The buffer the output of `print` calls is written to, if any."""
+
+
+_PENDING_OUTPUT_SOURCE = sources.Tool("<pending output>")
+"""Source of the placeholders of the outputs of calls that are prefetched."""
+
+
+class _StopPrefetchingError(Exception):
+  """Raised when a loop can't be evaluated without running a tool."""
+
+
+class _PrefetchedCall(NamedTuple):
+  function: str
+  args: Any
+  kwargs: Any
+  output: concurrent.futures.Future[Any]
+
+
+class _CallPrefetcher:
+  """Runs independent calls to tools without side effects concurrently.
+
+  The loop is first evaluated while `recording`: no tool is run, calls to tools
+  without side effects are started on the event loop and evaluate to a
+  placeholder, and evaluation stops at calls to any other tool. Calls whose
+  arguments (or control flow) depend on a placeholder are not started, as their
+  arguments are not known yet.
+
+  The loop is then evaluated as usual, and calls whose arguments match the ones
+  of a started call take the output of that call instead of running the tool
+  again.
+  """
+
+  def __init__(
+      self,
+      event_loop: asyncio.AbstractEventLoop,
+      no_side_effect_tools: Iterable[str],
+      checkpoints: "Checkpoints | None" = None,
+  ):
+    self.recording = True
+    self._event_loop = event_loop
+    self._no_side_effect_tools = frozenset(no_side_effect_tools)
+    self._checkpoints = checkpoints
+    self._calls: list[_PrefetchedCall] = []
+
+  def record(
+      self,
+      fn: camel_value.CaMeLCallable[Any],
+      args: camel_value.CaMeLTuple,
+      kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+      dependencies: Iterable[camel_value.Value[Any]],
+  ) -> camel_value.Value[Any]:
+    """Starts the call, if possible, and returns a placeholder for its output.
+
+    Args:
+        fn: The function being called.
+        args: The positional arguments of the call.
+        kwargs: The keyword arguments of the call.
+        dependencies: The current dependencies.
+
+    Returns:
+        The placeholder for the output of the call.
+
+    Raises:
+        _StopPrefetchingError: If the function may have side effects.
+    """
+    name = fn.name().raw
+    if (
+        not isinstance(fn, camel_value.CaMeLFunction)
+        or name not in self._no_side_effect_tools
+    ):
+      raise _StopPrefetchingError(name)
+    if not any(
+        _PENDING_OUTPUT_SOURCE in capabilities_utils.get_all_sources(v)[0]
+        for v in (args, kwargs, *dependencies)
+    ) and (
+        # Memoized outputs are taken from the memo when the loop is evaluated.
+        self._checkpoints is None
+        or not self._checkpoints.has_output(fn, args, kwargs)
+    ):
+      output = asyncio.run_coroutine_threadsafe(
+          fn.invoke_async(args, kwargs), self._event_loop
+      )
+      self._calls.append(_PrefetchedCall(name, args.raw, kwargs.raw, output))
+    return camel_value.CaMeLNone(
+        camel_capabilities.Capabilities(
+            frozenset({_PENDING_OUTPUT_SOURCE}), readers.Public()
+        ),
+        (fn, args, kwargs),
+    )
+
+  def take(
+      self,
+      fn: camel_value.CaMeLCallable[Any],
+      args: camel_value.CaMeLTuple,
+      kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+  ) -> concurrent.futures.Future[Any] | None:
+    """Returns the output of a started call with the same arguments, if any."""
+    name = fn.name().raw
+    raw_args = args.raw
+    raw_kwargs = kwargs.raw
+    for i, call in enumerate(self._calls):
+      if (
+          call.function == name
+          and call.args == raw_args
+          and call.kwargs == raw_kwargs
+      ):
+        return self._calls.pop(i).output
+    return None
+
+  def cancel_remaining(self) -> None:
+    for call in self._calls:
+      call.output.cancel()
+    self._calls.clear()
+
+
+def _is_name_target(node: ast.expr) -> bool:
+  match node:
+    case ast.Name():
+      return True
+    case ast.Tuple() | ast.List():
+      return all(_is_name_target(elt) for elt in node.elts)
+    case ast.Starred():
+      return _is_name_target(node.value)
+    case _:
+      return False
+
+
+def _can_prefetch_calls(
+    nodes: Iterable[ast.AST], no_side_effect_tools: Iterable[str]
+) -> bool:
+  """Checks whether it's worth and safe to evaluate `nodes` while recording.
+
+  Evaluating the nodes while recording must not mutate any value nor the
+  namespace, so assignments can only bind names.
+
+  Args:
+      nodes: The AST nodes of the loop.
+      no_side_effect_tools: The tools without side effects.
+
+  Returns:
+      Whether the nodes call a tool without side effects and don't mutate any
+      value.
+  """
+  has_prefetchable_call = False
+  for node in itertools.chain.from_iterable(map(ast.walk, nodes)):
+    match node:
+      case ast.Call(func=ast.Name(id=name)) if name in no_side_effect_tools:
+        has_prefetchable_call = True
+      case ast.Assign():
+        if not all(map(_is_name_target, node.targets)):
+          return False
+      case ast.AugAssign() | ast.AnnAssign():
+        if not _is_name_target(node.target):
+          return False
+      case ast.ImportFrom() | ast.ClassDef() | ast.FunctionDef():
+        return False
+  return has_prefetchable_call
+
+
+_R = TypeVar("_R")
+
+
+def _eval_with_prefetching(
+    eval_loop: Callable[[EvalArgs], _R],
+    nodes: Sequence[ast.AST],
+    eval_args: EvalArgs,
+) -> _R:
+  """Evaluates a loop, running independent tool calls concurrently.
+
+  This only happens in async mode, and for the outermost loop. See
+  `_CallPrefetcher`. Evaluation order, the tool calls chain, and security
+  policy checks are the same as when evaluating the loop sequentially.
+
+  Args:
+      eval_loop: Evaluates the loop with the given evaluation arguments.
+      nodes: The AST nodes evaluated in the loop.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of `eval_loop`.
+  """
+  if eval_args.event_loop is None or eval_args.call_prefetcher is not None:
+    return eval_loop(eval_args)
+  no_side_effect_tools = security_policy.NO_SIDE_EFFECT_TOOLS | set(
+      eval_args.security_policy_engine.no_side_effect_tools
+  )
+  if not _can_prefetch_calls(nodes, no_side_effect_tools):
+    return eval_loop(eval_args)
+  prefetcher = _CallPrefetcher(
+      eval_args.event_loop, no_side_effect_tools, eval_args.checkpoints
+  )
+  eval_args = dataclasses.replace(eval_args, call_prefetcher=prefetcher)
+  try:
+    eval_loop(eval_args)
+  except Exception:  # pylint: disable=broad-except
+    # Recording stops at the first call to a tool with side effects, or at any
+    # other error. These will be raised again (if still applicable) below.
+    pass
+  prefetcher.recording = False
+  try:
+    return eval_loop(eval_args)
+  finally:
+    prefetcher.cancel_remaining()
+
+
+class PrintBuffer:
+  """Append-only buffer of the output of `print` calls.
+
+  The output of a run is read from the offset the buffer had before the run
+  (see `tell`), so it takes time proportional to the output of the run, and
+  not to the output of all the runs. `on_print` is called as the program runs,
+  e.g. to stream the output.
+  """
+
+  def __init__(self):
+    self._chunks: list[str] = []
+    self.on_print: Callable[[str], None] | None = None
+    """Called with the output of each `print` call."""
+
+  def write(self, text: str) -> None:
+    self._chunks.append(text)
+    if self.on_print is not None:
+      self.on_print(text)
+
+  def tell(self) -> int:
+    return len(self._chunks)
+
+  def read(self, start: int, end: int | None = None) -> str:
+    return "".join(self._chunks[start:end])
+
+  def clear(self) -> None:
+    self._chunks.clear()
+
+
+class Checkpoint(NamedTuple):
+  """The state of a program after one of its top-level statements."""
+
+  statement: str
+  """The dump of the statement, which doesn't depend on its position."""
+  value: camel_value.Value[Any]
+  """The value the statement evaluated to."""
+  namespace: camel_value.Namespace
+  """The namespace after the statement. Namespaces are persistent, so this
+  shares its variables with the namespaces of the other checkpoints."""
+  mutation_epoch: int
+  """The mutation epoch after the statement (see
+  `camel_value.mutation_epoch`)."""
+  printed: tuple[int, int]
+  """The range of the print buffer with the output of the program until the
+  statement."""
+
+  def restore(self, namespace: camel_value.Namespace) -> camel_value.Namespace:
+    """Returns `namespace` with the variables of the checkpoint.
+
+    The namespace passed to the resumed program is kept, as it also has the
+    variables the failed program assigned after the statement, which the
+    resumed program may read.
+
+    Args:
+        namespace: The namespace passed to the resumed program.
+
+    Returns:
+        The namespace, with the variables that differ in the namespace of the
+        checkpoint overridden.
+    """
+    variables = {
+        name: value
+        for name, value in self.namespace.all_variables().items()
+        if namespace.get(name) is not value
+    }
+    return namespace.add_variables(variables) if variables else namespace
+
+
+_NOT_MEMOIZED = object()
+"""Returned by `Checkpoints.get_output` when there is no memoized output."""
+
+
+def _memo_key(raw: Any) -> Hashable:
+  """Returns a key that is the same for equal raw arguments.
+
+  Args:
+      raw: The raw argument.
+
+  Returns:
+      The key. Types are part of it, so that e.g. `1` and `True` differ.
+
+  Raises:
+      TypeError: If equal values of the type of `raw` can't be told apart
+        reliably.
+  """
+  match raw:
+    case (
+        None
+        | bool()
+        | int()
+        | float()
+        | str()
+        | bytes()
+        | enum.Enum()
+        | datetime.date()
+        | datetime.time()
+        | datetime.timedelta()
+        | datetime.tzinfo()
+    ):
+      return type(raw), raw
+    case list() | tuple():
+      return type(raw), tuple(map(_memo_key, raw))
+    case set() | frozenset():
+      return type(raw), frozenset(map(_memo_key, raw))
+    case dict():
+      return dict, frozenset(
+          (_memo_key(k), _memo_key(v)) for k, v in raw.items()
+      )
+    case pydantic.BaseModel():
+      return type(raw), _memo_key(dict(raw))
+    case _:
+      raise TypeError(f"Can't memoize arguments of type {type(raw).__name__}")
+
+
+class Checkpoints:
+  """Checkpoints of a failed program, and memoized outputs of tools.
+
+  When a program fails, the P-LLM generates a corrected one, which usually
+  starts with the same statements. Running it with the same `Checkpoints`:
+
+  - skips the top-level statements it has in common with the failed program,
+    and continues with the variables they assigned, so that the tools they
+    call are not called again (the namespace and dependencies passed to the
+    interpreter are kept, and what they printed is printed again);
+  - takes the outputs of calls to tools without side effects from the memo,
+    when the tool was called with equal arguments before.
+
+  Statements are only skipped if no value was mutated since they ran, as the
+  values in the namespace after them may have been changed by the following
+  statements. Everything is forgotten when a program succeeds, as the next
+  program is for a new request whose tools may return different outputs.
+  """
+
+  def __init__(self, memo_size: int = 256):
+    self.checkpoints: list[Checkpoint] = []
+    """The checkpoints of the statements of the failed program that ran."""
+    self.memo_size = memo_size
+    """The maximum number of memoized outputs. 0 disables the memo."""
+    self.memo: dict[Hashable, Any] = {}
+
+  def clear(self) -> None:
+    self.checkpoints.clear()
+    self.memo.clear()
+
+  def resume(self, statements: Sequence[str]) -> Checkpoint | None:
+    """Returns the checkpoint to resume a program from, if any.
+
+    The checkpoints of the statements after it are dropped, as they differ.
+
+    Args:
+        statements: The dumps of the top-level statements of the program.
+
+    Returns:
+        The checkpoint after the last statement the program has in common with
+        the failed one, if the values in its namespace were not mutated since.
+    """
+    common = 0
+    for checkpoint, statement in zip(self.checkpoints, statements):
+      if checkpoint.statement != statement:
+        break
+      common += 1
+    if (
+        common == 0
+        or self.checkpoints[common - 1].mutation_epoch
+        != camel_value.mutation_epoch()
+    ):
+      self.checkpoints.clear()
+      return None
+    del self.checkpoints[common:]
+    return self.checkpoints[-1]
+
+  def record(
+      self,
+      statement: str,
+      value: camel_value.Value[Any],
+      namespace: camel_value.Namespace,
+      printed: tuple[int, int],
+  ) -> None:
+    self.checkpoints.append(
+        Checkpoint(
+            statement,
+            value,
+            namespace,
+            camel_value.mutation_epoch(),
+            printed,
+        )
+    )
+
+  def memo_key(
+      self,
+      fn: camel_value.CaMeLCallable[Any],
+      args: camel_value.CaMeLTuple,
+      kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+  ) -> Hashable | None:
+    """Returns the key of the call in the memo, or None if it can't have one."""
+    try:
+      return fn.name().raw, _memo_key(args.raw), _memo_key(kwargs.raw)
+    except TypeError:
+      return None
+
+  def has_output(
+      self,
+      fn: camel_value.CaMeLCallable[Any],
+      args: camel_value.CaMeLTuple,
+      kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+  ) -> bool:
+    key = self.memo_key(fn, args, kwargs)
+    return key is not None and key in self.memo
+
+  def get_output(self, key: Hashable) -> Any:
+    """Returns a copy of the memoized output, or `_NOT_MEMOIZED`."""
+    if key not in self.memo:
+      return _NOT_MEMOIZED
+    # Move the entry to the end, to evict the least recently used ones first.
+    output = self.memo[key] = self.memo.pop(key)
+    # Programs can mutate (objects in) outputs, which must not change the memo.
+    return copy.deepcopy(output)
+
+  def memoize_output(self, key: Hashable, output: Any) -> None:
+    if self.memo_size <= 0:
+      return
+    try:
+      self.memo[key] = copy.deepcopy(output)
+    except Exception:  # pylint: disable=broad-except  # e.g., objects with locks
+      return
+    if len(self.memo) > self.memo_size:
+      del self.memo[next(iter(self.memo))]
+
+
+def _has_no_side_effects(
+    fn: camel_value.CaMeLFunction[Any], eval_args: EvalArgs
+) -> bool:
+  name = fn.name().raw
+  return (
+      name in security_policy.NO_SIDE_EFFECT_TOOLS
+      or name in eval_args.security_policy_engine.no_side_effect_tools
+  )
+
+
+def _invoke(
+    fn: camel_value.CaMeLFunction[Any],
+    args: camel_value.CaMeLTuple,
+    kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+    eval_args: EvalArgs,
+) -> Any:
+  """Runs the tool, awaiting it on the event loop in async mode."""
+  if eval_args.event_loop is None:
+    return fn.invoke(args, kwargs)
+  output = None
+  if eval_args.call_prefetcher is not None:
+    output = eval_args.call_prefetcher.take(fn, args, kwargs)
+  if output is None:
+    output = asyncio.run_coroutine_threadsafe(
+        fn.invoke_async(args, kwargs), eval_args.event_loop
+    )
+  return output.result()
+
+
+def _call(
+    fn: camel_value.CaMeLCallable[Any],
+    args: camel_value.CaMeLTuple,
+    kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+    namespace: camel_value.Namespace,
+    eval_args: EvalArgs,
+) -> tuple[camel_value.Value[Any], dict[str, Any], Any]:
+  """Calls `fn`, awaiting tools on the event loop in async mode.
+
+  The outputs of tools without side effects are memoized in
+  `eval_args.checkpoints`, if any.
+
+  Returns:
+      The output, the arguments by keyword and the raw output. The raw output
+      of a tool is the value it returned, while the output value holds a copy
+      of its contents (see `camel_value.value_from_raw`).
+  """
+  if not isinstance(fn, camel_value.CaMeLFunction):
+    output, args_by_keyword = fn.call(args, kwargs, namespace)
+    return output, args_by_keyword, output.raw
+  checkpoints = eval_args.checkpoints
+  memo_key = None
+  if checkpoints is not None and _has_no_side_effects(fn, eval_args):
+    memo_key = checkpoints.memo_key(fn, args, kwargs)
+  output = _NOT_MEMOIZED
+  if memo_key is not None:
+    output = checkpoints.get_output(memo_key)
+  if output is _NOT_MEMOIZED:
+    output = _invoke(fn, args, kwargs, eval_args)
+    if memo_key is not None:
+      checkpoints.memoize_output(memo_key, output)
+  # The output is wrapped again, so that it depends on the current arguments.
+  return *fn.wrap_call_output(output, args, kwargs, namespace), output
 
 
 def _eval_formatted_value(
@@ -158,9 +744,9 @@ def _eval_formatted_value(
   Returns:
       The result of the evaluation.
   """
-  eval_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  eval_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match eval_res:
     case result.Error():
       return EvalResult(
@@ -175,8 +761,10 @@ def _eval_formatted_value(
       raise ValueError("Invalid eval result type")
 
   if node.format_spec is not None:
-    evaled_format_spec, namespace, tool_calls_chain, dependencies = camel_eval(
-        node.format_spec, namespace, tool_calls_chain, dependencies, eval_args
+    evaled_format_spec, namespace, tool_calls_chain, dependencies = (
+        _evaluator_of(node.format_spec)(
+            namespace, tool_calls_chain, dependencies, eval_args
+        )
     )
     if isinstance(evaled_format_spec, result.Error):
       return EvalResult(
@@ -254,8 +842,8 @@ def _eval_starred_iterable(
       The result of the evaluation.
   """
   evaled_starred_value_res, namespace, tool_calls_chain, dependencies = (
-      camel_eval(
-          node.value, namespace, tool_calls_chain, dependencies, eval_args
+      _evaluator_of(node.value)(
+          namespace, tool_calls_chain, dependencies, eval_args
       )
   )
   match evaled_starred_value_res:
@@ -336,9 +924,9 @@ def _eval_iterable(
         case _:
           raise ValueError("Invalid eval result type")
     else:
-      evaled_elt_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          elt, namespace, tool_calls_chain, dependencies, eval_args
-      )
+      evaled_elt_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+          elt
+      )(namespace, tool_calls_chain, dependencies, eval_args)
       match evaled_elt_res:
         case result.Error():
           return EvalResult(
@@ -402,14 +990,12 @@ def _eval_joined_str(
     case _:
       raise ValueError("Invalid eval result type")
 
-  string = camel_value.CaMeLStr.from_raw(
-      "", camel_capabilities.Capabilities.camel(), ()
+  string = camel_value.CaMeLStr.concat(
+      (d.string() for d in evaled_data.iterate_python()),
+      camel_capabilities.Capabilities.camel(),
+      (),
   )
 
-  for d in evaled_data.iterate_python():
-    string.python_value = (*string.python_value, *d.string().python_value)
-    # string = string.new_with_dependencies((d,))
-
   return EvalResult(
       result.Ok(string), namespace, tool_calls_chain, dependencies
   )
@@ -553,9 +1139,9 @@ def _eval_attribute_load(
   Returns:
       The result of the evaluation.
   """
-  evaled_obj_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_obj_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_obj_res:
     case result.Error():
       return EvalResult(
@@ -623,9 +1209,9 @@ def _eval_subscript_load(
   Returns:
       The result of the evaluation.
   """
-  evaled_obj_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_obj_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_obj_res:
     case result.Error():
       return EvalResult(
@@ -646,9 +1232,9 @@ def _eval_subscript_load(
       )
   )
 
-  evaled_slice_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.slice, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_slice_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.slice
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_slice_res:
     case result.Error():
       return EvalResult(
@@ -887,9 +1473,9 @@ def _eval_dict(
   )
   for key, val in zip(node.keys, node.values):
     if key is not None:
-      evaled_key_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          key, namespace, tool_calls_chain, dependencies, eval_args
-      )
+      evaled_key_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+          key
+      )(namespace, tool_calls_chain, dependencies, eval_args)
       match evaled_key_res:
         case result.Error():
           return EvalResult(
@@ -902,8 +1488,10 @@ def _eval_dict(
           key_evaled_data = v
         case _:
           raise ValueError("Invalid eval result type")
-      evaled_value_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          val, namespace, tool_calls_chain, dependencies, eval_args
+      evaled_value_res, namespace, tool_calls_chain, dependencies = (
+          _evaluator_of(val)(
+              namespace, tool_calls_chain, dependencies, eval_args
+          )
       )
       match evaled_value_res:
         case result.Error():
@@ -922,9 +1510,9 @@ def _eval_dict(
       # If key is None, it means that it's a dictionary being expanded, i.e.
       # {..., **d}
       # https://greentreesnakes.readthedocs.io/en/latest/nodes.html#Dict
-      evaled_key_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          val, namespace, tool_calls_chain, dependencies, eval_args
-      )
+      evaled_key_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+          val
+      )(namespace, tool_calls_chain, dependencies, eval_args)
       match evaled_key_res:
         case result.Error():
           return EvalResult(
@@ -984,7 +1572,7 @@ def _assign_name(
   if eval_args.eval_mode == DependenciesPropagationMode.STRICT:
     # If the evaluation mode is strict, then add the dependencies to the
     # capabilities.
-    v = v.new_with_dependencies(tuple(dependencies))
+    v = v.new_with_dependencies(DependencyStack.of(dependencies).values)
 
   # If built-in do not allow reassigning
   if (val := namespace.get(name.id)) is not None and val.is_builtin:
@@ -999,8 +1587,7 @@ def _assign_name(
         dependencies,
     )
 
-  updated_variables = namespace.variables | {name.id: v}
-  new_namespace = dataclasses.replace(namespace, variables=updated_variables)
+  new_namespace = namespace.add_variables({name.id: v})
   return EvalResult(
       result.Ok(
           camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
@@ -1120,9 +1707,9 @@ def _assign_attribute(
   Returns:
       The result of the assignment.
   """
-  evaled_obj_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      attribute.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_obj_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      attribute.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_obj_res:
     case result.Error():
       return EvalResult(
@@ -1157,8 +1744,9 @@ def _assign_attribute(
   if eval_args.eval_mode == DependenciesPropagationMode.STRICT:
     # If the evaluation mode is strict, then add the dependencies to the
     # capabilities of the object.
-    obj = obj.new_with_dependencies(tuple(dependencies))
-    val = val.new_with_dependencies(tuple(dependencies))
+    dependencies = DependencyStack.of(dependencies)
+    obj = obj.new_with_dependencies(dependencies.values)
+    val = val.new_with_dependencies(dependencies.values)
 
   return EvalResult(
       result.Ok(set_attr(obj, attr_name, val)),
@@ -1189,8 +1777,10 @@ def _assign_subscript(
   Returns:
       The result of the assignment.
   """
-  evaled_sequence_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      subscript.value, namespace, tool_calls_chain, dependencies, eval_args
+  evaled_sequence_res, namespace, tool_calls_chain, dependencies = (
+      _evaluator_of(subscript.value)(
+          namespace, tool_calls_chain, dependencies, eval_args
+      )
   )
   match evaled_sequence_res:
     case result.Error():
@@ -1240,8 +1830,10 @@ def _assign_subscript(
           dependencies,
       )
     case _:
-      evaled_index_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          subscript.slice, namespace, tool_calls_chain, dependencies, eval_args
+      evaled_index_res, namespace, tool_calls_chain, dependencies = (
+          _evaluator_of(subscript.slice)(
+              namespace, tool_calls_chain, dependencies, eval_args
+          )
       )
       match evaled_index_res:
         case result.Error():
@@ -1371,8 +1963,10 @@ def _eval_assign(
   Returns:
       The result of the evaluation.
   """
-  evaled_value_res, new_namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
+  evaled_value_res, new_namespace, tool_calls_chain, dependencies = (
+      _evaluator_of(node.value)(
+          namespace, tool_calls_chain, dependencies, eval_args
+      )
   )
   match evaled_value_res:
     case result.Error():
@@ -1434,9 +2028,9 @@ def _eval_ann_assign(
         tool_calls_chain,
         dependencies,
     )
-  evaled_value_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_value_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_value_res:
     case result.Error():
       return EvalResult(
@@ -1481,8 +2075,10 @@ def _eval_aug_assign(
   Returns:
       The result of the evaluation.
   """
-  evaled_target_res, new_namespace, tool_calls_chain, dependencies = camel_eval(
-      node.target, namespace, tool_calls_chain, dependencies, eval_args
+  evaled_target_res, new_namespace, tool_calls_chain, dependencies = (
+      _evaluator_of(node.target)(
+          namespace, tool_calls_chain, dependencies, eval_args
+      )
   )
   match evaled_target_res:
     case result.Error():
@@ -1497,8 +2093,10 @@ def _eval_aug_assign(
     case _:
       raise ValueError("Invalid eval result type")
 
-  evaled_value_res, new_namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
+  evaled_value_res, new_namespace, tool_calls_chain, dependencies = (
+      _evaluator_of(node.value)(
+          namespace, tool_calls_chain, dependencies, eval_args
+      )
   )
   match evaled_value_res:
     case result.Error():
@@ -1565,17 +2163,21 @@ def _restore_or_delete_variables(
   Returns:
       The updated namespace with variables restored or deleted.
   """
-  restored_variables = {}
-  for var_name in comprehension_variables:
-    if var_name in original_namespace.variables:
-      restored_variables[var_name] = original_namespace.variables[var_name]
-    else:
-      del updated_namespace.variables[var_name]
-  updated_namespace = dataclasses.replace(
-      updated_namespace,
-      variables=updated_namespace.variables | restored_variables,
+  # The common case is that the comprehension only added scopes with its own
+  # variables on top of the original namespace, which can then be reused.
+  namespace = updated_namespace
+  while (
+      namespace is not original_namespace
+      and namespace is not None
+      and namespace.variables.keys() <= comprehension_variables
+  ):
+    namespace = namespace.parent
+  if namespace is original_namespace:
+    return original_namespace
+  # `None` deletes the variables that were not in the original namespace.
+  return updated_namespace.add_variables(
+      {name: original_namespace.get(name) for name in comprehension_variables}
   )
-  return updated_namespace
 
 
 def _eval_comprehensions(
@@ -1605,8 +2207,8 @@ def _eval_comprehensions(
     # Base case: no more generators
     elts_results = []
     for elt in elts:
-      elt_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          elt, namespace, tool_calls_chain, dependencies, eval_args
+      elt_res, namespace, tool_calls_chain, dependencies = _evaluator_of(elt)(
+          namespace, tool_calls_chain, dependencies, eval_args
       )
       if isinstance(elt_res, result.Error):
         return (
@@ -1634,8 +2236,9 @@ def _eval_comprehensions(
     )
 
   current_comprehension = generators[0]
-  iterable_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      current_comprehension.iter,
+  iterable_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      current_comprehension.iter
+  )(
       namespace,
       tool_calls_chain,
       dependencies,
@@ -1669,12 +2272,59 @@ def _eval_comprehensions(
         (),
     )
 
+  return _eval_with_prefetching(
+      lambda eval_args: _eval_comprehension_loop(
+          generators,
+          elts,
+          iterable,
+          namespace,
+          tool_calls_chain,
+          dependencies,
+          eval_args,
+          evaled_iterators,
+      ),
+      (
+          current_comprehension.target,
+          *current_comprehension.ifs,
+          *generators[1:],
+          *elts,
+      ),
+      eval_args,
+  )
+
+
+def _eval_comprehension_loop(
+    generators: list[ast.comprehension],
+    elts: tuple[ast.expr] | tuple[ast.expr, ast.expr],  # pylint: disable=g-one-element-tuple
+    iterable: camel_value.CaMeLIterable[Any, Any] | camel_value.CaMeLMapping,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+    evaled_iterators: tuple[camel_value.Value[Any], ...],
+) -> tuple[EvalResult, tuple[camel_value.Value[Any], ...]]:
+  """Evaluates the first generator of a comprehension over its iterable.
+
+  Args:
+      generators: The AST nodes representing the comprehension generators.
+      elts: The AST nodes representing the comprehension elements.
+      iterable: The evaluated iterable of the first generator.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+      evaled_iterators: The iterators that have been evaluated so far.
+
+  Returns:
+      The result of the evaluation and the evaluated iterators.
+  """
+  current_comprehension = generators[0]
   accumulated_results: tuple[camel_value.CaMeLList[Any], ...] = tuple(
       camel_value.CaMeLList([], camel_capabilities.Capabilities.camel(), ())
       for _ in elts
   )
   for element in iterable.iterate_python():
-    inner_namespace = dataclasses.replace(namespace)
+    inner_namespace = namespace
     assign_res, inner_namespace, tool_calls_chain, dependencies = _assign(
         element,
         current_comprehension.target,
@@ -1692,9 +2342,9 @@ def _eval_comprehensions(
     # evaluate ifs
     all_ifs_true = True
     for if_expr in current_comprehension.ifs:
-      if_res, inner_namespace, tool_calls_chain, dependencies = camel_eval(
-          if_expr, inner_namespace, tool_calls_chain, dependencies, eval_args
-      )
+      if_res, inner_namespace, tool_calls_chain, dependencies = _evaluator_of(
+          if_expr
+      )(inner_namespace, tool_calls_chain, dependencies, eval_args)
       if isinstance(if_res, result.Error):
         return EvalResult(if_res, namespace, tool_calls_chain, dependencies), ()
       if not if_res.value.truth().raw:
@@ -1939,8 +2589,8 @@ def _eval_expr(
   Returns:
       The result of the evaluation.
   """
-  return camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
+  return _evaluator_of(node.value)(
+      namespace, tool_calls_chain, dependencies, eval_args
   )
 
 
@@ -1963,9 +2613,9 @@ def _eval_named_expr(
   Returns:
       The result of the evaluation.
   """
-  evaled_val_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.value, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_val_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.value
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_val_res:
     case result.Error():
       return EvalResult(
@@ -2021,9 +2671,9 @@ def _eval_unary_op(
   Returns:
       The result of the evaluation.
   """
-  evaled_operand_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.operand, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_operand_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.operand
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_operand_res:
     case result.Error():
       return EvalResult(
@@ -2116,6 +2766,53 @@ def is_bound(m: Callable[..., Any]) -> bool:
   return hasattr(m, "__self__")
 
 
+_BIN_OP_METHODS: dict[
+    type[ast.operator], tuple[str, type[Any], type[Any]]
+] = {
+    ast.Add: ("add", camel_value.SupportsAdd, camel_value.SupportsRAdd),
+    ast.Sub: ("sub", camel_value.SupportsSub, camel_value.SupportsRSub),
+    ast.Mult: ("mult", camel_value.SupportsMult, camel_value.SupportsRMult),
+    ast.Div: (
+        "truediv",
+        camel_value.SupportsTrueDiv,
+        camel_value.SupportsRTrueDiv,
+    ),
+    ast.Mod: ("mod", camel_value.SupportsMod, camel_value.SupportsRMod),
+    ast.Pow: ("pow", camel_value.SupportsPow, camel_value.SupportsRPow),
+    ast.FloorDiv: (
+        "floor_div",
+        camel_value.SupportsFloorDiv,
+        camel_value.SupportsRFloorDiv,
+    ),
+    ast.BitAnd: (
+        "bit_and",
+        camel_value.SupportsBitAnd,
+        camel_value.SupportsRBitAnd,
+    ),
+    ast.BitOr: (
+        "bit_or",
+        camel_value.SupportsBitOr,
+        camel_value.SupportsRBitOr,
+    ),
+    ast.BitXor: (
+        "bit_xor",
+        camel_value.SupportsBitXor,
+        camel_value.SupportsRBitXor,
+    ),
+    ast.LShift: (
+        "l_shift",
+        camel_value.SupportsLShift,
+        camel_value.SupportsRLShift,
+    ),
+    ast.RShift: (
+        "r_shift",
+        camel_value.SupportsRShift,
+        camel_value.SupportsRRShift,
+    ),
+}
+"""The method and protocols implementing each binary operator."""
+
+
 def _eval_bin_op_inner(
     op: ast.BinOp | ast.AugAssign,
     left: camel_value.Value[Any],
@@ -2133,50 +2830,7 @@ def _eval_bin_op_inner(
   Returns:
       The result of the evaluation.
   """
-  op_map: dict[type[ast.operator], tuple[str, type[Any], type[Any]]] = {
-      ast.Add: ("add", camel_value.SupportsAdd, camel_value.SupportsRAdd),
-      ast.Sub: ("sub", camel_value.SupportsSub, camel_value.SupportsRSub),
-      ast.Mult: ("mult", camel_value.SupportsMult, camel_value.SupportsRMult),
-      ast.Div: (
-          "truediv",
-          camel_value.SupportsTrueDiv,
-          camel_value.SupportsRTrueDiv,
-      ),
-      ast.Mod: ("mod", camel_value.SupportsMod, camel_value.SupportsRMod),
-      ast.Pow: ("pow", camel_value.SupportsPow, camel_value.SupportsRPow),
-      ast.FloorDiv: (
-          "floor_div",
-          camel_value.SupportsFloorDiv,
-          camel_value.SupportsRFloorDiv,
-      ),
-      ast.BitAnd: (
-          "bit_and",
-          camel_value.SupportsBitAnd,
-          camel_value.SupportsRBitAnd,
-      ),
-      ast.BitOr: (
-          "bit_or",
-          camel_value.SupportsBitOr,
-          camel_value.SupportsRBitOr,
-      ),
-      ast.BitXor: (
-          "bit_xor",
-          camel_value.SupportsBitXor,
-          camel_value.SupportsRBitXor,
-      ),
-      ast.LShift: (
-          "l_shift",
-          camel_value.SupportsLShift,
-          camel_value.SupportsRLShift,
-      ),
-      ast.RShift: (
-          "r_shift",
-          camel_value.SupportsRShift,
-          camel_value.SupportsRRShift,
-      ),
-  }
-
-  method_name, protocol, r_protocol = op_map[type(op.op)]
+  method_name, protocol, r_protocol = _BIN_OP_METHODS[type(op.op)]
 
   # Check for operator methods
   if isinstance(left, camel_value.CaMeLClassInstance):
@@ -2220,7 +2874,6 @@ def _eval_bin_op_inner(
     except TypeError as e:
       return result.Error(CaMeLException(e, [op], (left, right)))
 
-  isinstance(left, protocol)
   method: BinaryOp | None = getattr(left, method_name, None)
   if isinstance(left, protocol) and method is not None:
     r = method(right)
@@ -2262,9 +2915,9 @@ def _eval_bin_op(
   Returns:
       The result of the evaluation.
   """
-  left_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.left, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  left_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.left
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match left_res:
     case result.Error():
       return EvalResult(left_res, namespace, tool_calls_chain, dependencies)
@@ -2273,9 +2926,9 @@ def _eval_bin_op(
     case _:
       raise ValueError("Invalid eval result type")
 
-  right_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.right, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  right_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.right
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match right_res:
     case result.Error():
       return EvalResult(right_res, namespace, tool_calls_chain, dependencies)
@@ -2326,9 +2979,9 @@ def _eval_bool_op(
   r = neutral_element
 
   for v in node.values:
-    evaled_value_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        v, namespace, tool_calls_chain, dependencies, eval_args
-    )
+    evaled_value_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+        v
+    )(namespace, tool_calls_chain, dependencies, eval_args)
     match evaled_value_res:
       case result.Error():
         return EvalResult(
@@ -2459,9 +3112,9 @@ def _eval_compare(
         dependencies,
     )
 
-  left_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.left, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  left_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.left
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match left_res:
     case result.Error():
       return EvalResult(left_res, namespace, tool_calls_chain, dependencies)
@@ -2469,9 +3122,9 @@ def _eval_compare(
       left = v
     case _:
       raise ValueError("Invalid eval result type")
-  right_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.comparators[0], namespace, tool_calls_chain, dependencies, eval_args
-  )
+  right_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.comparators[0]
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match right_res:
     case result.Error():
       return EvalResult(right_res, namespace, tool_calls_chain, dependencies)
@@ -2563,9 +3216,9 @@ def _eval_if(
   Returns:
       The result of the evaluation.
   """
-  test_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.test, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  test_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.test
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match test_res:
     case result.Error():
       return EvalResult(test_res, namespace, tool_calls_chain, dependencies)
@@ -2573,12 +3226,13 @@ def _eval_if(
       test = v
     case _:
       raise ValueError("Invalid eval result type")
+  inner_dependencies = DependencyStack.of(dependencies).push(test)
   if test.truth().python_value:
     body_res, namespace, tool_calls_chain, dependencies = _eval_stmt_list(
         node.body,
         namespace,
         tool_calls_chain,
-        [*dependencies, test],
+        inner_dependencies,
         eval_args,
     )
   elif node.orelse:
@@ -2586,7 +3240,7 @@ def _eval_if(
         node.orelse,
         namespace,
         tool_calls_chain,
-        [*dependencies, test],
+        inner_dependencies,
         eval_args,
     )
   # If/else statements can't be assigned, so what is returned is meaningless.
@@ -2600,8 +3254,7 @@ def _eval_if(
         dependencies,
     )
 
-  dependencies = list(dependencies)
-  dependencies.remove(test)
+  dependencies = DependencyStack.of(dependencies).remove(inner_dependencies)
 
   if isinstance(body_res, result.Error):
     return EvalResult(body_res, namespace, tool_calls_chain, dependencies)
@@ -2635,9 +3288,9 @@ def _eval_if_exp(
   Returns:
       The result of the evaluation.
   """
-  test_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.test, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  test_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.test
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match test_res:
     case result.Error():
       return EvalResult(test_res, namespace, tool_calls_chain, dependencies)
@@ -2646,30 +3299,28 @@ def _eval_if_exp(
     case _:
       raise ValueError("Invalid eval result type")
 
-  inner_dependencies = [*dependencies, test]
+  inner_dependencies = DependencyStack.of(dependencies).push(test)
   if test.truth().python_value:
-    body_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        node.body,
+    body_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+        node.body
+    )(
         namespace,
         tool_calls_chain,
         inner_dependencies,
         eval_args,
     )
   else:
-    body_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        node.orelse, namespace, tool_calls_chain, inner_dependencies, eval_args
-    )
+    body_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+        node.orelse
+    )(namespace, tool_calls_chain, inner_dependencies, eval_args)
 
-  dependencies = list(dependencies)
-  dependencies.remove(test)
+  dependencies = DependencyStack.of(dependencies).remove(inner_dependencies)
 
   if isinstance(body_res, result.Error):
     return EvalResult(body_res, namespace, tool_calls_chain, dependencies)
 
   return EvalResult(
-      result.Ok(
-          body_res.value.new_with_dependencies(tuple(inner_dependencies))
-      ),
+      result.Ok(body_res.value.new_with_dependencies(inner_dependencies.values)),
       namespace,
       tool_calls_chain,
       dependencies,
@@ -2712,9 +3363,9 @@ def _eval_for(
         dependencies,
     )
 
-  iterable_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.iter, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  iterable_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.iter
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match iterable_res:
     case result.Error():
       return EvalResult(iterable_res, namespace, tool_calls_chain, dependencies)
@@ -2739,7 +3390,43 @@ def _eval_for(
         dependencies,
     )
 
-  dependencies = [*dependencies, iterable]
+  return _eval_with_prefetching(
+      lambda eval_args: _eval_for_loop(
+          node,
+          iterable,
+          namespace,
+          tool_calls_chain,
+          dependencies,
+          eval_args,
+      ),
+      (node.target, *node.body),
+      eval_args,
+  )
+
+
+def _eval_for_loop(
+    node: ast.For,
+    iterable: camel_value.CaMeLIterable[Any, Any] | camel_value.CaMeLMapping,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Evaluates the body of a for loop for each element of the iterable.
+
+  Args:
+      node: The AST node representing the for loop.
+      iterable: The evaluated iterable.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of the evaluation.
+  """
+  inner_dependencies = DependencyStack.of(dependencies).push(iterable)
+  dependencies = inner_dependencies
   for elt in iterable.iterate_python():
     assign_res, namespace, tool_calls_chain, dependencies = _assign(
         elt,
@@ -2768,8 +3455,7 @@ def _eval_for(
           final_val_res, namespace, tool_calls_chain, dependencies
       )
 
-  dependencies = list(dependencies)
-  dependencies.remove(iterable)
+  dependencies = DependencyStack.of(dependencies).remove(inner_dependencies)
 
   return EvalResult(
       result.Ok(
@@ -2800,20 +3486,73 @@ def _eval_stmt_list(
   Returns:
       The result of the evaluation.
   """
-  # The only case where len(stmts) == 0 should be if there is no code at all
-  # passed to ast.parse. In which case it's fine if it's not None. It's not
-  # possible to have empty bodies for for and if/else bodies.
-  val = camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
-  for stmt in stmts:
-    val_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        stmt, namespace, tool_calls_chain, dependencies, eval_args
-    )
-    match val_res:
-      case result.Error():
-        return EvalResult(val_res, namespace, tool_calls_chain, dependencies)
-      case result.Ok(v):
-        val = v
-      case _:
+  return _eval_bound_stmts(
+      map(_evaluator_of, stmts),
+      namespace,
+      tool_calls_chain,
+      dependencies,
+      eval_args,
+  )
+
+
+def _eval_bound_stmt(
+    bound_stmt: "_BoundEvaluator",
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Evaluates a statement already bound to its evaluator.
+
+  Tool outputs are converted to CaMeL values lazily, so the error of a tool
+  returning an instance of an undefined class is raised by the first statement
+  reading it, and returned as the error of that statement.
+  """
+  try:
+    return bound_stmt(namespace, tool_calls_chain, dependencies, eval_args)
+  except camel_value.UndefinedClassError as e:
+    (node,) = bound_stmt.args
+    return EvalResult(
+        result.Error(CaMeLException(e, (node,), ())),
+        namespace,
+        tool_calls_chain,
+        dependencies,
+    )
+
+
+def _eval_bound_stmts(
+    bound_stmts: Iterable["_BoundEvaluator"],
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Evaluates a list of statements already bound to their evaluators.
+
+  Args:
+      bound_stmts: The evaluators of the statements, with the AST node bound.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of the evaluation.
+  """
+  # The only case where there are no statements should be if there is no code
+  # at all passed to ast.parse. In which case it's fine if it's not None. It's
+  # not possible to have empty bodies for for and if/else bodies.
+  val = camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
+  for bound_stmt in bound_stmts:
+    val_res, namespace, tool_calls_chain, dependencies = _eval_bound_stmt(
+        bound_stmt, namespace, tool_calls_chain, dependencies, eval_args
+    )
+    match val_res:
+      case result.Error():
+        return EvalResult(val_res, namespace, tool_calls_chain, dependencies)
+      case result.Ok(v):
+        val = v
+      case _:
         raise ValueError("Invalid eval result type")
   return EvalResult(result.Ok(val), namespace, tool_calls_chain, dependencies)
 
@@ -2843,9 +3582,9 @@ def _eval_args(
   for arg in args:
     if not isinstance(arg, ast.Starred):
       # normal positional arg
-      evaled_arg_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          arg, namespace, tool_calls_chain, dependencies, eval_args
-      )
+      evaled_arg_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+          arg
+      )(namespace, tool_calls_chain, dependencies, eval_args)
       match evaled_arg_res:
         case result.Error():
           return EvalResult(
@@ -2858,9 +3597,9 @@ def _eval_args(
       evaled_args.append(evaled_arg)
     else:
       # starred iterable
-      evaled_arg_res, namespace, tool_calls_chain, dependencies = camel_eval(
-          arg.value, namespace, tool_calls_chain, dependencies, eval_args
-      )
+      evaled_arg_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+          arg.value
+      )(namespace, tool_calls_chain, dependencies, eval_args)
       match evaled_arg_res:
         case result.Error():
           return EvalResult(
@@ -2925,9 +3664,9 @@ def _eval_keywords(
   """
   evaled_kwargs: dict[camel_value.CaMeLStr, camel_value.Value[Any]] = {}
   for keyword in node.keywords:
-    kwarg_value_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        keyword.value, namespace, tool_calls_chain, dependencies, eval_args
-    )
+    kwarg_value_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+        keyword.value
+    )(namespace, tool_calls_chain, dependencies, eval_args)
     match kwarg_value_res:
       case result.Error():
         return EvalResult(
@@ -3042,9 +3781,9 @@ def _eval_call(
   # - Named arguments and double-starred, unpacked dicts
   # Only after everything is evaluated whether the function is callable is
   # checked.
-  evaled_fn_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.func, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  evaled_fn_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.func
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match evaled_fn_res:
     case result.Error():
       return EvalResult(
@@ -3132,15 +3871,33 @@ def _eval_call(
       evaled_fn.name().raw == "query_ai_assistant"
       and eval_args.eval_mode == DependenciesPropagationMode.STRICT
   ):
-    dependencies = [
-        *dependencies,
+    dependencies = DependencyStack.of(dependencies).push_all((
         *evaled_args.python_value,
         *evaled_kwargs.python_value.values(),
-    ]
+    ))
+
+  if (
+      eval_args.call_prefetcher is not None
+      and eval_args.call_prefetcher.recording
+      and not isinstance(
+          evaled_fn, camel_value.CaMeLBuiltin | camel_value.CaMeLClass
+      )
+  ):
+    # Tools are not run while recording.
+    return EvalResult(
+        result.Ok(
+            eval_args.call_prefetcher.record(
+                evaled_fn, evaled_args, evaled_kwargs, dependencies
+            )
+        ),
+        namespace,
+        tool_calls_chain,
+        dependencies,
+    )
 
   try:
-    ret_res, args_by_keyword = evaled_fn.call(
-        evaled_args, evaled_kwargs, namespace
+    ret_res, args_by_keyword, output = _call(
+        evaled_fn, evaled_args, evaled_kwargs, namespace, eval_args
     )
   except Exception as e:  # pylint: disable=broad-except  # catch all exceptions to be able to return them to the P-LLM
     if isinstance(e, library.NotEnoughInformationError):
@@ -3212,12 +3969,24 @@ def _eval_call(
       function=evaled_fn.name().raw,
       object_type=object_type,
       args=args_by_keyword,
-      output=ret_res.raw,
+      output=output,
       is_builtin=isinstance(
           evaled_fn, camel_value.CaMeLBuiltin | camel_value.CaMeLClass
       ),
   )
 
+  if (
+      tool_call.is_builtin
+      and tool_call.function == "print"
+      and eval_args.print_buffer is not None
+      # Loops are evaluated twice when recording prefetched calls.
+      and (
+          eval_args.call_prefetcher is None
+          or not eval_args.call_prefetcher.recording
+      )
+  ):
+    eval_args.print_buffer.write("".join(map(str, args_by_keyword.values())))
+
   return EvalResult(
       result.Ok(ret_res),
       namespace,
@@ -3247,9 +4016,9 @@ def _eval_expr_list(
   """
   evaled_exprs: list[camel_value.Value[Any]] = []
   for node in nodes:
-    evaled_expr_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        node, namespace, tool_calls_chain, dependencies, eval_args
-    )
+    evaled_expr_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+        node
+    )(namespace, tool_calls_chain, dependencies, eval_args)
     match evaled_expr_res:
       case result.Error():
         return EvalResult(
@@ -3308,7 +4077,7 @@ def _get_defined_classes(
 ) -> dict[str, type[Any]]:
   return {
       k: v.raw
-      for k, v in namespace.variables.items()
+      for k, v in namespace.all_variables().items()
       if isinstance(v, camel_value.CaMeLClass)
   }
 
@@ -3391,7 +4160,7 @@ def _eval_class_def(
     eval_args: EvalArgs,
 ) -> EvalResult:
   """Evaluates a class definition."""
-  if node.name in namespace.variables:
+  if node.name in namespace:
     return EvalResult(
         result.Error(
             CaMeLException(
@@ -3549,9 +4318,9 @@ def _eval_raise(
         tool_calls_chain,
         dependencies,
     )
-  exc_eval_res, namespace, tool_calls_chain, dependencies = camel_eval(
-      node.exc, namespace, tool_calls_chain, dependencies, eval_args
-  )
+  exc_eval_res, namespace, tool_calls_chain, dependencies = _evaluator_of(
+      node.exc
+  )(namespace, tool_calls_chain, dependencies, eval_args)
   match exc_eval_res:
     case result.Error():
       return EvalResult(exc_eval_res, namespace, tool_calls_chain, dependencies)
@@ -3602,365 +4371,385 @@ def _eval_function_def(
   )
 
 
-def camel_eval(
-    node: ast.AST,
+def _eval_pass(
+    node: ast.Pass,  # pylint: disable=unused-argument
     namespace: camel_value.Namespace,
     tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
     dependencies: Iterable[camel_value.Value[Any]],
-    eval_args: EvalArgs,
+    eval_args: EvalArgs,  # pylint: disable=unused-argument
 ) -> EvalResult:
-  """Interprets the given AST enforcing security policies."""
-  match node:
-    # Literals
-    case ast.Constant():
-      return _eval_constant(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.FormattedValue():
-      return _eval_formatted_value(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.JoinedStr():
-      return _eval_joined_str(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.List():
-      return _eval_list(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Tuple():
-      return _eval_tuple(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Set():
-      return _eval_set(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Dict():
-      return _eval_dict(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    # namespace, attribute and subscript loading
-    case ast.Name():
-      return _eval_name_load(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Attribute():
-      return _eval_attribute_load(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Subscript():
-      return _eval_subscript_load(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Slice():
+  return EvalResult(
+      result.Ok(
+          camel_value.CaMeLNone(camel_capabilities.Capabilities.camel(), ())
+      ),
+      namespace,
+      tool_calls_chain,
+      dependencies,
+  )
+
+
+def _eval_import_from(
+    node: ast.ImportFrom,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,  # pylint: disable=unused-argument
+) -> EvalResult:
+  """Evaluates an import from statement (e.g., from pydantic import BaseModel).
+
+  Just skip imports, do not raise exceptions if an import is issued. The model
+  is likely trying to import something that is already included (e.g.,
+  Pydantic).
+
+  Args:
+      node: The AST node representing the import.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of the evaluation.
+  """
+  for alias in node.names:
+    if alias.name not in namespace:
       return EvalResult(
           _make_not_implemented_error(
               node,
-              "Slices are not supported.",
+              f"You can't import {alias.name}. Instead, use what you have"
+              " been provided as described in the system prompt, which you"
+              " can assume has already been imported.",
           ),
           namespace,
           tool_calls_chain,
           dependencies,
       )
-    # Statements
-    case ast.Assign():
-      return _eval_assign(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.AnnAssign():
-      return _eval_ann_assign(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.AugAssign():
-      return _eval_aug_assign(
-          node, namespace, tool_calls_chain, dependencies, eval_args
+    if alias.asname is not None:
+      # The namespace is not updated in place, as checkpoints may share it.
+      namespace = namespace.add_variables(
+          {alias.asname: namespace.get(alias.name), alias.name: None}
       )
+  return _eval_pass(node, namespace, tool_calls_chain, dependencies, eval_args)
+
+
+_Evaluator: TypeAlias = Callable[
+    [
+        Any,
+        camel_value.Namespace,
+        Sequence[function_types.FunctionCall[Any]],
+        Iterable[camel_value.Value[Any]],
+        EvalArgs,
+    ],
+    EvalResult,
+]
+_BoundEvaluator: TypeAlias = Callable[
+    [
+        camel_value.Namespace,
+        Sequence[function_types.FunctionCall[Any]],
+        Iterable[camel_value.Value[Any]],
+        EvalArgs,
+    ],
+    EvalResult,
+]
+
+_EVALUATOR_ATTRIBUTE = "_camel_evaluator"
+"""The attribute of compiled AST nodes holding their bound evaluator."""
+
+_evaluator_of: Callable[[ast.AST], _BoundEvaluator] = operator.attrgetter(
+    _EVALUATOR_ATTRIBUTE
+)
+"""Returns the bound evaluator of a compiled AST node (see `_compile`)."""
+
+
+def _make_unsupported_evaluator(message: str) -> _Evaluator:
+  """Makes an evaluator that rejects the node with the given message."""
+
+  def evaluator(
+      node: ExceptionASTNodes,
+      namespace: camel_value.Namespace,
+      tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+      eval_args: EvalArgs,  # pylint: disable=unused-argument
+  ) -> EvalResult:
+    return EvalResult(
+        _make_not_implemented_error(node, message),
+        namespace,
+        tool_calls_chain,
+        dependencies,
+    )
+
+  return evaluator
+
+
+_EVALUATORS: dict[type[ast.AST], _Evaluator] = {
+    # Literals
+    ast.Constant: _eval_constant,
+    ast.FormattedValue: _eval_formatted_value,
+    ast.JoinedStr: _eval_joined_str,
+    ast.List: _eval_list,
+    ast.Tuple: _eval_tuple,
+    ast.Set: _eval_set,
+    ast.Dict: _eval_dict,
+    # namespace, attribute and subscript loading
+    ast.Name: _eval_name_load,
+    ast.Attribute: _eval_attribute_load,
+    ast.Subscript: _eval_subscript_load,
+    ast.Slice: _make_unsupported_evaluator("Slices are not supported."),
+    # Statements
+    ast.Assign: _eval_assign,
+    ast.AnnAssign: _eval_ann_assign,
+    ast.AugAssign: _eval_aug_assign,
     # Comprehensions
-    case ast.ListComp():
-      return _eval_list_comp(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.SetComp():
-      return _eval_set_comp(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.DictComp():
-      return _eval_dict_comp(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
+    ast.ListComp: _eval_list_comp,
+    ast.SetComp: _eval_set_comp,
+    ast.DictComp: _eval_dict_comp,
     # Expressions
-    case ast.Expr():
-      return _eval_expr(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.NamedExpr():
-      return _eval_named_expr(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.UnaryOp():
-      return _eval_unary_op(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.BinOp():
-      return _eval_bin_op(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.BoolOp():
-      return _eval_bool_op(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Compare():
-      return _eval_compare(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
+    ast.Expr: _eval_expr,
+    ast.NamedExpr: _eval_named_expr,
+    ast.UnaryOp: _eval_unary_op,
+    ast.BinOp: _eval_bin_op,
+    ast.BoolOp: _eval_bool_op,
+    ast.Compare: _eval_compare,
     # Control flow
-    case ast.If():
-      return _eval_if(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.IfExp():
-      return _eval_if_exp(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.For():
-      return _eval_for(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Call():
-      return _eval_call(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
+    ast.If: _eval_if,
+    ast.IfExp: _eval_if_exp,
+    ast.For: _eval_for,
+    ast.Call: _eval_call,
     # Rest
-    case ast.Module():
-      return _eval_module(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.ClassDef():
-      return _eval_class_def(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.FunctionDef():
-      return _eval_function_def(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Raise():
-      return _eval_raise(
-          node, namespace, tool_calls_chain, dependencies, eval_args
-      )
-    case ast.Pass():
-      return EvalResult(
-          result.Ok(
-              camel_value.CaMeLNone(camel_capabilities.Capabilities.camel(), ())
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.Module: _eval_module,
+    ast.ClassDef: _eval_class_def,
+    ast.FunctionDef: _eval_function_def,
+    ast.Raise: _eval_raise,
+    ast.Pass: _eval_pass,
     # The following are unsupported language constructs
-    case ast.GeneratorExp():
-      return EvalResult(
-          _make_not_implemented_error(
-              node,
-              "Generator expressions are not supported. Use a list"
-              " comprehension instead if possible.",
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.While():
-      return EvalResult(
-          _make_not_implemented_error(
-              node,
-              "While statements are not supported. Use a for loop instead.",
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Break():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Break statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Continue():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Continue statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Match():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Match statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.GeneratorExp: _make_unsupported_evaluator(
+        "Generator expressions are not supported. Use a list"
+        " comprehension instead if possible."
+    ),
+    ast.While: _make_unsupported_evaluator(
+        "While statements are not supported. Use a for loop instead."
+    ),
+    ast.Break: _make_unsupported_evaluator(
+        "Break statements are not supported."
+    ),
+    ast.Continue: _make_unsupported_evaluator(
+        "Continue statements are not supported."
+    ),
+    ast.Match: _make_unsupported_evaluator(
+        "Match statements are not supported."
+    ),
     # Function and class definitions (not supported)
-    case ast.Lambda():
-      return EvalResult(
-          _make_not_implemented_error(
-              node,
-              "Defining lambda functions is not supported. If you are operating"
-              " on a list, consider using a list comprehension or a for loop.",
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.Lambda: _make_unsupported_evaluator(
+        "Defining lambda functions is not supported. If you are operating"
+        " on a list, consider using a list comprehension or a for loop."
+    ),
     # Reuturn, yield, yield from (not supported)
-    case ast.Return():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Return statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Yield():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Yield statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.YieldFrom():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Yield from statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.Return: _make_unsupported_evaluator(
+        "Return statements are not supported."
+    ),
+    ast.Yield: _make_unsupported_evaluator(
+        "Yield statements are not supported."
+    ),
+    ast.YieldFrom: _make_unsupported_evaluator(
+        "Yield from statements are not supported."
+    ),
     # Exceptions and assertions (not supported)
-    case ast.ExceptHandler() | ast.Try():
-      return EvalResult(
-          _make_not_implemented_error(
-              node,
-              "Try blocks are are not supported. DO not try to catch"
-              " exceptions.",
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Assert():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Assert statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    **dict.fromkeys(
+        (ast.ExceptHandler, ast.Try),
+        _make_unsupported_evaluator(
+            "Try blocks are are not supported. DO not try to catch"
+            " exceptions."
+        ),
+    ),
+    ast.Assert: _make_unsupported_evaluator(
+        "Assert statements are not supported."
+    ),
     # Delete (not supported):
-    case ast.Delete():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Delete statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.Delete: _make_unsupported_evaluator(
+        "Delete statements are not supported."
+    ),
     # Context managers (not supported):
-    case ast.With():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Context managers are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.With: _make_unsupported_evaluator(
+        "Context managers are not supported."
+    ),
     # Async (not supported)
-    case (
-        ast.AsyncFor() | ast.AsyncWith() | ast.AsyncFunctionDef() | ast.Await()
-    ):
-      return EvalResult(
-          _make_not_implemented_error(node, "Async is not supported."),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    **dict.fromkeys(
+        (ast.AsyncFor, ast.AsyncWith, ast.AsyncFunctionDef, ast.Await),
+        _make_unsupported_evaluator("Async is not supported."),
+    ),
     # Global and non-local (not supported)
-    case ast.Global():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Global statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
-    case ast.Nonlocal():
-      return EvalResult(
-          _make_not_implemented_error(
-              node, "Nonlocal statements are not supported."
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
-      )
+    ast.Global: _make_unsupported_evaluator(
+        "Global statements are not supported."
+    ),
+    ast.Nonlocal: _make_unsupported_evaluator(
+        "Nonlocal statements are not supported."
+    ),
     # Imports (not supported)
-    case ast.Import():
-      return EvalResult(
-          _make_not_implemented_error(
-              node,
-              "You can't import modules. Instead, use what you have been"
-              " provided as described in the system prompt, which you can"
-              " assume has already been imported.",
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
+    ast.Import: _make_unsupported_evaluator(
+        "You can't import modules. Instead, use what you have been"
+        " provided as described in the system prompt, which you can"
+        " assume has already been imported."
+    ),
+    ast.ImportFrom: _eval_import_from,
+}
+"""The evaluator of each supported (or explicitly rejected) node type."""
+
+
+def _get_evaluator(node_type: type[ast.AST]) -> _Evaluator:
+  evaluator = _EVALUATORS.get(node_type)
+  if evaluator is None:
+    # Fall back to the evaluator of a base class, if any.
+    evaluator = next(
+        (e for t, e in _EVALUATORS.items() if issubclass(node_type, t)), None
+    )
+  if evaluator is None:
+    raise NotImplementedError(
+        f"Node of type {node_type.__name__} is not supported."
+    )
+  return evaluator
+
+
+def _eval_unsupported_node(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  # Nodes without an evaluator are only rejected if they are evaluated, as some
+  # (e.g., starred expressions) are handled by the evaluators of their parents.
+  return _get_evaluator(type(node))(
+      node, namespace, tool_calls_chain, dependencies, eval_args
+  )
+
+
+def _bind(node: ast.AST) -> _BoundEvaluator:
+  try:
+    evaluator = _get_evaluator(type(node))
+  except NotImplementedError:
+    evaluator = _eval_unsupported_node
+  return functools.partial(evaluator, node)
+
+
+_EVALUATED_NODES = (ast.mod, ast.stmt, ast.expr, ast.excepthandler)
+"""The types of the AST nodes that can be evaluated."""
+
+
+def _compile(node: ast.AST) -> _BoundEvaluator:
+  """Binds the node and the nodes it contains to their evaluators.
+
+  The evaluators evaluate the nodes they contain with their bound evaluators
+  (`_evaluator_of`), so a compiled tree is evaluated without dispatching on the
+  type of each node, nor creating the bound evaluators of statements again.
+
+  Args:
+      node: The root of the tree to compile.
+
+  Returns:
+      The bound evaluator of the node.
+  """
+  for descendant in ast.walk(node):
+    if isinstance(descendant, _EVALUATED_NODES):
+      setattr(descendant, _EVALUATOR_ATTRIBUTE, _bind(descendant))
+  return _evaluator_of(node)
+
+
+def camel_eval(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Interprets the given AST enforcing security policies.
+
+  The AST is compiled (see `_compile`) when it is first evaluated.
+  """
+  try:
+    evaluator = _evaluator_of(node)
+  except AttributeError:
+    evaluator = _compile(node)
+  return evaluator(namespace, tool_calls_chain, dependencies, eval_args)
+
+
+@dataclasses.dataclass(frozen=True)
+class CompiledCode:
+  """Parsed code whose nodes are bound to their evaluators.
+
+  Instances are cached by `compile_code` and can be run any number of times,
+  as the interpreter never mutates the AST once it is compiled.
+  """
+
+  module: ast.Module
+  """The parsed code."""
+  bound_stmts: tuple[_BoundEvaluator, ...]
+  """The top-level statements, bound to their evaluators."""
+
+  @functools.cached_property
+  def statements(self) -> tuple[str, ...]:
+    """The dumps of the top-level statements, identifying their checkpoints."""
+    return tuple(map(ast.dump, self.module.body))
+
+  def __call__(
+      self,
+      namespace: camel_value.Namespace,
+      tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+      eval_args: EvalArgs,
+  ) -> EvalResult:
+    checkpoints = eval_args.checkpoints
+    if checkpoints is None:
+      return _eval_bound_stmts(
+          self.bound_stmts, namespace, tool_calls_chain, dependencies, eval_args
       )
-    case ast.ImportFrom():
-      # Just skip imports, do not raise exceptions if an import is issued. The
-      # model is likely trying to import something that is already included
-      # (e.g., Pydantic)
-      for alias in node.names:
-        if alias.name not in namespace.variables:
-          return EvalResult(
-              _make_not_implemented_error(
-                  node,
-                  f"You can't import {alias.name}. Instead, use what you have"
-                  " been provided as described in the system prompt, which you"
-                  " can assume has already been imported.",
-              ),
-              namespace,
-              tool_calls_chain,
-              dependencies,
-          )
-        if alias.asname is not None:
-          namespace.variables[alias.asname] = namespace.variables[alias.name]
-          del namespace.variables[alias.name]
-      return EvalResult(
-          result.Ok(
-              camel_value.CaMeLNone(camel_capabilities.Capabilities.camel(), ())
-          ),
-          namespace,
-          tool_calls_chain,
-          dependencies,
+    print_buffer = eval_args.print_buffer or PrintBuffer()
+    print_start = print_buffer.tell()
+    val = camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
+    start = 0
+    if (checkpoint := checkpoints.resume(self.statements)) is not None:
+      start = len(checkpoints.checkpoints)
+      val, namespace = checkpoint.value, checkpoint.restore(namespace)
+      if printed := print_buffer.read(*checkpoint.printed):
+        print_buffer.write(printed)
+    for statement, bound_stmt in zip(
+        self.statements[start:], self.bound_stmts[start:]
+    ):
+      val_res, namespace, tool_calls_chain, dependencies = _eval_bound_stmt(
+          bound_stmt, namespace, tool_calls_chain, dependencies, eval_args
       )
-    case _:
-      raise NotImplementedError(
-          f"Node of type {type(node).__name__} is not supported."
+      match val_res:
+        case result.Error():
+          return EvalResult(val_res, namespace, tool_calls_chain, dependencies)
+        case result.Ok(v):
+          val = v
+        case _:
+          raise ValueError("Invalid eval result type")
+      checkpoints.record(
+          statement, val, namespace, (print_start, print_buffer.tell())
       )
+    checkpoints.clear()
+    return EvalResult(result.Ok(val), namespace, tool_calls_chain, dependencies)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_code(code: str) -> CompiledCode:
+  """Parses the given code and compiles it (see `_compile`).
+
+  Compiled code is cached by the code, so that retried plans (which often
+  contain the same code) are not parsed and compiled again.
+
+  Args:
+      code: The code to compile.
+
+  Returns:
+      The compiled code.
+
+  Raises:
+      SyntaxError: If the code can't be parsed.
+  """
+  module = ast.parse(code)
+  _compile(module)
+  return CompiledCode(module, tuple(map(_evaluator_of, module.body)))
 
 
 class InvalidOutputError(Exception):
@@ -4038,7 +4827,7 @@ def parse_and_interpret_code(
         dependencies,
     )
   try:
-    parsed_code = ast.parse(code)
+    compiled_code = compile_code(code)
   except SyntaxError as e:
     error_nodes: tuple[ExceptionASTNodes, ...] = (
         ast.expr(
@@ -4052,8 +4841,37 @@ def parse_and_interpret_code(
         tool_calls_chain,
         dependencies,
     )
-  return EvalResult(
-      *camel_eval(
-          parsed_code, namespace, tool_calls_chain, dependencies, eval_args
-      )
+  return compiled_code(namespace, tool_calls_chain, dependencies, eval_args)
+
+
+async def parse_and_interpret_code_async(
+    code: str,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Like `parse_and_interpret_code`, without blocking the event loop.
+
+  The code is interpreted in a worker thread, and tools (including coroutine
+  functions) are awaited on the running event loop. Independent calls to tools
+  without side effects in loops and comprehensions run concurrently.
+
+  Args:
+      code: The code to parse and interpret.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of the evaluation.
+  """
+  return await asyncio.to_thread(
+      parse_and_interpret_code,
+      code,
+      namespace,
+      tool_calls_chain,
+      dependencies,
+      dataclasses.replace(eval_args, event_loop=asyncio.get_running_loop()),
   )
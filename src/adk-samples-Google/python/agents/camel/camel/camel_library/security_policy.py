@@ -14,10 +14,17 @@
 
 """Security policies for tools."""
 
+import bisect
 import collections.abc
 import dataclasses
 import fnmatch
+import operator
+import os
+import re
+import threading
+import time
 import typing
+import weakref
 
 from .capabilities import readers
 from .capabilities import utils as capabilities_utils
@@ -87,6 +94,122 @@ def base_security_policy(
 class SecurityPolicyDeniedError(Exception):
   ...
 
+
+LATENCY_BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+"""Upper bounds (in seconds) of the buckets of the policy latency histograms.
+The last bucket of a histogram counts the evaluations slower than 1s."""
+
+
+@dataclasses.dataclass
+class PolicyStats:
+  """Statistics about the evaluations of a policy."""
+
+  evaluations: int = 0
+  denials: int = 0
+  total_latency: float = 0.0
+  """Total time spent evaluating the policy, in seconds."""
+  latency_histogram: list[int] = dataclasses.field(
+      default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+  )
+  """Number of evaluations in each bucket of `LATENCY_BUCKETS`."""
+
+  def record(self, result: SecurityPolicyResult, latency: float) -> None:
+    self.evaluations += 1
+    if isinstance(result, Denied):
+      self.denials += 1
+    self.total_latency += latency
+    self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+
+_GLOB_CHARACTERS = re.compile(r"[*?[]")
+
+
+class _CompiledPolicies:
+  """Policies compiled for dispatch by tool name.
+
+  Policy names without glob characters are looked up in a map, the others are
+  compiled to regular expressions once. The first policy matching a tool name
+  is resolved once per tool name, with the same semantics as matching the
+  names in order with `fnmatch.fnmatch`.
+  """
+
+  def __init__(
+      self, policies: collections.abc.Sequence[tuple[str, SecurityPolicy]]
+  ):
+    self.source = policies
+    """The sequence the policies were compiled from."""
+    self.policies = tuple(policies)
+    self._exact_names: dict[str, int] = {}
+    self._patterns: list[tuple[int, re.Pattern[str]]] = []
+    for i, (policy_name, _) in enumerate(self.policies):
+      policy_name = os.path.normcase(policy_name)
+      if _GLOB_CHARACTERS.search(policy_name):
+        self._patterns.append((i, re.compile(fnmatch.translate(policy_name))))
+      else:
+        self._exact_names.setdefault(policy_name, i)
+    self._resolved: dict[str, int | None] = {}
+    self._lock = threading.Lock()
+    self.stats: dict[str, PolicyStats] = {}
+
+  def is_compiled_from(
+      self, policies: collections.abc.Sequence[tuple[str, SecurityPolicy]]
+  ) -> bool:
+    """Returns whether `policies` holds the policies these were compiled from.
+
+    The entries are compared by identity, without building a new sequence, so
+    that policies replaced in place (e.g. to revoke them) are recompiled.
+    """
+    return (
+        self.source is policies
+        and len(self.policies) == len(policies)
+        and all(map(operator.is_, self.policies, policies))
+    )
+
+  def recompile(
+      self, policies: collections.abc.Sequence[tuple[str, SecurityPolicy]]
+  ) -> "_CompiledPolicies":
+    """Compiles new policies, keeping the statistics collected so far."""
+    compiled_policies = _CompiledPolicies(policies)
+    compiled_policies.stats = self.stats
+    compiled_policies._lock = self._lock
+    return compiled_policies
+
+  def resolve(self, tool_name: str) -> tuple[str, SecurityPolicy] | None:
+    """Returns the first policy matching the tool name, if any."""
+    try:
+      i = self._resolved[tool_name]
+    except KeyError:
+      i = self._resolved[tool_name] = self._find(tool_name)
+    return self.policies[i] if i is not None else None
+
+  def _find(self, tool_name: str) -> int | None:
+    tool_name = os.path.normcase(tool_name)
+    exact_match = self._exact_names.get(tool_name)
+    for i, pattern in self._patterns:
+      if exact_match is not None and i > exact_match:
+        break
+      if pattern.match(tool_name):
+        return i
+    return exact_match
+
+  def record(
+      self, policy_name: str, result: SecurityPolicyResult, latency: float
+  ) -> None:
+    with self._lock:
+      if policy_name not in self.stats:
+        self.stats[policy_name] = PolicyStats()
+      self.stats[policy_name].record(result, latency)
+
+  def get_stats(self) -> dict[str, PolicyStats]:
+    with self._lock:
+      return {
+          name: dataclasses.replace(
+              stats, latency_histogram=list(stats.latency_histogram)
+          )
+          for name, stats in self.stats.items()
+      }
+
+
 @typing.runtime_checkable
 class SecurityPolicyEngine(typing.Protocol):
   """Protocol for a Security policy engine."""
@@ -123,10 +246,56 @@ class SecurityPolicyEngine(typing.Protocol):
           f"{tool_name} is state-changing and depends on private values"
           f" {non_public_variables}."
       )
-    for policy_name, policy in self.policies:
-      if fnmatch.fnmatch(tool_name, policy_name):
-        return policy(tool_name, kwargs)
-    return Denied("No security policy matched for tool. Defaulting to denial.")
+    compiled_policies = _get_compiled_policies(self)
+    match compiled_policies.resolve(tool_name):
+      case None:
+        return Denied(
+            "No security policy matched for tool. Defaulting to denial."
+        )
+      case (policy_name, policy):
+        start = time.perf_counter()
+        result = policy(tool_name, kwargs)
+        compiled_policies.record(
+            policy_name, result, time.perf_counter() - start
+        )
+        return result
+
+
+_compiled_policies: weakref.WeakKeyDictionary[
+    SecurityPolicyEngine, _CompiledPolicies
+] = weakref.WeakKeyDictionary()
+"""The compiled policies of the engines, kept outside of them so that any
+object with the members of `SecurityPolicyEngine` is still one."""
+
+
+def _get_compiled_policies(engine: SecurityPolicyEngine) -> _CompiledPolicies:
+  """Returns the compiled policies of `engine`, recompiling them if needed."""
+  policies = engine.policies
+  try:
+    compiled_policies = _compiled_policies.get(engine)
+  except TypeError:
+    # Unhashable engines can't be keys, so their policies are not cached.
+    return _CompiledPolicies(policies)
+  if compiled_policies is None:
+    compiled_policies = _CompiledPolicies(policies)
+  elif not compiled_policies.is_compiled_from(policies):
+    compiled_policies = compiled_policies.recompile(policies)
+  else:
+    return compiled_policies
+  _compiled_policies[engine] = compiled_policies
+  return compiled_policies
+
+
+def get_policy_stats(engine: SecurityPolicyEngine) -> dict[str, PolicyStats]:
+  """Returns the statistics of the evaluations of the policies, by name.
+
+  Args:
+      engine: The engine whose `check_policy` evaluated the policies.
+
+  Returns:
+      The statistics of each policy that was evaluated at least once.
+  """
+  return _get_compiled_policies(engine).get_stats()
 
 
 class NoSecurityPolicyEngine(SecurityPolicyEngine):
@@ -0,0 +1,39 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test cases for the CaMeL agent services."""
+
+from camel.camel_agent import camel_agent
+from camel.camel_library import security_policy
+from camel.camel_library.interpreter import interpreter
+
+
+def test_qllm_outputs_are_not_reused_by_the_next_run():
+  service = camel_agent.CaMelInterpreterService(
+      model="gemini-2.0-flash",
+      tools=[],
+      eval_args=interpreter.EvalArgs(
+          security_policy.NoSecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+  )
+  qllm_service = service.quarantined_llm_service
+  # E.g., the output of a query of another session.
+  qllm_service._cache_result("Summarize the email.", "str", "Private summary")  # pylint: disable=protected-access
+
+  output, _, error, _, _ = service.execute_code("```python\n1 + 1\n```", [], ())
+
+  assert error is None
+  assert output == "2"
+  assert not qllm_service.result_cache
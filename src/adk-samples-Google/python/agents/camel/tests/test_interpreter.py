@@ -0,0 +1,455 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test cases for the CaMeL interpreter."""
+
+import asyncio
+
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import readers
+from camel.camel_library.capabilities import sources
+from camel.camel_library.capabilities import utils as capabilities_utils
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+
+
+def make_namespace(
+    *tools, tool_capabilities=capabilities.Capabilities.camel()
+) -> camel_value.Namespace:
+  return library.make_builtins_namespace({
+      tool.__name__: camel_value.CaMeLFunction(
+          tool.__name__, tool, tool_capabilities, ()
+      )
+      for tool in tools
+  })
+
+
+def run_programs(programs, namespace, eval_args):
+  """Runs the programs in order, carrying the state like the agent does."""
+  tool_calls_chain, dependencies = [], ()
+  results = []
+  for program in programs:
+    res, namespace, tool_calls_chain, dependencies = (
+        interpreter.parse_and_interpret_code(
+            f"```python\n{program}\n```",
+            namespace,
+            tool_calls_chain,
+            dependencies,
+            eval_args,
+        )
+    )
+    results.append(res)
+  return results
+
+
+def test_resume_keeps_variables_assigned_after_the_checkpoint():
+  calls = []
+
+  def get_logged_items() -> list[str]:
+    calls.append("get_logged_items")
+    return ["a", "b", "c"]
+
+  checkpoints = interpreter.Checkpoints()
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+      checkpoints=checkpoints,
+  )
+  failed, regenerated = run_programs(
+      [
+          "items = get_logged_items()\ncount = len(items)\nitems[count]",
+          "items = get_logged_items()\nitems[count - 1]",
+      ],
+      make_namespace(get_logged_items),
+      eval_args,
+  )
+
+  assert isinstance(failed, result.Error)
+  assert isinstance(regenerated, result.Ok)
+  assert regenerated.value.raw == "c"
+  # The regenerated program resumed after its first statement.
+  assert calls == ["get_logged_items"]
+
+
+def test_readers_are_recomputed_when_a_dependency_is_mutated():
+  def get_secret() -> str:
+    return "s3cret"
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  namespace = make_namespace(
+      get_secret,
+      tool_capabilities=capabilities.Capabilities(
+          frozenset({sources.SourceEnum.USER}), frozenset({"bob"})
+      ),
+  )
+  res = interpreter.parse_and_interpret_code(
+      "```python\nouter = [['x']]\ninner = outer[0]\n```",
+      namespace,
+      [],
+      (),
+      eval_args,
+  )
+  outer = res.namespace.get("outer")
+  assert capabilities_utils.get_all_readers(outer)[0] == readers.Public()
+  summary = outer._capabilities_summary  # pylint: disable=protected-access
+
+  # Mutating a value outer doesn't depend on keeps its cached readers.
+  res = interpreter.parse_and_interpret_code(
+      "```python\nother = [1]\nother[0] = 2\n```", *res[1:], eval_args
+  )
+  capabilities_utils.get_all_readers(outer)
+  assert outer._capabilities_summary is summary  # pylint: disable=protected-access
+
+  # `inner` is a copy of the list in outer, sharing its contents.
+  interpreter.parse_and_interpret_code(
+      "```python\ninner[0] = get_secret()\n```", *res[1:], eval_args
+  )
+  assert capabilities_utils.get_all_readers(outer)[0] == {"bob"}
+
+
+def test_tool_outputs_are_recorded_without_copies():
+  emails = [{"subject": "Hi", "to": ["bob"]}]
+
+  def get_emails() -> list[dict[str, object]]:
+    return emails
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  res = interpreter.parse_and_interpret_code(
+      "```python\nsubject = get_emails()[0]['subject']\n```",
+      make_namespace(get_emails),
+      [],
+      (),
+      eval_args,
+  )
+
+  assert res.namespace.get("subject").raw == "Hi"
+  (tool_call,) = res.tool_calls_chain
+  assert tool_call.output is emails
+
+
+def test_tool_outputs_do_not_change_with_the_tool_state():
+  inbox = [{"subject": "old"}]
+
+  def get_inbox() -> list[dict[str, str]]:
+    return inbox
+
+  def receive_email(subject: str) -> None:
+    inbox.append({"subject": subject})
+    inbox[0] = {"subject": "MUTATED"}
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  (res,) = run_programs(
+      [
+          "emails = get_inbox()\nreceive_email('new')\n"
+          "(len(emails), emails[0]['subject'])"
+      ],
+      make_namespace(get_inbox, receive_email),
+      eval_args,
+  )
+
+  assert isinstance(res, result.Ok)
+  assert res.value.raw == (1, "old")
+
+
+def test_sync_interpreter_awaits_tools_inside_a_running_event_loop():
+  async def get_answer() -> int:
+    await asyncio.sleep(0)
+    return 42
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+
+  async def handler():
+    # E.g., an ADK async handler calling the sync interpreter.
+    return run_programs(
+        ["get_answer() + 1"], make_namespace(get_answer), eval_args
+    )
+
+  (res,) = asyncio.run(handler())
+  assert isinstance(res, result.Ok)
+  assert res.value.raw == 43
+
+
+def test_str_indexing_and_slicing_keep_the_capabilities_of_each_part():
+  parts = {
+      "a": ("ab", frozenset({"alice"})),
+      "b": ("cde", frozenset({"bob"})),
+      "c": ("f", frozenset({"carol"})),
+  }
+  variables = {}
+  expected = []
+  for name, (string, part_readers) in parts.items():
+    part_capabilities = capabilities.Capabilities(
+        frozenset({sources.SourceEnum.USER}), part_readers
+    )
+    variables[name] = camel_value.CaMeLStr.from_raw(
+        string, part_capabilities, ()
+    )
+    expected.extend([part_capabilities] * len(string))
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  res = interpreter.parse_and_interpret_code(
+      "```python\n"
+      "s = a + b + c\n"
+      "chars = [s[i] for i in range(-len(s), len(s))]\n"
+      "```",
+      library.make_builtins_namespace(variables),
+      [],
+      (),
+      eval_args,
+  )
+
+  assert isinstance(res.result, result.Ok)
+  chars = res.namespace.get("chars").python_value
+  assert "".join(c.raw for c in chars) == "abcdef" * 2
+  assert [c.capabilities for c in chars] == expected * 2
+  # Slices are not supported by the interpreter, but by the values.
+  s = res.namespace.get("s")
+  for i in range(-7, 7):
+    for j in range(-7, 7):
+      sliced = s.slice(
+          camel_value.CaMeLInt(i, capabilities.Capabilities.camel(), ()),
+          camel_value.CaMeLInt(j, capabilities.Capabilities.camel(), ()),
+          camel_value.CaMeLNone(capabilities.Capabilities.camel(), ()),
+      )
+      assert sliced.raw == "abcdef"[i:j]
+      assert [c.capabilities for c in sliced.iterate_python()] == expected[i:j]
+
+
+def test_dict_keys_are_found_by_value_after_updates():
+  def get_key() -> str:
+    return "b"
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  (res,) = run_programs(
+      [
+          "d = {'a': 0, 1: 'one'}\n"
+          "for i in range(10):\n"
+          "  d[get_key()] = i\n"
+          "  d['c'] = i\n"
+          "(d['a'], d[1.0], d[True], d['b'], len(d), list(d), 'b' in d,"
+          " 'z' in d, [1] in d)"
+      ],
+      make_namespace(get_key),
+      eval_args,
+  )
+
+  assert isinstance(res, result.Ok)
+  assert res.value.raw == (
+      0,
+      "one",
+      "one",
+      9,
+      4,
+      ["a", 1, "b", "c"],
+      True,
+      False,
+      False,
+  )
+
+
+def test_variables_are_shadowed_by_deeply_nested_scopes():
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  namespace = make_namespace()
+  shadowing = " ".join(["for x in [x + 1]"] * 11)
+  loop = interpreter.parse_and_interpret_code(
+      "```python\nx = 0\nfor i in range(12):\n  x = x + 1\n```",
+      namespace,
+      [],
+      (),
+      eval_args,
+  )
+  # Each generator of the comprehensions shadows the previous one.
+  comprehensions = interpreter.parse_and_interpret_code(
+      f"```python\ny = [x for x in range(3) {shadowing}]\n"
+      f"z = [w for w in range(3) {shadowing.replace('x', 'w')}]\n"
+      "(x, y, z)\n```",
+      *loop[1:],
+      eval_args,
+  )
+
+  assert isinstance(comprehensions.result, result.Ok)
+  assert comprehensions.result.value.raw == (12, [11, 12, 13], [11, 12, 13])
+  # The comprehension variables don't leak, and the namespaces of the previous
+  # statements are left untouched.
+  assert "w" not in comprehensions.namespace
+  assert "y" not in loop.namespace
+  assert loop.namespace.get("x").raw == 12
+  assert "x" not in namespace
+
+
+def test_nested_control_flow_dependencies_are_scoped_to_their_blocks():
+  def get_items() -> list[int]:
+    return [1, 2]
+
+  def get_flag() -> bool:
+    return True
+
+  namespace = library.make_builtins_namespace({
+      tool.__name__: camel_value.CaMeLFunction(
+          tool.__name__,
+          tool,
+          capabilities.Capabilities(
+              frozenset({sources.SourceEnum.USER}), frozenset(tool_readers)
+          ),
+          (),
+      )
+      for tool, tool_readers in (
+          (get_items, {"alice", "bob"}),
+          (get_flag, {"bob", "carol"}),
+      )
+  })
+  code = (
+      "```python\n"
+      "items = get_items()\n"
+      "flag = get_flag()\n"
+      "for item in items:\n"
+      "  if flag:\n"
+      "    in_if = 1\n"
+      "  in_for = 1\n"
+      "  in_if_exp = 1 if flag else 2\n"
+      "after = 1\n"
+      "```"
+  )
+
+  def get_readers(mode):
+    eval_args = interpreter.EvalArgs(
+        security_policy.NoSecurityPolicyEngine(), mode
+    )
+    res = interpreter.parse_and_interpret_code(
+        code, namespace, [], (), eval_args
+    )
+    assert isinstance(res.result, result.Ok)
+    return {
+        name: capabilities_utils.get_all_readers(res.namespace.get(name))[0]
+        for name in ("in_if", "in_for", "in_if_exp", "after")
+    }
+
+  assert get_readers(interpreter.DependenciesPropagationMode.STRICT) == {
+      "in_if": {"bob"},
+      "in_for": {"alice", "bob"},
+      "in_if_exp": {"bob"},
+      "after": readers.Public(),
+  }
+  # Only if expressions depend on the control flow in normal mode.
+  assert get_readers(interpreter.DependenciesPropagationMode.NORMAL) == {
+      "in_if": readers.Public(),
+      "in_for": readers.Public(),
+      "in_if_exp": {"bob"},
+      "after": readers.Public(),
+  }
+
+
+def test_dependencies_are_deduplicated_and_keep_the_readers():
+  def get_secret() -> str:
+    return "s3cret"
+
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  res = interpreter.parse_and_interpret_code(
+      "```python\n"
+      "secret = get_secret()\n"
+      "pair = [secret, secret]\n"
+      "nested = {'a': pair, 'b': [pair, pair]}\n"
+      "missing = 'public' in pair\n"
+      "size = len(nested['b'])\n"
+      "```",
+      make_namespace(
+          get_secret,
+          tool_capabilities=capabilities.Capabilities(
+              frozenset({sources.SourceEnum.USER}), frozenset({"bob"})
+          ),
+      ),
+      [],
+      (),
+      eval_args,
+  )
+
+  assert isinstance(res.result, result.Ok)
+  nested = res.namespace.get("nested")
+  dependencies, _ = nested.get_dependencies()
+  assert len(set(map(id, dependencies))) == len(dependencies)
+  # The results of `in` and `len` still depend on every element.
+  for name in ("nested", "missing", "size"):
+    readers_ = capabilities_utils.get_all_readers(res.namespace.get(name))[0]
+    assert readers_ == {"bob"}, name
+
+
+def test_prints_are_buffered_and_streamed_in_order():
+  print_buffer = interpreter.PrintBuffer()
+  streamed = []
+  print_buffer.on_print = streamed.append
+  eval_args = interpreter.EvalArgs(
+      security_policy.NoSecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+      checkpoints=interpreter.Checkpoints(),
+      print_buffer=print_buffer,
+  )
+  statements = (
+      "print('start ')\n"
+      "for i in range(3):\n"
+      "  if i % 2:\n"
+      "    print(f'odd {i} ')\n"
+      "  else:\n"
+      "    print(f'even {i} ')\n"
+      "[print(f'{j} ') for j in range(2)]\n"
+  )
+  output = "start even 0 odd 1 even 2 0 1 "
+
+  failed = interpreter.parse_and_interpret_code(
+      f"```python\n{statements}undefined_variable\n```",
+      library.make_builtins_namespace(),
+      [],
+      (),
+      eval_args,
+  )
+  assert isinstance(failed.result, result.Error)
+  assert print_buffer.read(0) == output
+  assert streamed == ["start ", "even 0 ", "odd 1 ", "even 2 ", "0 ", "1 "]
+
+  # The regenerated program is resumed after the statements it shares with the
+  # failed one, whose output is printed again before its own.
+  start = print_buffer.tell()
+  streamed.clear()
+  regenerated = interpreter.parse_and_interpret_code(
+      f"```python\n{statements}print('end')\n```", *failed[1:], eval_args
+  )
+  assert isinstance(regenerated.result, result.Ok)
+  assert print_buffer.read(start) == output + "end"
+  assert streamed == [output, "end"]
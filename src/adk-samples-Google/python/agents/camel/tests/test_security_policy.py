@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test cases for the security policy engines."""
+
+from camel.camel_library import security_policy
+
+
+class DuckTypedEngine:
+
+  def __init__(self):
+    self.policies = []
+    self.no_side_effect_tools = set()
+
+  def check_policy(self, tool_name, kwargs, dependencies):
+    return security_policy.Allowed()
+
+
+class SendOnlyEngine(security_policy.SecurityPolicyEngine):
+
+  def __init__(self):
+    self.policies = [
+        ("send_*", lambda tool_name, kwargs: security_policy.Allowed()),
+        ("*", lambda tool_name, kwargs: security_policy.Denied("Not send.")),
+    ]
+    self.no_side_effect_tools = set()
+
+
+def test_duck_typed_engines_are_engines():
+  assert isinstance(DuckTypedEngine(), security_policy.SecurityPolicyEngine)
+
+
+def test_policies_are_dispatched_in_order_and_recorded():
+  engine = SendOnlyEngine()
+
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+  assert engine.check_policy("read", {}, ()) == security_policy.Denied(
+      "Not send."
+  )
+  engine.policies.insert(
+      0, ("read", lambda tool_name, kwargs: security_policy.Allowed())
+  )
+  assert engine.check_policy("read", {}, ()) == security_policy.Allowed()
+
+  stats = security_policy.get_policy_stats(engine)
+  assert {name: s.evaluations for name, s in stats.items()} == {
+      "send_*": 1,
+      "*": 1,
+      "read": 1,
+  }
+  assert stats["*"].denials == 1
+
+
+def test_policies_replaced_in_place_are_dispatched():
+  engine = SendOnlyEngine()
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+
+  engine.policies[0] = (
+      "send_*",
+      lambda tool_name, kwargs: security_policy.Denied("Revoked."),
+  )
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Denied(
+      "Revoked."
+  )
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of attribute, category and query searches in the WebShop.
+
+`<a>`, `<c>` and `<q>` searches are run on the 1k, 10k and 50k products
+configurations, both by scanning all products and with the indexes built by
+`load_products`, for attributes, categories and queries sampled from the
+products. It reports the median time of a search for each of them.
+
+Run with:
+
+  python -m benchmarks.search_benchmark
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from personalized_shopping.shared_libraries.web_agent_site.engine.engine import (
+    get_top_n_product_from_keywords,
+    load_products,
+)
+from personalized_shopping.shared_libraries.web_agent_site.utils import (
+    DEFAULT_FILE_PATH,
+)
+
+NUM_PRODUCTS = [1000, 10000, 50000]
+
+
+def sample_keywords(all_products, num_keywords, seed=0):
+    """Sample `<a>`, `<c>` and `<q>` search keywords from the products"""
+    rng = random.Random(seed)
+    products = rng.choices(all_products, k=num_keywords)
+    return {
+        "<a>": [["<a>", rng.choice(p["Attributes"])] for p in products],
+        "<c>": [["<c>", p["category"]] for p in products],
+        "<q>": [["<q>", *p["query"].split(" ")] for p in products],
+    }
+
+
+def time_searches(keywords_list, repeat, **kwargs):
+    """Returns the median time of a search in milliseconds, and the results"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [
+            get_top_n_product_from_keywords(keywords, None, **kwargs)
+            for keywords in keywords_list
+        ]
+        timings.append((time.perf_counter() - start) / len(keywords_list))
+    return statistics.median(timings) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--num-products",
+        type=int,
+        nargs="*",
+        choices=NUM_PRODUCTS,
+        default=NUM_PRODUCTS,
+    )
+    parser.add_argument("--num-keywords", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for num_products in args.num_products:
+        (
+            all_products,
+            product_item_dict,
+            _,
+            attribute_to_asins,
+            product_indexes,
+        ) = load_products(DEFAULT_FILE_PATH, num_products=num_products)
+        for search, keywords_list in sample_keywords(
+            all_products, args.num_keywords
+        ).items():
+            kwargs = dict(
+                all_products=all_products,
+                product_item_dict=product_item_dict,
+                attribute_to_asins=attribute_to_asins,
+            )
+            scan_ms, scan_results = time_searches(keywords_list, args.repeat, **kwargs)
+            index_ms, index_results = time_searches(
+                keywords_list, args.repeat, product_indexes=product_indexes, **kwargs
+            )
+            assert scan_results == index_results, search
+            rows.append((num_products, search, scan_ms, index_ms))
+
+    print(f"{'products':>8} {'search':>6} {'scan':>10} {'index':>10} {'speedup':>8}")
+    for num_products, search, scan_ms, index_ms in rows:
+        print(
+            f"{num_products:>8} {search:>6} {scan_ms:>8.3f}ms {index_ms:>8.3f}ms"
+            f" {scan_ms / index_ms:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the startup of the agent.
+
+It reports separately the time to import the agent, which does not build the
+WebShop environment, the latency of the first search request, which builds it
+unless `--warm-up` is given, and the latency of the next search request. Run
+it in a fresh process, so that the agent is not imported yet:
+
+  python -m benchmarks.startup_benchmark
+"""
+
+import argparse
+import importlib
+import time
+
+
+def timed(function, *args):
+    """Returns the time taken by `function(*args)` in seconds"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def search(keywords):
+    from personalized_shopping.shared_libraries.init_env import get_webshop_env
+
+    env = get_webshop_env()
+    env.step(f"search[{keywords}]")
+    # The results page is only rendered when an observation is requested
+    return env.observation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--warm-up",
+        action="store_true",
+        help="Warm up the agent before the first request.",
+    )
+    parser.add_argument("--keywords", default="floral summer dress")
+    args = parser.parse_args()
+
+    timings = [
+        ("import", timed(importlib.import_module, "personalized_shopping.agent"))
+    ]
+    if args.warm_up:
+        from personalized_shopping.shared_libraries.init_env import warm_up
+
+        timings.append(("warm-up", timed(warm_up)))
+    timings.append(("first request", timed(search, args.keywords)))
+    timings.append(("next request", timed(search, args.keywords)))
+
+    for name, seconds in timings:
+        print(f"{name:>14} {seconds:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
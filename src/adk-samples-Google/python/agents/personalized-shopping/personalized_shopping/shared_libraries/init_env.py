@@ -12,6 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+"""WebShop environments of the agent tools.
+
+The shared environment loads the products, the search engine and the goals,
+which takes a while, so it is only built on first use by `get_webshop_env`.
+Call `warm_up` to build it, and load the spaCy model used by the rewards,
+before serving the first request.
+
+Each ADK session shops in its own environment (`get_session_env`), which
+shares the server of the shared environment and only keeps the state of its
+browser and of its session.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+import uuid
+
 import gym
 
 gym.envs.registration.register(
@@ -22,16 +39,94 @@ gym.envs.registration.register(
 )
 
 
-def init_env(num_products):
+def init_env(num_products, **kwargs):
     env = gym.make(
         "WebAgentTextEnv-v0",
         observation_mode="text",
         num_products=num_products,
+        text_renderer=True,
+        **kwargs,
     )
     return env
 
 
 num_product_items = 50000
-webshop_env = init_env(num_product_items)
-webshop_env.reset()
-print(f"Finished initializing WebshopEnv with {num_product_items} items.")
+max_sessions = 1000
+# Whether the tools save the HTML of the pages they lead to as artifacts, which
+# are shown in the web UI. Set it to False to skip rendering every page the tools
+# visit when the pages are not shown.
+html_artifacts = True
+
+# Key of the session state holding the WebShop session of an ADK session
+SESSION_STATE_KEY = "webshop_session_id"
+
+_webshop_env = None
+_webshop_env_lock = threading.Lock()
+_session_envs = OrderedDict()
+_session_envs_lock = threading.Lock()
+
+
+def get_webshop_env():
+    """Returns the shared WebShop environment, built on first use"""
+    global _webshop_env
+    with _webshop_env_lock:
+        if _webshop_env is None:
+            start = time.perf_counter()
+            env = init_env(num_product_items)
+            env.reset()
+            _webshop_env = env
+            print(
+                f"Finished initializing WebshopEnv with {num_product_items} items"
+                f" in {time.perf_counter() - start:.2f}s."
+            )
+    return _webshop_env
+
+
+def get_session_env(tool_context):
+    """Returns the WebShop environment of the ADK session of `tool_context`
+
+    The environment is created on the first call in the session. Past
+    `max_sessions` environments, the least recently used one is closed, which
+    ends its WebShop session.
+    """
+    session_id = tool_context.state.get(SESSION_STATE_KEY)
+    if session_id is None:
+        session_id = uuid.uuid4().hex
+        tool_context.state[SESSION_STATE_KEY] = session_id
+    server = get_webshop_env().server
+    with _session_envs_lock:
+        env = _session_envs.get(session_id)
+        if env is not None:
+            _session_envs.move_to_end(session_id)
+            return env
+    # Built outside of the lock, so that new sessions don't wait for each other
+    new_env = init_env(num_product_items, server=server)
+    # Resetting in the session it started in enables steps, without starting
+    # another session on the server
+    new_env.reset(session=new_env.session)
+    oldest_env = None
+    with _session_envs_lock:
+        env = _session_envs.setdefault(session_id, new_env)
+        if len(_session_envs) > max_sessions:
+            _, oldest_env = _session_envs.popitem(last=False)
+    if env is not new_env:
+        # Another request of the session built its environment first
+        new_env.close()
+    if oldest_env is not None:
+        oldest_env.close()
+    return env
+
+
+def warm_up():
+    """Builds the WebShop environment and loads the spaCy model"""
+    from .web_agent_site.engine.goal import get_nlp
+
+    get_webshop_env()
+    get_nlp()
+
+
+def __getattr__(name):
+    # `webshop_env` used to be built at import
+    if name == "webshop_env":
+        return get_webshop_env()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,293 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Preprocessed catalog of the products loaded by `engine.load_products`.
+
+A catalog is written once for the source files of the products and the
+`load_products` arguments, in a directory named after a hash of their contents.
+It contains:
+
+- `columns.json`: the fields of the products used to search them and to set
+  goals (`EAGER_KEYS`), one column per field;
+- `records.bin`: the other fields of each product, as concatenated JSON
+  records;
+- `offsets.npy`: the offsets of the records in `records.bin`.
+
+The columns are loaded with the catalog, while the records are memory-mapped
+and only decoded when a product page needs them.
+
+Build the catalog of the agent environment ahead of its first start with:
+
+    python -m personalized_shopping.shared_libraries.web_agent_site.engine.catalog
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+CATALOG_VERSION = 1
+
+EAGER_KEYS = (
+    "asin",
+    "category",
+    "query",
+    "product_category",
+    "name",
+    "Title",
+    "Price",
+    "pricing",
+    "options",
+    "Attributes",
+    "MainImage",
+    "instructions",
+    "instruction_text",
+    "instruction_attributes",
+)
+
+COLUMNS_FILE = "columns.json"
+RECORDS_FILE = "records.bin"
+OFFSETS_FILE = "offsets.npy"
+DIGESTS_FILE = "digests.json"
+
+
+class LazyProduct(dict):
+    """Product whose fields outside of `EAGER_KEYS` are decoded on first access
+
+    Looking up a field that is not loaded yet decodes all the other fields, and
+    so does any operation on the product as a whole (iteration, comparison,
+    copy, serialization).
+    """
+
+    __slots__ = ("_records", "_index")
+
+    @classmethod
+    def from_fields(cls, fields, records, index):
+        product = cls(fields)
+        product._records = records
+        product._index = index
+        return product
+
+    def _decode(self):
+        records = self._records
+        if records is not None:
+            # Fields set since the product was loaded take precedence
+            for key, value in records.decode(self._index).items():
+                dict.setdefault(self, key, value)
+            # Cleared once all the fields are set, as products are shared by the
+            # threads of the server: a concurrent reader decodes them again
+            self._records = None
+
+    def _has(self, key):
+        # The records never contain the eager fields
+        if not dict.__contains__(self, key) and key not in EAGER_KEYS:
+            self._decode()
+        return dict.__contains__(self, key)
+
+    def __missing__(self, key):
+        if self._has(key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return self._has(key)
+
+    def get(self, key, default=None):
+        return dict.__getitem__(self, key) if self._has(key) else default
+
+    def setdefault(self, key, default=None):
+        self._decode()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *default):
+        self._decode()
+        return dict.pop(self, key, *default)
+
+    def __iter__(self):
+        self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._decode()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._decode()
+        return dict.keys(self)
+
+    def values(self):
+        self._decode()
+        return dict.values(self)
+
+    def items(self):
+        self._decode()
+        return dict.items(self)
+
+    def copy(self):
+        self._decode()
+        return dict(dict.items(self))
+
+    def __eq__(self, other):
+        self._decode()
+        if isinstance(other, LazyProduct):
+            other._decode()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._decode()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        # Pickled as a plain dict, without the memory-mapped records
+        return dict, (self.copy(),)
+
+
+class Records:
+    """Memory-mapped JSON records, indexed by their offsets"""
+
+    def __init__(self, directory):
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, RECORDS_FILE), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b""
+
+    def decode(self, index):
+        start, end = self.offsets[index : index + 2]
+        return json.loads(self.data[start:end])
+
+
+def file_digest(path, cache_dir):
+    """SHA-256 of a file, memoized in `cache_dir` by its path, size and mtime"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    digests_path = os.path.join(cache_dir, DIGESTS_FILE)
+    try:
+        with open(digests_path) as f:
+            digests = json.load(f)
+    except (OSError, ValueError):
+        digests = {}
+    signature = [stat.st_size, stat.st_mtime_ns]
+    if path in digests and digests[path][:2] == signature:
+        return digests[path][2]
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    digests[path] = signature + [digest]
+    _atomic_write_json(digests_path, digests, cache_dir)
+    return digest
+
+
+def catalog_path(source_paths, cache_dir, **kwargs):
+    """Directory of the catalog of `source_paths` loaded with `kwargs`"""
+    os.makedirs(cache_dir, exist_ok=True)
+    key = json.dumps(
+        {
+            "version": CATALOG_VERSION,
+            "sources": [file_digest(path, cache_dir) for path in source_paths],
+            **kwargs,
+        },
+        sort_keys=True,
+    )
+    return os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def read_catalog(directory):
+    """Products of the catalog in `directory`, or None if it was not written"""
+    try:
+        with open(os.path.join(directory, COLUMNS_FILE)) as f:
+            catalog = json.load(f)
+    except FileNotFoundError:
+        return None
+    records = Records(directory)
+    columns = catalog["columns"]
+    dense = [key for key, column in columns.items() if isinstance(column, list)]
+    rows = zip(*(columns[key] for key in dense))
+    products = [
+        LazyProduct.from_fields(zip(dense, row), records, i)
+        for i, row in zip(range(catalog["num_products"]), rows)
+    ]
+    # Sparse columns, for the fields that only some products have
+    for key, column in columns.items():
+        if not isinstance(column, list):
+            for i, value in column.items():
+                products[int(i)][key] = value
+    return products
+
+
+def write_catalog(directory, products):
+    """Write the catalog of `products` to `directory`
+
+    The catalog is written to a temporary directory first, so that processes
+    loading the same products concurrently never read a partial catalog.
+    """
+    cache_dir = os.path.dirname(directory)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+    os.chmod(tmp_dir, 0o755)
+    columns = {}
+    for key in EAGER_KEYS:
+        rows = [i for i, p in enumerate(products) if key in p]
+        if len(rows) == len(products):
+            columns[key] = [p[key] for p in products]
+        elif rows:
+            columns[key] = {i: products[i][key] for i in rows}
+    offsets = [0]
+    with open(os.path.join(tmp_dir, RECORDS_FILE), "wb") as f:
+        for p in products:
+            record = {k: v for k, v in p.items() if k not in EAGER_KEYS}
+            offsets.append(offsets[-1] + f.write(json.dumps(record).encode()))
+    np.save(os.path.join(tmp_dir, OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(tmp_dir, COLUMNS_FILE), "w") as f:
+        json.dump({"num_products": len(products), "columns": columns}, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Written by another process in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _atomic_write_json(path, obj, directory):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    from ...init_env import num_product_items
+    from ..utils import DEFAULT_FILE_PATH
+    from .engine import load_products
+
+    # The defaults are those of the agent environment (`init_env`)
+    parser = argparse.ArgumentParser(description="Build the catalog of the products")
+    parser.add_argument("--file-path", default=DEFAULT_FILE_PATH)
+    parser.add_argument("--num-products", type=int, default=num_product_items)
+    parser.add_argument("--human-goals", action="store_true")
+    args = parser.parse_args()
+    load_products(args.file_path, args.num_products, args.human_goals)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,16 +22,20 @@ import os
 import random
 import re
 
-from flask import render_template_string
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+import numpy as np
 from pyserini.search.lucene import LuceneSearcher
 from rich import print
 from tqdm import tqdm
 
 from ..utils import (
     BASE_DIR,
+    CATALOG_DIR,
     DEFAULT_ATTR_PATH,
     HUMAN_ATTR_PATH,
 )
+from .catalog import catalog_path, read_catalog, write_catalog
+from .pages import Page
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
 
@@ -52,19 +56,38 @@ ACTION_TO_TEMPLATE = {
 }
 
 
-def map_action_to_html(action, **kwargs):
+def load_templates(url_adapter):
+    """Load and compile the page templates in `TEMPLATE_DIR`, by file name
+
+    Compiled templates are also cached on disk, so that other processes don't
+    compile them again. `url_adapter` (a bound `werkzeug.routing.Map`) builds
+    the URLs of `url_for` like Flask does in a request context.
+    """
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+    env.globals["url_for"] = lambda endpoint, **values: url_adapter.build(
+        endpoint, values
+    )
+    return {
+        name: env.get_template(name) for name in env.list_templates(extensions=["html"])
+    }
+
+
+def map_action_to_page(action, templates, **kwargs):
+    """Map an action to the page it leads to, rendered on demand"""
     action_name, action_arg = parse_action(action)
     if action_name == "start":
-        path = os.path.join(TEMPLATE_DIR, "search_page.html")
-        html = render_template_string(
-            read_html_template(path=path),
+        template_name = "search_page.html"
+        context = dict(
             session_id=kwargs["session_id"],
             instruction_text=kwargs["instruction_text"],
         )
     elif action_name == "search":
-        path = os.path.join(TEMPLATE_DIR, "results_page.html")
-        html = render_template_string(
-            read_html_template(path=path),
+        template_name = "results_page.html"
+        context = dict(
             session_id=kwargs["session_id"],
             products=kwargs["products"],
             keywords=kwargs["keywords"],
@@ -73,9 +96,8 @@ def map_action_to_html(action, **kwargs):
             instruction_text=kwargs["instruction_text"],
         )
     elif action_name == "click" and action_arg == END_BUTTON:
-        path = os.path.join(TEMPLATE_DIR, "done_page.html")
-        html = render_template_string(
-            read_html_template(path),
+        template_name = "done_page.html"
+        context = dict(
             session_id=kwargs["session_id"],
             reward=kwargs["reward"],
             asin=kwargs["asin"],
@@ -90,9 +112,8 @@ def map_action_to_html(action, **kwargs):
             product_category=kwargs.get("product_category"),
         )
     elif action_name == "click" and action_arg in ACTION_TO_TEMPLATE:
-        path = os.path.join(TEMPLATE_DIR, ACTION_TO_TEMPLATE[action_arg])
-        html = render_template_string(
-            read_html_template(path),
+        template_name = ACTION_TO_TEMPLATE[action_arg]
+        context = dict(
             session_id=kwargs["session_id"],
             product_info=kwargs["product_info"],
             keywords=kwargs["keywords"],
@@ -102,9 +123,8 @@ def map_action_to_html(action, **kwargs):
             instruction_text=kwargs.get("instruction_text"),
         )
     elif action_name == "click":
-        path = os.path.join(TEMPLATE_DIR, "item_page.html")
-        html = render_template_string(
-            read_html_template(path),
+        template_name = "item_page.html"
+        context = dict(
             session_id=kwargs["session_id"],
             product_info=kwargs["product_info"],
             keywords=kwargs["keywords"],
@@ -116,13 +136,7 @@ def map_action_to_html(action, **kwargs):
         )
     else:
         raise ValueError("Action name not recognized.")
-    return html
-
-
-def read_html_template(path):
-    with open(path) as f:
-        template = f.read()
-    return template
+    return Page(templates[template_name], template_name, context)
 
 
 def parse_action(action):
@@ -160,19 +174,35 @@ def get_top_n_product_from_keywords(
     all_products,
     product_item_dict,
     attribute_to_asins=None,
+    product_indexes=None,
 ):
+    """Products matching search keywords
+
+    `<a>`, `<c>` and `<q>` keywords look up products by attribute, category and
+    query, in `product_indexes` (see `build_product_indexes`) if given and by
+    scanning all products otherwise.
+    """
     if keywords[0] == "<r>":
         top_n_products = random.sample(all_products, k=SEARCH_RETURN_N)
     elif keywords[0] == "<a>":
         attribute = " ".join(keywords[1:]).strip()
-        asins = attribute_to_asins[attribute]
-        top_n_products = [p for p in all_products if p["asin"] in asins]
+        if product_indexes is not None:
+            top_n_products = list(product_indexes["attribute"].get(attribute, ()))
+        else:
+            asins = attribute_to_asins[attribute]
+            top_n_products = [p for p in all_products if p["asin"] in asins]
     elif keywords[0] == "<c>":
         category = keywords[1].strip()
-        top_n_products = [p for p in all_products if p["category"] == category]
+        if product_indexes is not None:
+            top_n_products = list(product_indexes["category"].get(category, ()))
+        else:
+            top_n_products = [p for p in all_products if p["category"] == category]
     elif keywords[0] == "<q>":
         query = " ".join(keywords[1:]).strip()
-        top_n_products = [p for p in all_products if p["query"] == query]
+        if product_indexes is not None:
+            top_n_products = list(product_indexes["query"].get(query, ()))
+        else:
+            top_n_products = [p for p in all_products if p["query"] == query]
     else:
         keywords = " ".join(keywords)
         hits = search_engine.search(keywords, k=SEARCH_RETURN_N)
@@ -184,13 +214,42 @@ def get_top_n_product_from_keywords(
     return top_n_products
 
 
+def build_product_indexes(all_products):
+    """Index products by attribute, category and query
+
+    Each index maps a value to the products that have it, in the order of
+    `all_products`, so that lookups give the same results as scanning it.
+    """
+    product_indexes = {
+        "attribute": defaultdict(list),
+        "category": defaultdict(list),
+        "query": defaultdict(list),
+    }
+    for p in all_products:
+        # A product is listed once even if it repeats an attribute.
+        for a in dict.fromkeys(p["Attributes"]):
+            product_indexes["attribute"][a].append(p)
+        product_indexes["category"][p["category"]].append(p)
+        product_indexes["query"][p["query"]].append(p)
+    return {name: dict(index) for name, index in product_indexes.items()}
+
+
 def get_product_per_page(top_n_products, page):
     return top_n_products[(page - 1) * PRODUCT_WINDOW : page * PRODUCT_WINDOW]
 
 
-def generate_product_prices(all_products):
+def generate_product_prices(all_products, rng=None):
+    """Prices of the products, by asin
+
+    The price of a product with a price range is sampled uniformly in it, with
+    `rng` (a `numpy.random.Generator`, unseeded if None).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
     product_prices = dict()
-    for product in all_products:
+    # One draw per product, in a single call
+    draws = rng.random(len(all_products)).tolist()
+    for product, draw in zip(all_products, draws):
         asin = product["asin"]
         pricing = product["pricing"]
         if not pricing:
@@ -198,7 +257,8 @@ def generate_product_prices(all_products):
         elif len(pricing) == 1:
             price = pricing[0]
         else:
-            price = random.uniform(*pricing[:2])
+            low, high = pricing[:2]
+            price = low + (high - low) * draw
         product_prices[asin] = price
     return product_prices
 
@@ -244,8 +304,60 @@ def clean_product_keys(products):
     return products
 
 
-def load_products(filepath, num_products=None, human_goals=True):
-    # TODO: move to preprocessing step -> enforce single source of truth
+def load_products(
+    filepath, num_products=None, human_goals=True, cache_dir=CATALOG_DIR, rng=None
+):
+    """Load the products, their prices and indexes
+
+    The products are read from the catalog of `filepath` in `cache_dir`, and
+    parsed from the JSON source files (which then writes the catalog) if it
+    does not exist yet. Set `cache_dir` to None to always parse them. The
+    prices are sampled with `rng` (see `generate_product_prices`).
+    """
+    all_products = None
+    if cache_dir is not None:
+        catalog = products_catalog_path(filepath, num_products, human_goals, cache_dir)
+        all_products = read_catalog(catalog)
+        if all_products is not None:
+            print("Products loaded from catalog.")
+    if all_products is None:
+        all_products = parse_products(filepath, num_products, human_goals)
+        if cache_dir is not None:
+            write_catalog(catalog, all_products)
+
+    attribute_to_asins = defaultdict(set)
+    for p in all_products:
+        for a in p["Attributes"]:
+            attribute_to_asins[a].add(p["asin"])
+
+    product_item_dict = {p["asin"]: p for p in all_products}
+    product_prices = generate_product_prices(all_products, rng)
+    product_indexes = build_product_indexes(all_products)
+    return (
+        all_products,
+        product_item_dict,
+        product_prices,
+        attribute_to_asins,
+        product_indexes,
+    )
+
+
+def products_catalog_path(filepath, num_products, human_goals, cache_dir):
+    """Directory of the catalog of the products loaded with these arguments"""
+    source_paths = [filepath, DEFAULT_ATTR_PATH]
+    if human_goals:
+        source_paths.append(HUMAN_ATTR_PATH)
+    # `human_goals` is None in the agent environment
+    return catalog_path(
+        source_paths,
+        cache_dir,
+        num_products=num_products,
+        human_goals=bool(human_goals),
+    )
+
+
+def parse_products(filepath, num_products=None, human_goals=True):
+    """Parse and clean the products of the JSON source files"""
     with open(filepath) as f:
         products = json.load(f)
     print("Products loaded.")
@@ -264,13 +376,10 @@ def load_products(filepath, num_products=None, human_goals=True):
             human_attributes = json.load(f)
     with open(DEFAULT_ATTR_PATH) as f:
         attributes = json.load(f)
-    with open(HUMAN_ATTR_PATH) as f:
-        human_attributes = json.load(f)
     print("Attributes loaded.")
 
     asins = set()
     all_products = []
-    attribute_to_asins = defaultdict(set)
     if num_products is not None:
         # using item_shuffle.json, we assume products already shuffled
         products = products[:num_products]
@@ -374,11 +483,4 @@ def load_products(filepath, num_products=None, human_goals=True):
         products[i]["query"] = p["query"].lower().strip()
 
         all_products.append(products[i])
-
-    for p in all_products:
-        for a in p["Attributes"]:
-            attribute_to_asins[a].add(p["asin"])
-
-    product_item_dict = {p["asin"]: p for p in all_products}
-    product_prices = generate_product_prices(all_products)
-    return all_products, product_item_dict, product_prices, attribute_to_asins
+    return all_products
@@ -15,97 +15,144 @@
 """Functions for specifying goals and reward calculations."""
 
 from collections import defaultdict
+from functools import lru_cache
 import itertools
-import random
+import threading
+import numpy as np
 from rich import print
-import spacy
 from thefuzz import fuzz
 from .normalize import normalize_color
 
-nlp = spacy.load("en_core_web_sm")
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Returns the spaCy pipeline parsing product types, loaded on first use"""
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+
+            _nlp = spacy.load("en_core_web_sm")
+    return _nlp
+
 
 PRICE_RANGE = [10.0 * i for i in range(1, 100)]
+_PRICE_RANGE = np.array(PRICE_RANGE)
+NO_PRICE_UPPER = 1000000
 
+TYPE_POS = ("PNOUN", "NOUN", "PROPN")
+FUZZY_MATCH_THRESHOLD = 85
 
-def get_goals(all_products, product_prices, human_goals=True):
+# Nouns of the product and goal names, by name
+_type_nouns = {}
+# Searchable texts of the purchased products, by asin
+_searchable_texts = {}
+
+
+def get_goals(all_products, product_prices, human_goals=True, rng=None):
+    """Get the goals of the products
+
+    `rng` (a `numpy.random.Generator`) samples the upper prices of the goals,
+    and defaults to a generator with a random seed.
+    """
+    rng = np.random.default_rng() if rng is None else rng
     if human_goals:
-        return get_human_goals(all_products, product_prices)
+        return get_human_goals(all_products, product_prices, rng)
     else:
-        return get_synthetic_goals(all_products, product_prices)
+        return get_synthetic_goals(all_products, product_prices, rng)
+
+
+def sample_price_upper(prices, rng):
+    """Sample the upper prices of goals for products at `prices`
+
+    For each price, two of the (up to) four values of `PRICE_RANGE` above it
+    are sampled, and the upper price is the largest one. Returns the upper
+    prices, and whether there were at least two values to sample from.
+    """
+    prices = np.asarray(prices, dtype=float)
+    start = np.searchsorted(_PRICE_RANGE, prices, side="right")
+    count = np.minimum(len(_PRICE_RANGE) - start, 4)
+    has_range = count >= 2
+    # Two distinct offsets among the `count` values above each price
+    first = (rng.random(len(prices)) * count).astype(int)
+    second = (rng.random(len(prices)) * np.maximum(count - 1, 0)).astype(int)
+    second += second >= first
+    offset = np.maximum(first, second)
+    price_upper = _PRICE_RANGE[np.minimum(start + offset, len(_PRICE_RANGE) - 1)]
+    return np.where(has_range, price_upper, NO_PRICE_UPPER), has_range
+
+
+def _price_uppers(prices, rng):
+    """Upper prices and price texts of goals, for prices (or None)"""
+    if prices is None:
+        return itertools.repeat((NO_PRICE_UPPER, ""))
+    price_upper, has_range = sample_price_upper(prices, rng)
+    return [
+        (
+            (upper, f", and price lower than {upper:.2f} dollars")
+            if ranged
+            else (NO_PRICE_UPPER, "")
+        )
+        for upper, ranged in zip(price_upper.tolist(), has_range.tolist())
+    ]
 
 
-def get_human_goals(all_products, product_prices):
-    goals = []
-    cnt_atts = defaultdict(int)
+def get_human_goals(all_products, product_prices, rng):
+    instructions = []
     cnt = 0
     for item in all_products:
-        asin = item["asin"]
         if "instructions" not in item:
             continue
         for product in item["instructions"]:
-            attributes = product["instruction_attributes"]
-            if len(attributes) == 0:
+            if len(product["instruction_attributes"]) == 0:
                 cnt += 1
                 continue
-
-            if product_prices is not None:
-                price = product_prices[asin]
-                price_range = [p for p in PRICE_RANGE if p > price][:4]
-                if len(price_range) >= 2:
-                    _, price_upper = sorted(random.sample(price_range, 2))
-                    price_text = f", and price lower than {price_upper:.2f} dollars"
-                else:
-                    price_upper = 1000000
-                    price_text = ""
-            else:
-                price_upper = 1000000
-
-            goals.append(
-                {
-                    "asin": asin,
-                    "category": item["category"],
-                    "query": item["query"],
-                    "name": item["name"],
-                    "product_category": item["product_category"],
-                    "instruction_text": product["instruction"].strip(".") + price_text,
-                    "attributes": attributes,
-                    "price_upper": price_upper,
-                    "goal_options": product["instruction_options"],
-                }
-            )
-            for att in attributes:
-                cnt_atts[att] += 1
-            # goals += product_goals
-    for goal in goals:
-        goal["weight"] = 1
+            instructions.append((item, product))
+
+    prices = None
+    if product_prices is not None:
+        prices = [product_prices[item["asin"]] for item, _ in instructions]
+    goals = [
+        {
+            "asin": item["asin"],
+            "category": item["category"],
+            "query": item["query"],
+            "name": item["name"],
+            "product_category": item["product_category"],
+            "instruction_text": product["instruction"].strip(".") + price_text,
+            "attributes": product["instruction_attributes"],
+            "price_upper": price_upper,
+            "goal_options": product["instruction_options"],
+            "weight": 1,
+        }
+        for (item, product), (price_upper, price_text) in zip(
+            instructions, _price_uppers(prices, rng)
+        )
+    ]
     print(cnt, "skipped")
     return goals
 
 
-def get_synthetic_goals(all_products, product_prices):
+def get_synthetic_goals(all_products, product_prices, rng):
+    products = [
+        product
+        for product in all_products
+        if "instruction_text" in product and product["instruction_text"] is not None
+    ]
+    prices = None
+    if product_prices is not None:
+        prices = [product_prices[product["asin"]] for product in products]
+
     goals = []
     cnt_atts = defaultdict(int)
-    for product in all_products:
-        if "instruction_text" not in product or product["instruction_text"] is None:
-            continue
+    for product, (price_upper, price_text) in zip(products, _price_uppers(prices, rng)):
         product_goals = []
         asin = product["asin"]
         attributes = product["instruction_attributes"]
         assert len(attributes) > 0
 
-        if product_prices is not None:
-            price = product_prices[asin]
-            price_range = [p for p in PRICE_RANGE if p > price][:4]
-            if len(price_range) >= 2:
-                _, price_upper = sorted(random.sample(price_range, 2))
-                price_text = f", and price lower than {price_upper:.2f} dollars"
-            else:
-                price_upper = 1000000
-                price_text = ""
-        else:
-            price_upper = 1000000
-            price_text = ""
-
         instruction_text = product["instruction_text"]
 
         options = product["options"]
@@ -144,36 +191,71 @@ def get_synthetic_goals(all_products, product_prices):
     return goals
 
 
+def _nouns(doc):
+    return tuple(t.text.lower() for t in doc if t.pos_ in TYPE_POS)
+
+
+def get_type_nouns(name):
+    """Lowercased nouns of a product or goal name, parsed once per name"""
+    nouns = _type_nouns.get(name)
+    if nouns is None:
+        nouns = _type_nouns[name] = _nouns(get_nlp()(name))
+    return nouns
+
+
+def parse_type_nouns(names, batch_size=256):
+    """Parse the nouns of the names that were not parsed yet, in batches"""
+    names = list(dict.fromkeys(name for name in names if name not in _type_nouns))
+    for name, doc in zip(names, get_nlp().pipe(names, batch_size=batch_size)):
+        _type_nouns[name] = _nouns(doc)
+
+
+@lru_cache(maxsize=None)
+def get_category_set(product_category):
+    return frozenset(x.strip() for x in product_category.split("›"))
+
+
+def get_searchable_text(product):
+    """Lowercased title, features and description of a product
+
+    They are computed on the first reward for the product.
+    """
+    searchable_text = _searchable_texts.get(product["asin"])
+    if searchable_text is None:
+        searchable_text = _searchable_texts[product["asin"]] = (
+            product["Title"].lower(),
+            " ".join(product["BulletPoints"]).lower(),
+            product["Description"].lower(),
+        )
+    return searchable_text
+
+
+@lru_cache(maxsize=None)
+def normalize_option(option):
+    return normalize_color(option)
+
+
+@lru_cache(maxsize=2**16)
+def fuzzy_match(a, b):
+    return fuzz.token_set_ratio(a, b) > FUZZY_MATCH_THRESHOLD
+
+
 def get_type_reward(purchased_product, goal):
     """Determines the type reward - captures whether chosen product is in the same category"""
     query_match = purchased_product["query"] == goal["query"]
 
     # Check number of unique categories that match, ignoring order
-    purchased_product_category = [
-        x.strip() for x in purchased_product["product_category"].split("›")
-    ]
-    goal_product_category = [x.strip() for x in goal["product_category"].split("›")]
     category_match = (
-        len(set(purchased_product_category) & set(goal_product_category)) >= 2
+        len(
+            get_category_set(purchased_product["product_category"])
+            & get_category_set(goal["product_category"])
+        )
+        >= 2
     )
 
     # Determine whether types align based on product name similarity
-    purchased_type = purchased_product["name"]
-    desired_type = goal["name"]
-
-    purchased_type_parse = nlp(purchased_type)
-    desired_type_parse = nlp(desired_type)
-
-    purchased_type_parse = [
-        t.text.lower()
-        for t in purchased_type_parse
-        if t.pos_ in ("PNOUN", "NOUN", "PROPN")
-    ]
-    desired_type_parse = [
-        t.text.lower()
-        for t in desired_type_parse
-        if t.pos_ in ("PNOUN", "NOUN", "PROPN")
-    ]
+    purchased_type_parse = get_type_nouns(purchased_product["name"])
+    desired_type_parse = get_type_nouns(goal["name"])
 
     n_intersect_type = len(set(purchased_type_parse) & set(desired_type_parse))
     if len(desired_type_parse) == 0:
@@ -209,22 +291,12 @@ def get_attribute_reward(purchased_product, goal):
 
     num_attr_matches = 0
     for g_attr in goal_attrs:
-        matched = False
         # Check whether goal attribute found in purchased product attribute list
-        for p_attr in purchased_attrs:
-            score = fuzz.token_set_ratio(p_attr, g_attr)
-            if score > 85:
-                num_attr_matches += 1
-                matched = True
-                break
         # If not in purchased attrs, check Title, Bullet Points (Features), Desc
-        if not matched and (
-            g_attr in purchased_product["Title"].lower()
-            or g_attr in " ".join(purchased_product["BulletPoints"]).lower()
-            or g_attr in purchased_product["Description"].lower()
+        if any(fuzzy_match(p_attr, g_attr) for p_attr in purchased_attrs) or any(
+            g_attr in text for text in get_searchable_text(purchased_product)
         ):
             num_attr_matches += 1
-            matched = True
 
     r_attr = num_attr_matches / len(goal_attrs)
     return r_attr, num_attr_matches
@@ -232,17 +304,14 @@ def get_attribute_reward(purchased_product, goal):
 
 def get_option_reward(purchased_options, goal_options):
     """Calculate reward for purchased product's options w.r.t. goal options"""
-    purchased_options = [normalize_color(o) for o in purchased_options]
-    goal_options = [normalize_color(o) for o in goal_options]
+    purchased_options = [normalize_option(o) for o in purchased_options]
+    goal_options = [normalize_option(o) for o in goal_options]
 
     # Perform fuzzy matching of each purchased option against each goal option
     num_option_matches = 0
     for g_option in goal_options:
-        for p_option in purchased_options:
-            score = fuzz.token_set_ratio(p_option, g_option)
-            if score > 85:
-                num_option_matches += 1
-                break
+        if any(fuzzy_match(p_option, g_option) for p_option in purchased_options):
+            num_option_matches += 1
 
     # Calculate option reward as fraction of goal options hit
     r_option = num_option_matches / len(goal_options) if len(goal_options) > 0 else None
@@ -295,3 +364,26 @@ def get_reward(purchased_product, goal, price, options, **kwargs):
             )
         return total_reward, info
     return total_reward
+
+
+def score_many(purchases, goals, **kwargs):
+    """Get the rewards of purchases for goals, for offline evaluation
+
+    Arguments:
+
+    purchases (`list`) -- (purchased product, price, options) of each purchase
+    goals (`list`) -- Goal of each purchase
+
+    The product and goal names are parsed in batches before the rewards are
+    computed. Keyword arguments are passed to `get_reward`.
+    """
+    parse_type_nouns(
+        itertools.chain(
+            (purchased_product["name"] for purchased_product, _, _ in purchases),
+            (goal["name"] for goal in goals),
+        )
+    )
+    return [
+        get_reward(purchased_product, goal, price, options, **kwargs)
+        for (purchased_product, price, options), goal in zip(purchases, goals)
+    ]
@@ -0,0 +1,328 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pages of the WebShop simulator and the observations extracted from them.
+
+A `Page` is the template of a page and the context it is rendered with. Its
+observations (visible texts, clickables, instruction text) are extracted
+either from its rendered HTML (`PageObservation`) or directly from its
+context (`TextPageObservation`), which gives the same observations without
+rendering and parsing HTML.
+"""
+
+from functools import cached_property
+import os
+
+from bs4 import BeautifulSoup
+from bs4.element import Comment
+
+# Characters that BeautifulSoup considers as whitespace
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+BUTTON = "button"
+LABEL = "label"
+PRODUCT_LINK = "product-link"
+
+
+class Page:
+    """Page of the WebShop application, rendered to HTML on demand"""
+
+    def __init__(self, template, template_name, context):
+        self.template = template
+        self.template_name = template_name
+        self.context = context
+
+    @cached_property
+    def html(self):
+        return self.template.render(**self.context)
+
+
+def tag_visible(element):
+    ignore = {"style", "script", "head", "title", "meta", "[document]"}
+    return element.parent.name not in ignore and not isinstance(element, Comment)
+
+
+class _Observation:
+    """Observations of a page, computed from its visible text nodes
+
+    Subclasses provide `text_nodes`, the visible texts of the page without the
+    bare newlines, with the kind of element containing them (`BUTTON`, `LABEL`,
+    `PRODUCT_LINK` or None), and the clickables of the page.
+    """
+
+    text_nodes = ()
+    has_search_bar = False
+    text_to_clickable = None
+    instruction_text = None
+    image_url = None
+
+    def __init__(self):
+        self._text_rich = None
+
+    @cached_property
+    def text(self):
+        """Visible texts separated by [SEP], for the `text` observation mode"""
+        return " [SEP] ".join(t.strip() for t, _ in self.text_nodes)
+
+    def text_rich(self, url, clicked_asins):
+        """Visible texts with tags mapped to specific, unique separators
+
+        The observation is computed on the first call: the URL and the clicked
+        products only change when another page is rendered.
+
+        Arguments:
+
+        url (`str`) -- URL of the page, which contains the selected options
+        clicked_asins (`set`) -- Products clicked in the session
+        """
+        if self._text_rich is not None:
+            return self._text_rich
+        observation = ""
+        for t, kind in self.text_nodes:
+            if kind == BUTTON:  # button
+                processed_t = f"[button] {t} [button_]"
+            elif kind == LABEL:  # options
+                if f'"{t}"' in url:
+                    processed_t = f"  [clicked button] {t} [clicked button_]"
+                    observation = f"You have clicked {t}.\n" + observation
+                else:
+                    processed_t = f"  [button] {t} [button_]"
+            elif kind == PRODUCT_LINK:  # product asins
+                if f"{t}" in clicked_asins:
+                    processed_t = f"\n[clicked button] {t} [clicked button_]"
+                else:
+                    processed_t = f"\n[button] {t} [button_]"
+            else:  # regular, unclickable text
+                processed_t = str(t)
+            observation += processed_t + "\n"
+        self._text_rich = observation
+        return observation
+
+
+class PageObservation(_Observation):
+    """Observations extracted from the HTML of a page
+
+    The HTML is parsed at most once, when an observation is first needed, and
+    each observation is computed at most once.
+    """
+
+    def __init__(self, html):
+        super().__init__()
+        self.html = html
+
+    @cached_property
+    def soup(self):
+        return BeautifulSoup(self.html, "html.parser")
+
+    @cached_property
+    def text_nodes(self):
+        nodes = []
+        for t in self.soup.findAll(text=True):
+            if not tag_visible(t) or t == "\n":
+                continue
+            if t.parent.name == "button":
+                kind = BUTTON
+            elif t.parent.name == "label":
+                kind = LABEL
+            elif t.parent.get("class") == ["product-link"]:
+                kind = PRODUCT_LINK
+            else:
+                kind = None
+            nodes.append((t, kind))
+        return nodes
+
+    @cached_property
+    def has_search_bar(self):
+        return self.soup.find(id="search_input") is not None
+
+    @cached_property
+    def text_to_clickable(self):
+        """Buttons, product links and options of the page, by their text"""
+        # Collect buttons, links, and options as clickables
+        buttons = self.soup.find_all(class_="btn")
+        product_links = self.soup.find_all(class_="product-link")
+        buying_options = self.soup.select('input[type="radio"]')
+
+        text_to_clickable = {
+            f"{b.get_text()}".lower(): b for b in buttons + product_links
+        }
+        for opt in buying_options:
+            opt_value = opt.get("value")
+            text_to_clickable[f"{opt_value}"] = opt
+        return text_to_clickable
+
+    @cached_property
+    def instruction_text(self):
+        return self.soup.find(id="instruction-text").h4.text
+
+    @cached_property
+    def image_url(self):
+        image = self.soup.find(id="product-image")
+        return image["src"] if image is not None else None
+
+
+def _string(text):
+    """Visible text parsed from a run of characters between two tags
+
+    Like BeautifulSoup, runs of ASCII whitespace are replaced with a newline
+    if they contain one and a space otherwise, and empty runs are dropped.
+    """
+    if not text:
+        return None
+    if text.strip(ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _value(value):
+    """Text of a value inserted in a template, as rendered by Jinja"""
+    return str(value)
+
+
+def _renderer_name(page):
+    return "_render_" + os.path.splitext(page.template_name)[0]
+
+
+class TextPageObservation(_Observation):
+    """Observations of a page computed from its template context
+
+    The visible texts and clickables of each page follow its template, and are
+    the same as the ones `PageObservation` extracts from the rendered HTML.
+    Pages without a text renderer (the done page) are rendered to HTML.
+    """
+
+    def __init__(self, page):
+        super().__init__()
+        self.page = page
+        self._text_to_clickable = {}
+        self._nodes = []
+        getattr(self, _renderer_name(page))(page.context)
+
+    @classmethod
+    def supports(cls, page):
+        return hasattr(cls, _renderer_name(page))
+
+    @cached_property
+    def text_nodes(self):
+        return [(t, kind) for t, kind in self._nodes if t != "\n"]
+
+    @property
+    def text_to_clickable(self):
+        return self._text_to_clickable
+
+    def _add(self, text, kind=None):
+        text = _string(text)
+        if text is not None:
+            self._nodes.append((text, kind))
+
+    def _add_button(self, text, classes):
+        self._add(text, BUTTON)
+        self._text_to_clickable[text.lower()] = {"class": classes}
+
+    def _add_instruction(self, prefix, context):
+        instruction_text = _value(context["instruction_text"])
+        self._add(prefix)
+        self._add(instruction_text)
+        self.instruction_text = prefix + (_string(instruction_text) or "")
+
+    def _add_header(self, context, previous=True):
+        self._add_instruction("Instruction:", context)
+        self._add_button("Back to Search", ["btn", "btn-success"])
+        if previous:
+            self._add_button("< Prev", ["btn", "btn-primary"])
+
+    def _render_search_page(self, context):
+        self._add("WebShop")
+        self._add_instruction("Instruction: ", context)
+        self._add_button("Search", ["btn", "btn-success"])
+        self.has_search_bar = True
+
+    def _render_results_page(self, context):
+        self._add_header(context, previous=False)
+        page = context["page"]
+        total = context["total"]
+        self._add(f"Page {_value(page)} (Total results: {_value(total)})")
+        if page > 1:
+            self._add_button("< Prev", ["btn", "btn-primary"])
+        self._add_button("Next >", ["btn", "btn-primary"])
+        product_links = {}
+        for item in context["products"]:
+            asin = _value(item["asin"])
+            self._add(asin, PRODUCT_LINK)
+            self._add(_value(item["Title"]))
+            self._add(_value(item["Price"]))
+            product_link = {"class": [PRODUCT_LINK]}
+            product_links[(_string(asin) or "").lower()] = product_link
+        self._text_to_clickable.update(product_links)
+
+    def _render_item_page(self, context):
+        self._add_header(context)
+        product_info = context["product_info"]
+        self.image_url = _value(product_info["MainImage"])
+        options = {}
+        for option_name, option_contents in product_info["options"].items():
+            option_name = _value(option_name)
+            self._add(option_name)
+            for option_content in option_contents:
+                option_content = _value(option_content)
+                self._add(option_content, LABEL)
+                options[option_content] = {
+                    "type": "radio",
+                    "name": option_name,
+                    "value": option_content,
+                }
+        self._add(_value(product_info["Title"]))
+        self._add(f"Price: {_value(product_info['Price'])}")
+        self._add(f"Rating: {_value(product_info['Rating'])}")
+        self._add_button("Description", ["btn", "btn-primary"])
+        self._add_button("Features", ["btn", "btn-primary"])
+        self._add_button("Reviews", ["btn", "btn-primary"])
+        if context["show_attrs"]:
+            self._add_button("Attributes", ["btn", "btn-primary"])
+        self._add_button("Buy Now", ["btn", "btn-lg", "purchase"])
+        self._text_to_clickable.update(options)
+
+    def _render_description_page(self, context):
+        self._add_header(context)
+        self._add(_value(context["product_info"]["Description"]))
+
+    def _render_features_page(self, context):
+        self._add_header(context)
+        for bulletpoint in context["product_info"]["BulletPoints"]:
+            self._add(f" {_value(bulletpoint)}")
+
+    def _render_review_page(self, context):
+        self._add_header(context)
+        for review in context["product_info"]["Reviews"]:
+            self._add(f'"{_value(review.get("title", ""))}"')
+            self._add(_value(review["score"]))
+            self._add(_value(review["body"]))
+
+    def _render_attributes_page(self, context):
+        self._add_header(context)
+        product_info = context["product_info"]
+        for attribute in product_info["Attributes"]:
+            self._add(f" {_value(attribute)}")
+        self._add(_value(product_info["category"]))
+        self._add(_value(product_info["query"]))
+        self._add(_value(product_info["product_category"]))
+
+
+def observe(page, text_renderer=False):
+    """Observations of a page, from its context if `text_renderer` is set and
+    the page has a text renderer, and from its HTML otherwise
+    """
+    if text_renderer and TextPageObservation.supports(page):
+        return TextPageObservation(page)
+    return PageObservation(page.html)
@@ -17,8 +17,6 @@ import json
 import random
 import string
 import time
-from bs4 import BeautifulSoup
-from bs4.element import Comment
 from flask import Flask
 import gym
 from gym.envs.registration import register
@@ -34,15 +32,16 @@ from ..engine.engine import (
     get_top_n_product_from_keywords,
     init_search_engine,
     load_products,
-    map_action_to_html,
+    load_templates,
+    map_action_to_page,
     parse_action,
 )
 from ..engine.goal import get_goals, get_reward
+from ..engine.pages import PageObservation, observe
 from ..utils import (
     DEFAULT_FILE_PATH,
     FEAT_CONV,
     FEAT_IDS,
-    random_idx,
 )
 
 
@@ -72,6 +71,8 @@ class WebAgentTextEnv(gym.Env):
         session
         session_prefix
         show_attrs
+        text_renderer (`bool`) -- If true, compute the observations of pages
+          from their template context instead of parsing their HTML
         """
         super(WebAgentTextEnv, self).__init__()
         self.observation_mode = observation_mode
@@ -93,7 +94,9 @@ class WebAgentTextEnv(gym.Env):
             if server is None
             else server
         )
-        self.browser = SimBrowser(self.server)
+        self.browser = SimBrowser(
+            self.server, text_renderer=self.kwargs.get("text_renderer", False)
+        )
 
         self.session = self.kwargs.get("session")
         self.session_prefix = self.kwargs.get("session_prefix")
@@ -150,32 +153,17 @@ class WebAgentTextEnv(gym.Env):
 
     def get_available_actions(self):
         """Returns list of available actions at the current step"""
-        html_obj = self._parse_html()
-
-        # Collect search bar, buttons, links, and options as clickables
-        search_bar = html_obj.find(id="search_input")
-        has_search_bar = True if search_bar is not None else False
-        buttons = html_obj.find_all(class_="btn")
-        product_links = html_obj.find_all(class_="product-link")
-        buying_options = html_obj.select('input[type="radio"]')
-
-        self.text_to_clickable = {
-            f"{b.get_text()}".lower(): b for b in buttons + product_links
-        }
-        for opt in buying_options:
-            opt_value = opt.get("value")
-            self.text_to_clickable[f"{opt_value}"] = opt
+        page = self.browser.page
+        self.text_to_clickable = page.text_to_clickable
         return dict(
-            has_search_bar=has_search_bar,
+            has_search_bar=page.has_search_bar,
             clickables=list(self.text_to_clickable.keys()),
         )
 
     def get_image(self):
         """Scrape image from page HTML and return as a list of pixel values"""
-        html_obj = self._parse_html(self.browser.page_source)
-        image_url = html_obj.find(id="product-image")
+        image_url = self.browser.page.image_url
         if image_url is not None:
-            image_url = image_url["src"]
             if image_url in self.ids:
                 image_idx = self.ids[image_url]
                 image = self.feats[image_idx]
@@ -184,35 +172,22 @@ class WebAgentTextEnv(gym.Env):
 
     def get_instruction_text(self):
         """Get corresponding instruction text for current environment session"""
-        html_obj = self._parse_html(self.browser.page_source)
-        instruction_text = html_obj.find(id="instruction-text").h4.text
-        return instruction_text
-
-    def _parse_html(self, html=None):
-        """Returns web request result wrapped in BeautifulSoup object
-
-        Arguments:
-
-        url (`str`): If no url or html is provided, use the current
-            observation (HTML) for parsing.
-        """
-        if html is None:
-            html = self.state["html"]
-        html_obj = BeautifulSoup(html, "html.parser")
-        return html_obj
+        return self.browser.page.instruction_text
 
     @property
     def observation(self):
         """Compiles state into either the `html` or `text` observation mode"""
-        html = self.state["html"]
         if self.observation_mode == "html":
-            return html
+            return self.browser.page_source
         elif self.observation_mode == "text":
-            return self.convert_html_to_text(html, simple=True)
+            return self.browser.page.text
         elif self.observation_mode == "text_rich":
-            return self.convert_html_to_text(html, simple=False)
+            return self.browser.page.text_rich(
+                self.browser.current_url,
+                self.server.user_sessions[self.session]["asins"],
+            )
         elif self.observation_mode == "url":
-            return self.state["url"]
+            return self.browser.current_url
         else:
             raise ValueError(f"Observation mode {self.observation_mode} not supported.")
 
@@ -231,34 +206,17 @@ class WebAgentTextEnv(gym.Env):
 
     def convert_html_to_text(self, html, simple=False):
         """Strip HTML of tags and add separators to convert observation into simple mode"""
-        texts = self._parse_html(html).findAll(text=True)
-        visible_texts = filter(tag_visible, texts)
+        page = (
+            self.browser.page
+            if html is self.browser.page_source
+            else PageObservation(html)
+        )
         if simple:
-            # For `simple` mode, return just [SEP] separators
-            return " [SEP] ".join(t.strip() for t in visible_texts if t != "\n")
-        else:
-            # Otherwise, return an observation with tags mapped to specific, unique separators
-            observation = ""
-            for t in visible_texts:
-                if t == "\n":
-                    continue
-                if t.parent.name == "button":  # button
-                    processed_t = f"[button] {t} [button_]"
-                elif t.parent.name == "label":  # options
-                    if f'"{t}"' in self.state["url"]:
-                        processed_t = f"  [clicked button] {t} [clicked button_]"
-                        observation = f"You have clicked {t}.\n" + observation
-                    else:
-                        processed_t = f"  [button] {t} [button_]"
-                elif t.parent.get("class") == ["product-link"]:  # product asins
-                    if f"{t}" in self.server.user_sessions[self.session]["asins"]:
-                        processed_t = f"\n[clicked button] {t} [clicked button_]"
-                    else:
-                        processed_t = f"\n[button] {t} [button_]"
-                else:  # regular, unclickable text
-                    processed_t = str(t)
-                observation += processed_t + "\n"
-            return observation
+            return page.text
+        return page.text_rich(
+            self.browser.current_url,
+            self.server.user_sessions[self.session]["asins"],
+        )
 
     def reset(self, session=None, instruction_text=None):
         """Create a new session and reset environment variables"""
@@ -290,12 +248,13 @@ class WebAgentTextEnv(gym.Env):
         pass
 
     def close(self):
-        pass
+        self.server.end_session(self.session)
 
 
-def tag_visible(element):
-    ignore = {"style", "script", "head", "title", "meta", "[document]"}
-    return element.parent.name not in ignore and not isinstance(element, Comment)
+def goal_probabilities(goals):
+    """Probabilities of sampling the goals, proportional to their weights"""
+    weights = np.array([goal["weight"] for goal in goals], dtype=float)
+    return weights / weights.sum()
 
 
 class SimServer:
@@ -324,15 +283,25 @@ class SimServer:
         """
         # Load all products, goals, and search engine
         self.base_url = base_url
-        self.all_products, self.product_item_dict, self.product_prices, _ = (
-            load_products(
-                filepath=file_path,
-                num_products=num_products,
-                human_goals=human_goals,
-            )
+        # Samples the prices, the goals, and the goals of new sessions
+        self.rng = np.random.default_rng(233)
+        (
+            self.all_products,
+            self.product_item_dict,
+            self.product_prices,
+            self.attribute_to_asins,
+            self.product_indexes,
+        ) = load_products(
+            filepath=file_path,
+            num_products=num_products,
+            human_goals=human_goals,
+            rng=self.rng,
         )
         self.search_engine = init_search_engine(num_products=num_products)
-        self.goals = get_goals(self.all_products, self.product_prices, human_goals)
+        self.templates = load_templates(app.url_map.bind("localhost"))
+        self.goals = get_goals(
+            self.all_products, self.product_prices, human_goals, self.rng
+        )
         self.show_attrs = show_attrs
 
         # Fix outcome for random shuffling of goals
@@ -345,37 +314,51 @@ class SimServer:
                 goal for (i, goal) in enumerate(self.goals) if filter_goals(i, goal)
             ]
 
-        # Imposes `limit` on goals via random selection
+        # Imposes `limit` on goals via weighted random selection without replacement
         if limit_goals != -1 and limit_goals < len(self.goals):
-            self.weights = [goal["weight"] for goal in self.goals]
-            self.cum_weights = [0] + np.cumsum(self.weights).tolist()
-            idxs = []
-            while len(idxs) < limit_goals:
-                idx = random_idx(self.cum_weights)
-                if idx not in idxs:
-                    idxs.append(idx)
-            self.goals = [self.goals[i] for i in idxs]
+            idxs = self.rng.choice(
+                len(self.goals),
+                size=limit_goals,
+                replace=False,
+                p=goal_probabilities(self.goals),
+            )
+            self.goals = [self.goals[i] for i in idxs.tolist()]
         print(f"Loaded {len(self.goals)} goals.")
 
         # Set extraneous housekeeping variables
-        self.weights = [goal["weight"] for goal in self.goals]
-        self.cum_weights = [0] + np.cumsum(self.weights).tolist()
+        self.goal_probabilities = goal_probabilities(self.goals)
         self.user_sessions = dict()
         self.search_time = 0
         self.render_time = 0
         self.sample_time = 0
+        # Instruction text shown instead of the goal one, in sessions without an
+        # assigned instruction text
         self.assigned_instruction_text = None  # TODO: very hacky, should remove
 
+    def assign_instruction_text(self, session_id, instruction_text):
+        """Show `instruction_text` instead of the goal instruction in a session"""
+        self.user_sessions[session_id]["assigned_instruction_text"] = instruction_text
+
+    def get_assigned_instruction_text(self, session_id):
+        return self.user_sessions[session_id].get(
+            "assigned_instruction_text", self.assigned_instruction_text
+        )
+
+    def end_session(self, session_id):
+        """Forget the state of a session"""
+        self.user_sessions.pop(session_id, None)
+
     @app.route("/", methods=["GET", "POST"])
     def index(self, session_id, **kwargs):
         """Redirect to the search page with the given session ID"""
-        html = map_action_to_html(
+        page = map_action_to_page(
             "start",
+            templates=self.templates,
             session_id=session_id,
             instruction_text=kwargs["instruction_text"],
         )
         url = f"{self.base_url}/{session_id}"
-        return html, url
+        return page, url
 
     @app.route("/", methods=["GET", "POST"])
     def search_results(self, session_id, **kwargs):
@@ -399,6 +382,8 @@ class SimServer:
             self.search_engine,
             self.all_products,
             self.product_item_dict,
+            self.attribute_to_asins,
+            self.product_indexes,
         )
         self.search_time += time.time() - old_time
 
@@ -413,8 +398,9 @@ class SimServer:
 
         # Render HTML search page and record amount of time taken
         old_time = time.time()
-        html = map_action_to_html(
+        page = map_action_to_page(
             "search",
+            templates=self.templates,
             session_id=session_id,
             products=products,
             keywords=session["keywords"],
@@ -423,10 +409,10 @@ class SimServer:
             # This is used for reward computation
             # instruction_text=session['goal']['instruction_text'],
             # This is used for rendering the page
-            instruction_text=self.assigned_instruction_text,
+            instruction_text=self.get_assigned_instruction_text(session_id),
         )
         self.render_time += time.time() - old_time
-        return html, url
+        return page, url
 
     @app.route("/", methods=["GET", "POST"])
     def item_page(self, session_id, **kwargs):
@@ -460,8 +446,9 @@ class SimServer:
             f'{session["page"]}/{option_string}'
         )
 
-        html = map_action_to_html(
+        page = map_action_to_page(
             "click",
+            templates=self.templates,
             session_id=session_id,
             product_info=product_info,
             keywords=session["keywords"],
@@ -471,10 +458,10 @@ class SimServer:
             # This is used for reward computation
             # instruction_text=session['goal']['instruction_text'],
             # This is used for rendering the page
-            instruction_text=self.assigned_instruction_text,
+            instruction_text=self.get_assigned_instruction_text(session_id),
             show_attrs=self.show_attrs,
         )
-        return html, url
+        return page, url
 
     @app.route("/", methods=["GET", "POST"])
     def item_sub_page(self, session_id, **kwargs):
@@ -498,8 +485,9 @@ class SimServer:
             f'{session["asin"]}/{keywords_url_string}/{session["page"]}/'
             f'{clickable_name}/{session["options"]}'
         )
-        html = map_action_to_html(
+        page = map_action_to_page(
             f"click[{clickable_name}]",
+            templates=self.templates,
             session_id=session_id,
             product_info=product_info,
             keywords=session["keywords"],
@@ -509,9 +497,9 @@ class SimServer:
             # This is used for reward computation
             # instruction_text=session['goal']['instruction_text'],
             # This is used for rendering the page
-            instruction_text=self.assigned_instruction_text,
+            instruction_text=self.get_assigned_instruction_text(session_id),
         )
-        return html, url
+        return page, url
 
     @app.route("/", methods=["GET", "POST"])
     def done(self, session_id, **kwargs):
@@ -539,8 +527,9 @@ class SimServer:
             f"{self.base_url}/done/{session_id}/"
             f'{session["asin"]}/{session["options"]}'
         )
-        html = map_action_to_html(
+        page = map_action_to_page(
             f"click[{END_BUTTON}]",
+            templates=self.templates,
             session_id=session_id,
             reward=reward,
             asin=session["asin"],
@@ -548,111 +537,106 @@ class SimServer:
             # This is used for reward computation
             # instruction_text=session['goal']['instruction_text'],
             # This is used for rendering the page
-            instruction_text=self.assigned_instruction_text,
+            instruction_text=self.get_assigned_instruction_text(session_id),
         )
-        return html, url, reward
+        return page, url, reward
 
     def receive(self, session_id, current_url, session_int=None, **kwargs):
         """Map action to the corresponding page"""
         status = dict(reward=0.0, done=False)
 
-        with app.app_context(), app.test_request_context():
-            # Create/determine goal, instruction_text from current session
-            if session_id not in self.user_sessions:
-                idx = (
-                    session_int
-                    if (session_int is not None and isinstance(session_int, int))
-                    else random_idx(self.cum_weights)
+        # Create/determine goal, instruction_text from current session
+        if session_id not in self.user_sessions:
+            idx = (
+                session_int
+                if (session_int is not None and isinstance(session_int, int))
+                else int(self.rng.choice(len(self.goals), p=self.goal_probabilities))
+            )
+            goal = self.goals[idx]
+            instruction_text = goal["instruction_text"]
+            self.user_sessions[session_id] = {"goal": goal, "done": False}
+        else:
+            instruction_text = self.user_sessions[session_id]["goal"][
+                "instruction_text"
+            ]
+        assigned_instruction_text = self.get_assigned_instruction_text(session_id)
+        if assigned_instruction_text is not None:
+            instruction_text = assigned_instruction_text
+        session = self.user_sessions[session_id]
+
+        if not kwargs:
+            # If no action, reset the session variables
+            kwargs["instruction_text"] = instruction_text
+            page, url = self.index(session_id, **kwargs)
+            self.user_sessions[session_id].update(
+                {
+                    "keywords": None,
+                    "page": None,
+                    "asin": None,
+                    "asins": set(),
+                    "options": dict(),
+                    "actions": defaultdict(int),
+                }
+            )
+        elif "keywords" in kwargs:
+            # If search keywords are available, run a search
+            page, url = self.search_results(session_id, **kwargs)
+        elif "clickable_name" in kwargs:
+            clickable_name = kwargs["clickable_name"].lower()
+            if clickable_name == END_BUTTON.lower():
+                # If "buy now" clicked, calculate reward and flag session as terminated
+                page, url, reward = self.done(session_id, **kwargs)
+                status["reward"] = reward
+                status["done"] = True
+            elif clickable_name == BACK_TO_SEARCH.lower():
+                # If "back to search" clicked, recursively reset the session back to search page
+                page, url, status = self.receive(session_id, current_url)
+            elif (
+                clickable_name == NEXT_PAGE.lower()
+                and self.get_page_name(current_url) == "search_results"
+            ):
+                # If "next page" clicked from search results, re-render with `page` enumerated
+                page, url, status = self.receive(
+                    session_id,
+                    current_url,
+                    keywords=session["keywords"],
+                    page=session["page"] + 1,
                 )
-                goal = self.goals[idx]
-                instruction_text = goal["instruction_text"]
-                self.user_sessions[session_id] = {"goal": goal, "done": False}
-            else:
-                instruction_text = self.user_sessions[session_id]["goal"][
-                    "instruction_text"
-                ]
-            if self.assigned_instruction_text is not None:
-                instruction_text = (
-                    self.assigned_instruction_text
-                )  # TODO: very hacky, should remove
-                self.user_sessions[session_id]["goal"][
-                    "instruction_text"
-                ] = instruction_text
-            session = self.user_sessions[session_id]
-
-            if not kwargs:
-                # If no action, reset the session variables
-                kwargs["instruction_text"] = instruction_text
-                html, url = self.index(session_id, **kwargs)
-                self.user_sessions[session_id].update(
-                    {
-                        "keywords": None,
-                        "page": None,
-                        "asin": None,
-                        "asins": set(),
-                        "options": dict(),
-                        "actions": defaultdict(int),
-                    }
+            elif (
+                clickable_name == PREV_PAGE.lower()
+                and self.get_page_name(current_url) == "search_results"
+            ):
+                # If "prev page" clicked from search results, re-render with `page` denumerated
+                page, url, status = self.receive(
+                    session_id,
+                    current_url,
+                    keywords=session["keywords"],
+                    page=session["page"] - 1,
                 )
-            elif "keywords" in kwargs:
-                # If search keywords are available, run a search
-                html, url = self.search_results(session_id, **kwargs)
-            elif "clickable_name" in kwargs:
-                clickable_name = kwargs["clickable_name"].lower()
-                if clickable_name == END_BUTTON.lower():
-                    # If "buy now" clicked, calculate reward and flag session as terminated
-                    html, url, reward = self.done(session_id, **kwargs)
-                    status["reward"] = reward
-                    status["done"] = True
-                elif clickable_name == BACK_TO_SEARCH.lower():
-                    # If "back to search" clicked, recursively reset the session back to search page
-                    html, url, status = self.receive(session_id, current_url)
-                elif (
-                    clickable_name == NEXT_PAGE.lower()
-                    and self.get_page_name(current_url) == "search_results"
-                ):
-                    # If "next page" clicked from search results, re-render with `page` enumerated
-                    html, url, status = self.receive(
-                        session_id,
-                        current_url,
-                        keywords=session["keywords"],
-                        page=session["page"] + 1,
-                    )
-                elif (
-                    clickable_name == PREV_PAGE.lower()
-                    and self.get_page_name(current_url) == "search_results"
-                ):
-                    # If "prev page" clicked from search results, re-render with `page` denumerated
-                    html, url, status = self.receive(
-                        session_id,
-                        current_url,
-                        keywords=session["keywords"],
-                        page=session["page"] - 1,
-                    )
-                elif (
-                    clickable_name == PREV_PAGE.lower()
-                    and self.get_page_name(current_url) == "item_sub_page"
-                ):
-                    # If "prev page" clicked from sub page, return to corresponding item page
-                    html, url = self.item_page(session_id, **kwargs)
-                elif (
-                    clickable_name == PREV_PAGE.lower()
-                    and self.get_page_name(current_url) == "item_page"
-                ):
-                    # If "prev page" clicked from item page, return to search results page
-                    html, url = self.search_results(
-                        session_id,
-                        keywords=session["keywords"],
-                        page=session["page"],
-                        **kwargs,
-                    )
-                elif clickable_name in [k.lower() for k in ACTION_TO_TEMPLATE]:
-                    # Render item_sub_page if clickable is description, features, or reviews
-                    html, url = self.item_sub_page(session_id, **kwargs)
-                else:
-                    # Otherwise, render current item page
-                    html, url = self.item_page(session_id, **kwargs)
-            return html, url, status
+            elif (
+                clickable_name == PREV_PAGE.lower()
+                and self.get_page_name(current_url) == "item_sub_page"
+            ):
+                # If "prev page" clicked from sub page, return to corresponding item page
+                page, url = self.item_page(session_id, **kwargs)
+            elif (
+                clickable_name == PREV_PAGE.lower()
+                and self.get_page_name(current_url) == "item_page"
+            ):
+                # If "prev page" clicked from item page, return to search results page
+                page, url = self.search_results(
+                    session_id,
+                    keywords=session["keywords"],
+                    page=session["page"],
+                    **kwargs,
+                )
+            elif clickable_name in [k.lower() for k in ACTION_TO_TEMPLATE]:
+                # Render item_sub_page if clickable is description, features, or reviews
+                page, url = self.item_sub_page(session_id, **kwargs)
+            else:
+                # Otherwise, render current item page
+                page, url = self.item_page(session_id, **kwargs)
+        return page, url, status
 
     def get_page_name(self, url):
         """Determine which page (i.e.
@@ -671,23 +655,38 @@ class SimServer:
 class SimBrowser:
     """Simulated browser for rendering the HTML source of WebShop environment pages."""
 
-    def __init__(self, server):
+    def __init__(self, server, text_renderer=False):
         self.server = server
+        self.text_renderer = text_renderer
         self.current_url = None
-        self.page_source = None
+        self.current_page = None
         self.session_id = None
+        self._page = None
+        self._page_of = None
+
+    @property
+    def page_source(self):
+        return self.current_page.html if self.current_page is not None else None
+
+    @property
+    def page(self):
+        """Observations of the current page, computed once per page"""
+        if self._page_of is not self.current_page:
+            self._page = observe(self.current_page, self.text_renderer)
+            self._page_of = self.current_page
+        return self._page
 
     def get(self, url, session_id=None, session_int=None):
         """Set browser variables to corresponding link, page HTML for URL"""
         self.session_id = url.split("/")[-1] if session_id is None else session_id
-        self.page_source, _, _ = self.server.receive(
+        self.current_page, _, _ = self.server.receive(
             self.session_id, self.current_url, session_int=session_int
         )
         self.current_url = url
 
     def click(self, clickable_name, text_to_clickable):
         """Wrapper for `receive` handler for performing click action on current page"""
-        self.page_source, self.current_url, status = self.server.receive(
+        self.current_page, self.current_url, status = self.server.receive(
             self.session_id,
             current_url=self.current_url,
             clickable_name=clickable_name,
@@ -699,7 +698,7 @@ class SimBrowser:
         """Wrapper for `receive` handler for performing search action on current page"""
         if isinstance(keywords, str):
             keywords = keywords.split(" ")
-        self.page_source, self.current_url, status = self.server.receive(
+        self.current_page, self.current_url, status = self.server.receive(
             self.session_id,
             current_url=self.current_url,
             keywords=keywords,
@@ -12,11 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import bisect
 import hashlib
 import logging
 from os.path import abspath, dirname, join
-import random
 
 BASE_DIR = dirname(abspath(__file__))
 DEBUG_PROD_SIZE = None  # set to `None` to disable
@@ -32,17 +30,7 @@ FEAT_IDS = join(BASE_DIR, "../data/feat_ids.pt")
 HUMAN_ATTR_PATH = join(BASE_DIR, "../data/items_human_ins.json")
 HUMAN_ATTR_PATH = join(BASE_DIR, "../data/items_human_ins.json")
 
-
-def random_idx(cum_weights):
-    """Generate random index by sampling uniformly from sum of all weights, then
-
-    selecting the `min` between the position to keep the list sorted (via bisect)
-    and the value of the second to last index
-    """
-    pos = random.uniform(0, cum_weights[-1])
-    idx = bisect.bisect(cum_weights, pos)
-    idx = min(idx, len(cum_weights) - 2)
-    return idx
+CATALOG_DIR = join(BASE_DIR, "../data/catalog")
 
 
 def setup_logger(session_id, user_log_dir):
@@ -15,7 +15,8 @@
 from google.adk.tools import ToolContext
 from google.genai import types
 
-from ..shared_libraries.init_env import webshop_env
+from ..shared_libraries import init_env
+from ..shared_libraries.init_env import get_session_env
 
 
 async def search(keywords: str, tool_context: ToolContext) -> str:
@@ -28,9 +29,12 @@ async def search(keywords: str, tool_context: ToolContext) -> str:
     Returns:
       str: The search result displayed in a webpage.
     """
+    webshop_env = get_session_env(tool_context)
     status = {"reward": None, "done": False}
     action_string = f"search[{keywords}]"
-    webshop_env.server.assigned_instruction_text = f"Find me {keywords}."
+    webshop_env.server.assign_instruction_text(
+        webshop_env.session, f"Find me {keywords}."
+    )
     print(f"env instruction_text: {webshop_env.instruction_text}")
     _, status["reward"], status["done"], _ = webshop_env.step(action_string)
 
@@ -46,14 +50,15 @@ async def search(keywords: str, tool_context: ToolContext) -> str:
     print("#" * 50)
 
     # Show artifact in the UI.
-    try:
-        await tool_context.save_artifact(
-            "html",
-            types.Part.from_uri(
-                file_uri=webshop_env.state["html"], mime_type="text/html"
-            ),
-        )
-    except ValueError as e:
-        print(f"Error saving artifact: {e}")
+    if init_env.html_artifacts:
+        try:
+            await tool_context.save_artifact(
+                "html",
+                types.Part.from_uri(
+                    file_uri=webshop_env.state["html"], mime_type="text/html"
+                ),
+            )
+        except ValueError as e:
+            print(f"Error saving artifact: {e}")
 
     return ob
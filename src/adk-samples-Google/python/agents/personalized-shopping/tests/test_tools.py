@@ -12,11 +12,35 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import glob
+import json
 import os
+import pickle
+import sys
+import threading
+from types import SimpleNamespace
 
 import dotenv
+import numpy as np
 import pytest
 from google.adk.evaluation.agent_evaluator import AgentEvaluator
+from personalized_shopping.shared_libraries.init_env import (
+    get_session_env,
+    get_webshop_env,
+    num_product_items,
+)
+from personalized_shopping.shared_libraries.web_agent_site import WebAgentTextEnv
+from personalized_shopping.shared_libraries.web_agent_site.engine import (
+    catalog,
+    engine,
+    goal,
+)
+from personalized_shopping.shared_libraries.web_agent_site.envs.web_agent_text_env import (
+    SimServer,
+)
+from personalized_shopping.shared_libraries.web_agent_site.utils import (
+    DEFAULT_FILE_PATH,
+)
 
 pytest_plugins = ("pytest_asyncio",)
 
@@ -34,3 +58,243 @@ async def test_tools():
         os.path.join(os.path.dirname(__file__), "tools"),
         num_runs=1,
     )
+
+
+def recorded_actions(session_file):
+    """Returns the search and click actions of a recorded ADK session."""
+    with open(session_file) as f:
+        session = json.load(f)
+    actions = []
+    for event in session["events"]:
+        for part in (event.get("content") or {}).get("parts") or []:
+            call = part.get("function_call")
+            if call is None:
+                continue
+            if call["name"] == "search":
+                actions.append(f"search[{call['args']['keywords']}]")
+            elif call["name"] == "click":
+                actions.append(f"click[{call['args']['button_name']}]")
+    return actions
+
+
+@pytest.mark.parametrize(
+    "session_file",
+    sorted(
+        glob.glob(
+            os.path.join(
+                os.path.dirname(__file__), "example_interactions", "*.session.json"
+            )
+        )
+    ),
+)
+def test_text_renderer_matches_html(session_file):
+    """The text renderer gives the same observations as parsing the HTML."""
+    envs = [
+        WebAgentTextEnv(
+            observation_mode="text",
+            server=get_webshop_env().server,
+            session_prefix=f"{text_renderer}-",
+            text_renderer=text_renderer,
+        )
+        for text_renderer in (False, True)
+    ]
+    for env in envs:
+        env.reset(session=0)
+    done = False
+    for action in [None, *recorded_actions(session_file)]:
+        if action is not None:
+            results = [env.step(action) for env in envs]
+            assert results[0] == results[1], action
+            _, _, done, _ = results[0]
+        assert (
+            envs[0].get_available_actions() == envs[1].get_available_actions()
+        ), action
+        for observation_mode in ("text", "text_rich"):
+            observations = []
+            for env in envs:
+                env.observation_mode = observation_mode
+                observations.append(env.observation)
+            assert observations[0] == observations[1], (action, observation_mode)
+        for env in envs:
+            env.observation_mode = "text"
+        # The done page has no instruction.
+        if not done:
+            assert envs[0].get_instruction_text() == envs[1].get_instruction_text()
+
+
+def test_servers_start_with_the_same_prices_and_goals():
+    """Prices and limited goals are sampled the same way on every start."""
+    servers = [
+        SimServer(
+            "http://127.0.0.1:3000",
+            DEFAULT_FILE_PATH,
+            limit_goals=10,
+            num_products=num_product_items,
+        )
+        for _ in range(2)
+    ]
+    assert servers[0].product_prices == servers[1].product_prices
+    assert servers[0].product_prices == get_webshop_env().server.product_prices
+    assert len(servers[0].goals) == 10
+    assert servers[0].goals == servers[1].goals
+
+
+def test_sample_price_upper():
+    """Upper prices are the largest of two distinct values above the price."""
+    prices = np.repeat([5.0, 10.0, 123.4, 965.0, 980.0, 990.0, 5000.0], 1000)
+    price_upper, has_range = goal.sample_price_upper(prices, np.random.default_rng(0))
+    for price in np.unique(prices):
+        rows = prices == price
+        above = [p for p in goal.PRICE_RANGE if p > price][:4]
+        if len(above) >= 2:
+            assert has_range[rows].all()
+            # The smallest value is never the largest of two distinct ones
+            assert set(price_upper[rows].tolist()) == set(above[1:])
+        else:
+            assert not has_range[rows].any()
+            assert set(price_upper[rows].tolist()) == {goal.NO_PRICE_UPPER}
+
+
+def test_sessions_have_their_own_environment():
+    """ADK sessions shop in their own environment, on the shared server."""
+    tool_contexts = [SimpleNamespace(state={}) for _ in range(2)]
+    envs = [get_session_env(tool_context) for tool_context in tool_contexts]
+    assert envs[0] is not envs[1]
+    assert envs[0].server is envs[1].server is get_webshop_env().server
+    assert get_session_env(tool_contexts[0]) is envs[0]
+
+    for env, keywords in zip(envs, ["floral dress", "denim skirt"]):
+        env.server.assign_instruction_text(env.session, f"Find me {keywords}.")
+        env.step(f"search[{keywords}]")
+    for env, keywords in zip(envs, ["floral+dress", "denim+skirt"]):
+        assert keywords in env.state["url"]
+    assert "floral dress" in envs[0].get_instruction_text()
+    assert "denim skirt" in envs[1].get_instruction_text()
+
+
+def test_score_many_matches_get_reward():
+    """Batched rewards are the same as the rewards of each purchase."""
+    server = get_webshop_env().server
+    goals = server.goals[:20]
+    purchases = []
+    for i, g in enumerate(goals):
+        # Buy the goal product for even goals, and the next goal one otherwise
+        asin = goals[(i + i % 2) % len(goals)]["asin"]
+        purchased_product = server.product_item_dict[asin]
+        options = {
+            name: values[0] for name, values in purchased_product["options"].items()
+        }
+        purchases.append((purchased_product, server.product_prices[asin], options))
+    # The names are only parsed in batches if get_reward didn't parse them yet
+    goal._type_nouns.clear()
+    rewards = goal.score_many(purchases, goals, verbose=True)
+    goal._type_nouns.clear()
+    expected = [
+        goal.get_reward(purchased_product, g, price, options, verbose=True)
+        for (purchased_product, price, options), g in zip(purchases, goals)
+    ]
+    assert rewards == expected
+    assert all("searchable_text" not in p for p, _, _ in purchases)
+
+
+CATALOG_PRODUCTS = [
+    {
+        "asin": "B01",
+        "Title": "Floral dress",
+        "instruction_text": "Find me a floral dress",
+        "Description": "A flowy dress.",
+        "Reviews": [{"title": "Nice", "score": 5}],
+    },
+    {"asin": "B02", "Title": "Denim skirt", "Description": "A denim skirt."},
+]
+
+
+def test_catalog_round_trip(tmp_path):
+    """Products read from a catalog are the products it was written with."""
+    directory = str(tmp_path / "catalog")
+    assert catalog.read_catalog(directory) is None
+    catalog.write_catalog(directory, CATALOG_PRODUCTS)
+    products = catalog.read_catalog(directory)
+    assert products == CATALOG_PRODUCTS
+    # "instruction_text" is a sparse column, only written for the first product
+    assert [p.get("instruction_text") for p in products] == [
+        "Find me a floral dress",
+        None,
+    ]
+
+
+def test_catalog_products_decode_their_fields_when_needed(tmp_path):
+    """Lazy fields are decoded by any access, not only by subscripts."""
+    directory = str(tmp_path / "catalog")
+    catalog.write_catalog(directory, CATALOG_PRODUCTS)
+    dress, skirt = catalog.read_catalog(directory)
+    # Eager fields don't need the records, even when missing
+    assert "instruction_text" not in skirt
+    assert skirt.get("instruction_text") is None
+    assert skirt._records is not None
+
+    assert dress.get("Description") == "A flowy dress."
+    assert "Description" in skirt
+    assert "Reviews" not in skirt
+    assert [dict(p) for p in catalog.read_catalog(directory)] == CATALOG_PRODUCTS
+    assert [
+        json.loads(json.dumps(p)) for p in catalog.read_catalog(directory)
+    ] == CATALOG_PRODUCTS
+    assert [
+        dict(p.items()) for p in catalog.read_catalog(directory)
+    ] == CATALOG_PRODUCTS
+    unpickled = pickle.loads(pickle.dumps(catalog.read_catalog(directory)))
+    assert unpickled == CATALOG_PRODUCTS
+    assert all(type(p) is dict for p in unpickled)
+
+
+class PausingRecords:
+    """Records of a single product whose first decoding pauses after one field"""
+
+    def __init__(self, record):
+        self.record = record
+        self.paused = threading.Event()
+        self.resumed = threading.Event()
+
+    def decode(self, index):
+        return self.record if self.paused.is_set() else self
+
+    def items(self):
+        fields = iter(self.record.items())
+        yield next(fields)
+        self.paused.set()
+        self.resumed.wait(timeout=10)
+        yield from fields
+
+
+def test_catalog_products_can_be_read_while_they_are_decoded():
+    """A product read while another thread decodes it has all its fields."""
+    record = {"Description": "A flowy dress.", "Reviews": [], "BulletPoints": []}
+    records = PausingRecords(record)
+    dress = catalog.LazyProduct.from_fields({"asin": "B01"}, records, 0)
+    reader = threading.Thread(target=dress.get, args=("Description",))
+    reader.start()
+    try:
+        assert records.paused.wait(timeout=10)
+        assert dress["Reviews"] == []
+        assert dict(dress) == {"asin": "B01", **record}
+    finally:
+        records.resumed.set()
+        reader.join()
+    assert dict(dress) == {"asin": "B01", **record}
+
+
+def test_catalog_build_matches_the_agent_environment(tmp_path, monkeypatch):
+    """The catalog built ahead of time is the one the agent environment reads."""
+    loaded = []
+    monkeypatch.setattr(engine, "load_products", lambda *args: loaded.append(args))
+    monkeypatch.setattr(sys, "argv", ["catalog"])
+    catalog.main()
+    (args,) = loaded
+
+    def path(*args):
+        return engine.products_catalog_path(*args, cache_dir=str(tmp_path))
+
+    # The agent environment loads the products with `human_goals=None`
+    assert path(*args) == path(DEFAULT_FILE_PATH, num_product_items, None)
+    assert path(*args) != path(DEFAULT_FILE_PATH, num_product_items, True)